@@ -19,26 +19,57 @@
 
 import sys, os
 sys.path.insert(0, './network')
-os.system('cls')
+
+# Clear the console of an interactive run on Windows, not when imported, e.g., by batch.py or sweep.py
+if __name__ == '__main__' and os.name == 'nt':
+    os.system('cls')
 
 # import definitions of network elements 
 import net_ntwk
-import net_name, net_channel
+import net_name, net_channel, net_trace
 
 # network configuration
 import netcfg, flytera_cfg
 
 # discrete simulations
-import simpy, numpy as np
+import simpy, step_engine, numpy as np
+
+# profiling of the stages of a run, results and their cache
+import profiler, recorder, result_cache
 
-def run_net(beam_alignment_itvl = 10):
+# Events of the simulation runs
+trc = net_trace.get_tracer('sim')
+
+def run_net(beam_alignment_itvl = 10, ckpt_fname = None, seed = None):
     '''
     Run Network with given beam alignment interval, default 10 ticks
+    ckpt_fname: checkpoint file of a tick run, saved every flytera_cfg.ckpt_itvl ticks and removed when the run is
+                complete; if it exists, the run resumes from it
+    seed: seed of the random state of the run, None to continue from the current random state
+    Return: the recorder with the results of this run, see recorder.py
+
+    The results are cached in flytera_cfg.cache_dir, see result_cache.py; runs with generated laac traces are only
+    cached with a seed, profiled runs are not cached
     '''
+    # Results of a run with the same configuration, trace data and code
+    key = None
+    if flytera_cfg.cache_dir is not None and flytera_cfg.prof_mode is None:
+        cache = result_cache.result_cache()
+        key = cache.get_key(beam_alignment_itvl, seed)
+        values = None if key is None else cache.load(key)
+        if values is not None:
+            trc.info('cache_hit', 'Results loaded from the cache ({})', key[:12])
+            rcd = recorder.recorder(flytera_cfg.sim_tick + 1)
+            rcd.from_dict(values)
+            return rcd
+
+    if seed is not None:
+        np.random.seed(seed)
+
     #######################################################
     ## create the network 
     #######################################################
-    print('Creating flying drone networks...')
+    trc.info('new_run', 'Creating flying drone networks...')
 
     # create an empty network
     nt = net_ntwk.new_ntwk()
@@ -46,17 +77,88 @@ def run_net(beam_alignment_itvl = 10):
     nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)                  
 
     # Add network elements, base stations, use equipments, etc.                                         
-    nt.add_node(net_name.dhs, flytera_cfg.num_dhs)                    # add two drone hotspots
+    nt.add_node(net_name.dhs, flytera_cfg.num_dhs)                    # add the drone hotspots
 
     # All nodes have been added, perform pre-processing, e.g., calculate the distance between nodes
     # Initialize channels between nodes
     # see net_ntwk.pre_processing for detailed definition
     nt.pre_processing()
 
+    # Stage profiler of the run, see profiler.py
+    nt.prof = profiler.new_prof(flytera_cfg.prof_mode)
+
+    run_ntwk(nt, beam_alignment_itvl, ckpt_fname)
+
+    # Report of the stage profiler, kept with the results
+    nt.prof.stop()
+    nt.rcd.prof = nt.prof.get_report()
+
+    if key is not None:
+        cache.save(key, nt.rcd.to_dict())
+
+    return nt.rcd
+
+def run_ntwk(nt, beam_alignment_itvl, ckpt_fname = None):
+    '''
+    Run the pre-processed network in the mode of flytera_cfg.kin_mode, the results are recorded in nt.rcd
+    ckpt_fname: checkpoint file of a tick run, see run_net
+    '''
+    # Streamed traces are read forward tick by tick, never whole
+    if flytera_cfg.stream_trace is not None and flytera_cfg.kin_mode != 'tick':
+        print('Error: Streamed traces (flytera_cfg.stream_trace) are only supported with kin_mode \'tick\'.')
+        exit(0)
+
+    # Trace mode: the pose traces of the dhs are precomputed in one pass, no discrete simulation needed
+    if flytera_cfg.kin_mode == 'trace':
+        nt.run_trace(flytera_cfg.sim_tick, beam_alignment_itvl)
+        return
+
+    # Ensemble mode: statistics over many realizations of the generated laac traces, evaluated as arrays
+    if flytera_cfg.kin_mode == 'ensemble':
+        nt.run_ensemble(flytera_cfg.sim_tick, beam_alignment_itvl)
+        return
+
     #######################################################
     ## start the network 
     #######################################################
 
+    # Fixed-step engine: the same per-tick steps as the simpy processes below, called in a plain loop
+    # Also used for runs with checkpoints, the engine can stop and continue at any tick with the same results
+    if flytera_cfg.sim_engine == 'step' or ckpt_fname is not None:
+        eng = step_engine.step_engine()
+
+        # For each dhs, in the registry of the network, its step of one tick
+        for obj_node in nt.rgst.iter_stype(net_name.dhs):
+            eng.add_task(obj_node.step)
+
+        # Beam alignment, every beam_alignment_itvl ticks
+        eng.add_task(lambda tick: nt.align(), beam_alignment_itvl)
+
+        # Network-wide operation
+        eng.add_task(nt.step)
+
+        # Run the network
+        if ckpt_fname is None:
+            eng.run(until=flytera_cfg.sim_tick)
+            return
+
+        # Resume from the last checkpoint, if any
+        if os.path.isfile(ckpt_fname):
+            eng.now = nt.load_ckpt(ckpt_fname, beam_alignment_itvl)
+
+        # Run up to the next checkpoint, then save it, until the end of the run
+        while eng.now < flytera_cfg.sim_tick:
+            eng.run(until=min(flytera_cfg.sim_tick, (eng.now // flytera_cfg.ckpt_itvl + 1) * flytera_cfg.ckpt_itvl))
+            if eng.now < flytera_cfg.sim_tick:
+                nt.save_ckpt(ckpt_fname, eng.now, beam_alignment_itvl)
+                trc.debug('save_ckpt', 'Checkpoint saved at tick {}', eng.now, tick=eng.now)
+
+        # The run is complete, its results are returned
+        if os.path.isfile(ckpt_fname):
+            os.remove(ckpt_fname)
+
+        return
+
     # Create the environment of discrete simulation 
     env = simpy.Environment()
 
@@ -64,12 +166,8 @@ def run_net(beam_alignment_itvl = 10):
     # if netcfg.plot_net == True:
         # env.process(nt.gui.operation(env))
 
-    # First, get the list of dhs
-    node_list = nt.get_node_list(net_name.dhs)
-
-    # Then, for each LTE BS, create a process       
-    for name_node in node_list:
-        obj_node = nt.get_netelmt(name_node)        # get the corresponding object
+    # For each dhs, in the registry of the network, create a process       
+    for obj_node in nt.rgst.iter_stype(net_name.dhs):
         env.process(obj_node.operation(env))        # create the operation process
         
     # Beam alignment
@@ -27,14 +27,39 @@
 
 from matplotlib import pyplot
 from shapely.geometry.point import Point
+from shapely.geometry import Polygon
 import shapely.affinity
 from descartes import PolygonPatch
 
+import math, numpy as np
+
+# Default number of segments per quarter circle, the same as shapely's buffer()
+dft_quad_segs = 16
+
+# Unit circle vertex arrays, one per resolution, shared by all cone models
+unit_circle = {}
+
+def get_unit_circle(quad_segs = dft_quad_segs):
+    '''
+    Func: vertices of the closed unit circle polygon with 4*quad_segs segments, in the same order as
+    Point((0, 0)).buffer(1, quad_segs): starting from (1, 0), clockwise
+    Return: array of shape (4*quad_segs + 1, 2)
+    '''
+    if quad_segs not in unit_circle:
+        num_seg = 4 * quad_segs
+        phi = -2 * math.pi * np.arange(num_seg + 1) / num_seg
+        xy = np.column_stack([np.cos(phi), np.sin(phi)])
+        xy[-1] = xy[0]                                      # closed ring
+        xy.setflags(write=False)
+        unit_circle[quad_segs] = xy
+
+    return unit_circle[quad_segs]
+
 class cone_mdl:
     '''
     cone model for radio radiation pattern 
     '''
-    def __init__(self):
+    def __init__(self, quad_segs = dft_quad_segs):
         # Center point
         self.center_x = 0
         self.center_y = 0
@@ -47,23 +72,29 @@ class cone_mdl:
         # Angle in degrees between x-axis and semi_x
         self.angle = 0
         
+        # Precomputed unit circle, the template of all ellipses of this model
+        self.quad_segs = quad_segs
+        self.unit_xy = get_unit_circle(quad_segs)
+
         # Polygon of the initial ellipse 
         self.polygon = self.ini_polygon()
         
+        # Parameters of the last polygon built by get_polygon, the polygon is reused if they do not change
+        self.polygon_info = None
+        
     def ini_polygon(self):
         '''
         Initialize the wavefront polygon, a circle centered at (0, 0) with radius 1   
         '''
-        return shapely.geometry.Point((self.center_x, self.center_y)).buffer(1)
+        return Polygon(self.unit_xy)
     
-    def get_polygon(self, info):
+    def set_param(self, info):
         '''
-        Get the polygon of the ellipse with given information
+        Record the parameters of the ellipse without building the polygon, used by the overlap engine in ovlpmdl.py
+        The last polygon no longer matches the parameters, it is built again by the next get_polygon
         '''
-        
-        # First, initial the polygon
-        self.polygon = self.ini_polygon()
-        
+        self.polygon_info = None
+
         # Center point
         self.center_x = info['center'][0]
         self.center_y = info['center'][1]
@@ -74,16 +105,33 @@ class cone_mdl:
 
         # Angle in degrees between x-axis and semi_x
         self.angle = info['angle']    
-            
-        # Create the ellipse along x and y:
-        polygon  = shapely.affinity.scale(self.polygon, self.semi_x, self.semi_y)
 
-        # Rotate the ellipse (clockwise, x axis pointing right):
-        polygon = shapely.affinity.rotate(polygon, self.angle)
+    def get_polygon(self, info):
+        '''
+        Get the polygon of the ellipse with given information
+        The unit circle template is scaled, rotated (counter-clockwise, as shapely.affinity.rotate) and
+        translated by one composed affine map. If the information is the same as in the last call, e.g., the 
+        transmit radius tan(angle) * comm_dist has not changed, the last polygon is returned
+        '''
+        key = (tuple(info['center']), tuple(info['semi_xy']), info['angle'])
+        if key == self.polygon_info:
+            return self.polygon
+        
+        # Record center, semi-axis and angle of the ellipse
+        self.set_param(info)
+            
+        # Composed linear part: rotation * scale
+        theta = self.angle / 180 * math.pi
+        cos_t = math.cos(theta)
+        sin_t = math.sin(theta)
+        mat = np.array([[cos_t * self.semi_x, -sin_t * self.semi_y],
+                        [sin_t * self.semi_x,  cos_t * self.semi_y]])
         
-        # Move the ellipse to the center
-        polygon = shapely.affinity.translate(polygon, self.center_x, self.center_y, self.center_z)
+        # Apply to the template, then move the ellipse to the center
+        xy = self.unit_xy @ mat.T
+        xy += (self.center_x, self.center_y)
         
-        return polygon
-    
-      
\ No newline at end of file
+        self.polygon = Polygon(xy)
+        self.polygon_info = key
+        
+        return self.polygon
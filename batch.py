@@ -0,0 +1,158 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Headless batch runs, the non-interactive counterpart of main.py
+##
+## Example:
+##     python batch.py --fig 1 2 3 --out-dir results
+##     python batch.py --fig 4 --itvl 1 10 100 --beam-width 5 10 --sim-tick 2000
+##     python batch.py --fig 2 5 --ensemble 1000
+##     python batch.py --fig 1 --engine step
+##     python batch.py --fig 4 --prof time
+##     python batch.py --fig 1 --sim-tick 100000 --ckpt-dir ckpt
+##     python batch.py --fig 3 --no-cache
+##
+## For each run, the raw series are saved to <out-dir>/fig<id>_itvl<itvl>_bw<width>.npz,
+## the wall-clock time is reported and collected in <out-dir>/timing.csv, and
+## the figures are rendered to <out-dir>/fig<id>_bw<width>.png
+## With --ensemble, each run is the mean over the realizations, shaded with its quantile band
+## With --prof, the time per stage of each run is reported and collected in <out-dir>/prof.csv
+## With --ckpt-dir, tick runs save checkpoints there and a batch run again resumes the unfinished runs
+## Results of runs with the same configuration are taken from the cache, see result_cache.py, unless --no-cache
+#######################################################
+
+import os, time, argparse
+
+# Non-GUI backend, must be selected before pyplot is imported
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot
+
+import numpy as np
+
+# network configuration
+import netcfg, flytera_cfg
+
+import sweep, main, profiler
+
+def get_args(argv = None):
+    '''
+    Parse the command-line arguments
+    '''
+    parser = argparse.ArgumentParser(description='Run FlyingTera simulations without display or prompt.')
+    parser.add_argument('--fig', nargs='+', default=sorted(flytera_cfg.figs.keys()),
+                        choices=sorted(flytera_cfg.figs.keys()), help='figure ids, default all')
+    parser.add_argument('--itvl', nargs='+', type=int, default=None,
+                        help='beam alignment intervals in ticks, default those of each figure')
+    parser.add_argument('--beam-width', nargs='+', type=float, default=None,
+                        help='beam widths in degree, default that of each figure')
+    parser.add_argument('--sim-tick', type=int, default=flytera_cfg.sim_tick, help='number of ticks to simulate')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random traces')
+    parser.add_argument('--ensemble', type=int, default=None, metavar='NUM_RLZ',
+                        help='number of realizations of the generated laac traces, statistics saved instead of one run')
+    parser.add_argument('--engine', choices=['simpy', 'step'], default=None,
+                        help='engine of the tick runs, default flytera_cfg.sim_engine, see step_engine.py')
+    parser.add_argument('--prof', choices=['time', 'alloc'], default=None,
+                        help='profile the stages of each run, alloc also measures the allocated memory (slower)')
+    parser.add_argument('--ckpt-dir', default=None,
+                        help='directory of the checkpoints of the tick runs, every flytera_cfg.ckpt_itvl ticks')
+    parser.add_argument('--no-cache', action='store_true', help='run all simulations, do not use the result cache')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes, default all CPUs')
+    parser.add_argument('--out-dir', default='results', help='directory of the images and raw series')
+
+    return parser.parse_args(argv)
+
+def save_series(out_dir, results):
+    '''
+    Save the raw series of each run and the wall-clock time of all runs
+    '''
+    with open(os.path.join(out_dir, 'timing.csv'), 'w') as f:
+        f.write('fig,itvl,beam_width,sim_tick,wall_time\n')
+        for key in sorted(results.keys()):
+            fig_id, almt_itvl, beam_width = key
+            result = results[key]
+            fname = 'fig{}_itvl{}_bw{:g}.npz'.format(fig_id, almt_itvl, beam_width)
+            np.savez(os.path.join(out_dir, fname), **{name: result[name] for name in result if name != 'prof'})
+            f.write('{},{},{:g},{},{:.6f}\n'.format(fig_id, almt_itvl, beam_width, result['nmlzd_cap'].size - 1,
+                                                     result['wall_time']))
+
+def save_prof(out_dir, results):
+    '''
+    Save the stage profiles of all runs, one line per run and stage
+    '''
+    with open(os.path.join(out_dir, 'prof.csv'), 'w') as f:
+        f.write('fig,itvl,beam_width,stage,calls,time,time_per_call,share,mem,peak\n')
+        for key in sorted(results.keys()):
+            fig_id, almt_itvl, beam_width = key
+            for stage, item in results[key]['prof'].items():
+                f.write('{},{},{:g},{},{},{:.6f},{:.9f},{:.4f},{},{}\n'.format(fig_id, almt_itvl, beam_width, stage,
+                        item['calls'], item['time'], item['time_per_call'], item['share'], item.get('mem', ''),
+                        item.get('peak', '')))
+
+def save_figs(out_dir, results):
+    '''
+    Render one image per figure and beam width, one curve per alignment interval
+    '''
+    for fig_id, beam_width in sorted(set((key[0], key[2]) for key in results.keys())):
+        itvls = sorted(key[1] for key in results.keys() if key[0] == fig_id and key[2] == beam_width)
+        series = [results[(fig_id, almt_itvl, beam_width)] for almt_itvl in itvls]
+
+        matplotlib.pyplot.figure()
+        if tuple(itvls) == tuple(flytera_cfg.figs[fig_id]['beam_alignment_itvl']):
+            # The configuration of the paper, same plot as main.py
+            main.plot_fig(fig_id, series[0]['sim_time'], series[0]['nmlzd_cap'], series[1]['nmlzd_cap'],
+                          series[2]['nmlzd_cap'])
+        else:
+            for almt_itvl, result in zip(itvls, series):
+                matplotlib.pyplot.plot(result['sim_time'], result['nmlzd_cap'], label='Alignment interval {}'.format(almt_itvl))
+            matplotlib.pyplot.legend(loc='lower left')
+            matplotlib.pyplot.xlabel('Time (s)')
+            matplotlib.pyplot.ylabel('Normalized Capacity')
+            matplotlib.pyplot.grid(True)
+
+        # Ensemble runs: quantile band of the realizations around the mean
+        for result in series:
+            if 'nmlzd_cap_band_low' in result:
+                matplotlib.pyplot.fill_between(result['sim_time'], result['nmlzd_cap_band_low'],
+                                               result['nmlzd_cap_band_high'], alpha=0.2)
+
+        fname = 'fig{}_bw{:g}.png'.format(fig_id, beam_width)
+        matplotlib.pyplot.savefig(os.path.join(out_dir, fname))
+        matplotlib.pyplot.close()
+
+if __name__ == '__main__':
+    args = get_args()
+
+    if not os.path.isdir(args.out_dir):
+        os.makedirs(args.out_dir)
+
+    time_start = time.perf_counter()
+    results = sweep.run_sweep(args.fig, args.itvl, args.beam_width, args.seed, args.workers, args.sim_tick,
+                              args.ensemble, args.engine, args.prof, args.ckpt_dir, not args.no_cache)
+    time_total = time.perf_counter() - time_start
+
+    # Report wall-clock time of each run
+    for key in sorted(results.keys()):
+        print('fig {}, itvl {}, beam width {:g}: {:.3f} s'.format(key[0], key[1], key[2], results[key]['wall_time']))
+    print('Total: {:.3f} s for {} runs'.format(time_total, len(results)))
+
+    # Report the stage profile of each run
+    if args.prof is not None:
+        for key in sorted(results.keys()):
+            print('\nfig {}, itvl {}, beam width {:g}:'.format(key[0], key[1], key[2]))
+            print(profiler.format_report(results[key]['prof']))
+        save_prof(args.out_dir, results)
+
+    save_series(args.out_dir, results)
+    save_figs(args.out_dir, results)
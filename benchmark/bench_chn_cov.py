@@ -0,0 +1,150 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: channel covariance estimation of a cognitive LTE BS,
+## lte_bs_cog.est_chn_cov_from_wifi, across BS antenna counts and
+## numbers of channel samples
+##
+##   loop    - the former estimator, one getH and matmul per slot
+##   einsum  - all slots at once with np.einsum over the slot axis
+##   batched - est_chn_cov_from_wifi with all samples in one chunk
+##   stream  - est_chn_cov_from_wifi with chunks of 10^4 samples
+##
+## The peak memory of the two est_chn_cov_from_wifi paths is measured
+## with tracemalloc.
+##
+## Usage: python benchmark/bench_chn_cov.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, contextlib, tracemalloc
+
+import numpy as np
+
+import netcfg, net_ntwk, net_name
+
+# Parameters of each result, the other entries are times, in second, and peak memory in byte
+params = ('num_ant', 'num_smpl')
+
+def new_net(num_ant, num_wifi = 4):
+    '''
+    Create a network of one cognitive LTE BS with num_ant antennas and num_wifi active single-antenna Wi-Fi users
+    '''
+    netcfg.plot_net = False
+    netcfg.chnl_lazy = False
+    netcfg.dft_num_ant_bs = num_ant
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        nt = net_ntwk.new_ntwk()
+        nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)
+        nt.add_node(net_name.lte_bs_cog, 1)
+        nt.add_node(net_name.wifi_usr, num_wifi)
+        nt.ini_dist()
+        nt.ini_channel()
+
+    return nt, nt.get_netelmt(nt.list_lte_bs[0])
+
+def get_sum_chn_matrix(bs, num_chn_smpl):
+    '''
+    Channel samples summed over all active Wi-Fi stations, drawn as the former estimator did
+    '''
+    sum_chn_matrix = None
+    for name_wifi_sta in bs.ntwk.list_active_wifi_sta:
+        obj_chnl = bs.get_netelmt(bs.channel.get_name_chanl_2node(bs.name, name_wifi_sta))
+        matx_chnl = obj_chnl.gnrt_chnl_matrix(obj_chnl.get_dimension(num_chn_smpl))
+        sum_chn_matrix = matx_chnl if sum_chn_matrix is None else sum_chn_matrix + matx_chnl
+
+    return sum_chn_matrix
+
+def est_loop(bs, num_chn_smpl):
+    '''
+    The former reduction, one slot at a time
+    '''
+    sum_chn_matrix = get_sum_chn_matrix(bs, num_chn_smpl)
+    chn_cov = None
+    for slot_id in range(num_chn_smpl):
+        sum_chnl_this_slot = sum_chn_matrix[:, :, slot_id]
+        mul_chnl_chnlH = np.matmul(sum_chnl_this_slot, np.matrix.getH(sum_chnl_this_slot))
+        chn_cov = mul_chnl_chnlH if chn_cov is None else chn_cov + mul_chnl_chnlH
+
+    return chn_cov/num_chn_smpl
+
+def est_einsum(bs, num_chn_smpl):
+    '''
+    All slots at once with einsum
+    '''
+    sum_chn_matrix = get_sum_chn_matrix(bs, num_chn_smpl)
+
+    return np.einsum('ijs,kjs->ik', sum_chn_matrix, sum_chn_matrix.conj())/num_chn_smpl
+
+def est_bs(bs, num_chn_smpl, chunk):
+    with contextlib.redirect_stdout(io.StringIO()):
+        bs.est_chn_cov_from_wifi(num_chn_smpl, chunk)
+
+    return bs.chn_cov
+
+def get_peak(func):
+    '''
+    Peak memory allocated during func, in byte
+    '''
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak
+
+def run(num_ants = (4, 16, 64), num_smpls = (10**3, 10**4, 10**5, 10**6), max_loop = 10**4, max_einsum = 10**5,
+        max_batched = 2*10**7, stream_chunk = 10**4):
+    '''
+    Time the estimators for each antenna count and number of samples; the loop only up to max_loop samples,
+    einsum only up to max_einsum samples, batched only up to max_batched antennas x samples (16 byte each)
+    Return: list of dictionaries, one per combination
+    '''
+    results = []
+    for num_ant in num_ants:
+        nt, bs = new_net(num_ant)
+
+        # All paths reduce the same samples when drawn from the same random state
+        np.random.seed(0)
+        chn_cov_loop = est_loop(bs, 1000)
+        for func in [lambda: est_einsum(bs, 1000), lambda: est_bs(bs, 1000, 1000)]:
+            np.random.seed(0)
+            assert np.allclose(func(), chn_cov_loop, rtol=1e-10, atol=1e-10)
+
+        for num_smpl in num_smpls:
+            repeat = 3 if num_smpl <= 10**5 else 1
+            batched = num_ant * num_smpl <= max_batched
+            results.append({'num_ant': num_ant, 'num_smpl': num_smpl,
+                            'loop': timeit(lambda: est_loop(bs, num_smpl), repeat) if num_smpl <= max_loop else None,
+                            'einsum': timeit(lambda: est_einsum(bs, num_smpl), repeat) if num_smpl <= max_einsum else None,
+                            'batched': timeit(lambda: est_bs(bs, num_smpl, num_smpl), repeat) if batched else None,
+                            'stream': timeit(lambda: est_bs(bs, num_smpl, stream_chunk), repeat),
+                            'batched_peak': get_peak(lambda: est_bs(bs, num_smpl, num_smpl)) if batched else None,
+                            'stream_peak': get_peak(lambda: est_bs(bs, num_smpl, stream_chunk))})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>5s}{:>10s}{:>12s}{:>12s}{:>14s}{:>13s}{:>16s}{:>15s}'.format('ants', 'samples', 'loop (ms)', 'einsum (ms)',
+          'batched (ms)', 'stream (ms)', 'batched (MB)', 'stream (MB)'))
+    for result in results:
+        fmt = lambda t: '-' if t is None else '{:.2f}'.format(1e3 * t)
+        fmt_mb = lambda m: '-' if m is None else '{:.1f}'.format(m/2**20)
+        print('{:>5d}{:>10d}{:>12s}{:>12s}{:>14s}{:>13s}{:>16s}{:>15s}'.format(result['num_ant'], result['num_smpl'],
+              fmt(result['loop']), fmt(result['einsum']), fmt(result['batched']), fmt(result['stream']),
+              fmt_mb(result['batched_peak']), fmt_mb(result['stream_peak'])))
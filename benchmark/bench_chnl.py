@@ -0,0 +1,91 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: regeneration of all node-to-node channels in one
+## coherent time interval as the number of nodes grows
+##
+##   per_pair - the former reset_chnl/refresh_chnl, one name lookup and
+##              one Rician draw per channel object
+##   store    - net_ntwk.reset_chnl, then all channels regenerated by the
+##              channel store, one vectorized draw per channel dimension
+##
+## Usage: python benchmark/bench_chnl.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, contextlib
+
+import netcfg, net_ntwk, net_name
+
+# Parameters of each result, the other entries are times
+params = ('num_node', 'num_chnl')
+
+def new_net(num_node):
+    '''
+    Create a network of num_node nodes, 1/10 LTE BSs with 16 antennas, the others single-antenna Wi-Fi users,
+    with the channels of all node pairs
+    '''
+    netcfg.plot_net = False
+    netcfg.chnl_lazy = False
+
+    # The creation of the channels prints one line per channel
+    with contextlib.redirect_stdout(io.StringIO()):
+        nt = net_ntwk.new_ntwk()
+        nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)
+        nt.add_node(net_name.lte_bs, max(1, num_node // 10))
+        nt.add_node(net_name.wifi_usr, num_node - max(1, num_node // 10))
+        nt.ini_dist()
+        nt.ini_channel()
+
+    return nt
+
+def refresh_per_pair(nt):
+    '''
+    The former reset_chnl and refresh_chnl: every channel object resolved by name, one draw per channel
+    '''
+    chnl_objs = [nt.get_netelmt(chnl_name) for chnl_name in nt.name_list_all_n2n_chnl]
+    for chnl_obj in chnl_objs:
+        chnl_obj.gnrt_chnl_matrix(chnl_obj.chnl_dim)
+
+def refresh_store(nt):
+    '''
+    All channels regenerated in the channel store, whether or not they were used in the last interval
+    '''
+    nt.reset_chnl()
+    nt.chnl_store.refresh(sel_all=True)
+
+def run(num_nodes = (10, 50, 100, 200)):
+    '''
+    Time both paths for each network size
+    Return: list of dictionaries, one per network size
+    '''
+    results = []
+    for num_node in num_nodes:
+        nt = new_net(num_node)
+        repeat = 5
+
+        results.append({'num_node': num_node, 'num_chnl': len(nt.name_list_all_n2n_chnl),
+                        'per_pair': timeit(lambda: refresh_per_pair(nt), repeat),
+                        'store': timeit(lambda: refresh_store(nt), repeat)})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>10s}{:>16s}{:>14s}'.format('nodes', 'channels', 'per_pair (ms)', 'store (ms)'))
+    for result in results:
+        print('{:>8d}{:>10d}{:>16.3f}{:>14.3f}'.format(result['num_node'], result['num_chnl'], 1e3 * result['per_pair'],
+                                                       1e3 * result['store']))
@@ -0,0 +1,112 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: node-to-node channels created on first access
+## (netcfg.chnl_lazy), each node using the channels to a few other
+## nodes, as the number of nodes grows
+##
+##   eager    - ini_channel with the channels of all node pairs, up
+##              to max_eager nodes
+##   lazy     - ini_channel with the channels created on first access
+##   access   - first access of all used channels, creation and
+##              coefficients
+##   interval - one coherent time interval: reset_chnl, refresh_chnl
+##              and an access of all used channels
+##   mem      - memory allocated by the lazy channels, in MB
+##
+## Usage: python benchmark/bench_chnl_lazy.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, time, random, contextlib, tracemalloc
+
+import numpy as np
+
+import netcfg, net_ntwk, net_name
+
+# Parameters of each result, the other entries are times
+params = ('num_node', 'num_chnl')
+
+def new_net(num_node, lazy):
+    '''
+    Create a network of num_node nodes, 1/10 LTE BSs with 16 antennas, the others single-antenna Wi-Fi users, and
+    its channels
+    Return: the network and the time of ini_channel in second
+    '''
+    netcfg.plot_net = False
+    netcfg.chnl_lazy = lazy
+
+    random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        nt = net_ntwk.new_ntwk()
+        nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)
+        nt.add_node(net_name.lte_bs, max(1, num_node // 10))
+        nt.add_node(net_name.wifi_usr, num_node - max(1, num_node // 10))
+
+        time_start = time.perf_counter()
+        nt.ini_channel()
+        time_ini = time.perf_counter() - time_start
+
+    return nt, time_ini
+
+def run(num_nodes = (200, 1000, 5000), num_peer = 4, max_eager = 200, repeat = 3):
+    '''
+    Time the channels of each network size, each node using the channels to num_peer random other nodes
+    Return: list of dictionaries, one per network size, time in second
+    '''
+    rng = np.random.RandomState(0)
+
+    results = []
+    for num_node in num_nodes:
+        time_eager = new_net(num_node, False)[1] if num_node <= max_eager else None
+
+        tracemalloc.start()
+        nt, time_lazy = new_net(num_node, True)
+        mem_start = tracemalloc.get_traced_memory()[0]
+
+        pairs = [(idx1, int(idx2)) for idx1 in range(num_node) for idx2 in rng.choice(num_node, num_peer)
+                 if idx2 != idx1]
+
+        def access():
+            for idx1, idx2 in pairs:
+                nt.get_chnl_n2n(idx1, idx2).chnl_matrix
+
+        def interval():
+            nt.reset_chnl()
+            nt.refresh_chnl()
+            access()
+
+        time_start = time.perf_counter()
+        access()
+        time_access = time.perf_counter() - time_start
+        mem = tracemalloc.get_traced_memory()[0] - mem_start
+        tracemalloc.stop()
+
+        results.append({'num_node': num_node, 'num_chnl': len(nt.n2n_chnl), 'eager': time_eager, 'lazy': time_lazy,
+                        'access': time_access, 'interval': timeit(interval, repeat), 'mem': mem / 1e6})
+
+    netcfg.chnl_lazy = True
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>10s}{:>12s}{:>11s}{:>13s}{:>15s}{:>10s}'.format('nodes', 'channels', 'eager (s)', 'lazy (s)',
+          'access (s)', 'interval (s)', 'mem (MB)'))
+    for result in results:
+        eager = '-' if result['eager'] is None else '{:.3f}'.format(result['eager'])
+        print('{:>8d}{:>10d}{:>12s}{:>11.3f}{:>13.3f}{:>15.3f}{:>10.2f}'.format(result['num_node'], result['num_chnl'],
+              eager, result['lazy'], result['access'], result['interval'], result['mem']))
@@ -0,0 +1,107 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: distance matrix maintenance as the number of nodes grows
+##
+## Compares, per tick with two moving nodes (the drones):
+##   rebuild - the former ini_dist, one vstack per node
+##   ini     - full broadcast rebuild, net_ntwk.ini_dist
+##   updt    - incremental update of the moved rows/columns, net_ntwk.updt_dist
+##
+## Usage: python benchmark/bench_dist.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import numpy as np
+
+import netcfg, net_ntwk, net_name
+
+# Parameters of each result, the other entries are times
+params = ('num_node',)
+
+def new_net(num_node):
+    '''
+    Create a network of num_node regular nodes, the first two moving as the drones
+    '''
+    netcfg.plot_net = False
+    nt = net_ntwk.new_ntwk()
+    nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)
+    nt.add_node(net_name.lte_ue, num_node)
+    nt.ini_dist()
+
+    return nt
+
+def rebuild_dist(nt):
+    '''
+    The former ini_dist: one row per node, appended with vstack
+    '''
+    dist_matrix = None
+    array_axis_x = np.asarray(nt.axis_x)
+    array_axis_y = np.asarray(nt.axis_y)
+    array_axis_z = np.asarray(nt.axis_z)
+    for node_index in range(nt.tot_node_num):
+        curr_dst_array = np.sqrt(np.power(nt.axis_x[node_index] - array_axis_x, 2) + np.power(nt.axis_y[node_index] - array_axis_y, 2)\
+                                 + np.power(nt.axis_z[node_index] - array_axis_z, 2))
+        if dist_matrix is None:
+            dist_matrix = curr_dst_array
+        else:
+            dist_matrix = np.vstack([dist_matrix, curr_dst_array])
+
+    return dist_matrix
+
+def move(nt, step):
+    '''
+    Move the first two nodes, as the two drones do every tick
+    '''
+    for name in nt.name_list_all_nodes[:2]:
+        node = nt.get_netelmt(name)
+        node.set_coord({'x': node.coord_x + step, 'y': node.coord_y, 'z': node.coord_z})
+
+def run(num_nodes = (10, 100, 500, 1000, 2000, 4000), max_rebuild = 1000):
+    '''
+    Time the three paths for each network size, rebuild only up to max_rebuild nodes
+    Return: list of dictionaries, one per network size
+    '''
+    results = []
+    for num_node in num_nodes:
+        nt = new_net(num_node)
+        repeat = 20 if num_node <= 1000 else 3
+
+        def updt():
+            move(nt, 0.01)
+            nt.updt_dist()
+
+        result = {'num_node': num_node,
+                  'ini': timeit(nt.ini_dist, repeat),
+                  'updt': timeit(updt, repeat),
+                  'rebuild': timeit(lambda: rebuild_dist(nt), min(repeat, 3)) if num_node <= max_rebuild else None}
+
+        # The incremental matrix must agree with a full rebuild
+        updt()
+        dist_matrix = nt.dist_matrix.copy()
+        nt.ini_dist()
+        assert np.array_equal(dist_matrix, nt.dist_matrix)
+
+        results.append(result)
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>14s}{:>14s}{:>14s}'.format('nodes', 'rebuild (ms)', 'ini (ms)', 'updt (ms)'))
+    for result in results:
+        rebuild = '-' if result['rebuild'] is None else '{:.3f}'.format(1e3 * result['rebuild'])
+        print('{:>8d}{:>14s}{:>14.3f}{:>14.3f}'.format(result['num_node'], rebuild, 1e3 * result['ini'], 1e3 * result['updt']))
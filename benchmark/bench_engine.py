@@ -0,0 +1,114 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: simpy against the fixed-step engine (step_engine.py)
+## for the tick runs of FlyTera.run_net
+##
+##   sched - the scheduling alone, the processes of a run (two dhs,
+##           beam alignment every 10 ticks, network operation) with
+##           empty steps
+##   run   - a whole run_net of figure 1, with the lookup table of
+##           the overlap so that the steps themselves are cheap
+##
+## Usage: python benchmark/bench_engine.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, contextlib
+
+import numpy as np
+
+import simpy
+
+import netcfg, flytera_cfg, step_engine, FlyTera
+
+# Parameters of each result, the other entries are times
+params = ('bench', 'num_tick')
+
+def step_none(tick):
+    pass
+
+def proc_none(env, period):
+    while True:
+        step_none(env.now)
+        yield env.timeout(period)
+
+# Periods of the processes of a run: two dhs, beam alignment, network operation
+periods = [1, 1, 10, 1]
+
+def sched_simpy(num_tick):
+    env = simpy.Environment()
+    for period in periods:
+        env.process(proc_none(env, period))
+    env.run(until=num_tick)
+
+def sched_step(num_tick):
+    eng = step_engine.step_engine()
+    for period in periods:
+        eng.add_task(step_none, period)
+    eng.run(until=num_tick)
+
+def run_net(engine, num_tick, almt_itvl = 10):
+    '''
+    A run of figure 1 with the given engine
+    Return: the normalized capacity of the run
+    '''
+    netcfg.plot_net = False
+    fig = flytera_cfg.figs['1']
+    flytera_cfg.gry_trace_id = fig['gry_trace_id']
+    flytera_cfg.lac_trace_id = fig['lac_trace_id']
+    flytera_cfg.angle        = fig['beam_width']
+    flytera_cfg.sim_tick     = num_tick
+    flytera_cfg.kin_mode     = 'tick'
+    flytera_cfg.ovlp_engine  = 'lut'
+    flytera_cfg.sim_engine   = engine
+    flytera_cfg.cache_dir    = None
+
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        rcd = FlyTera.run_net(almt_itvl)
+
+    return rcd.get('nmlzd_cap')
+
+def run(num_ticks = (10**3, 10**4, 10**5), run_ticks = (10**3, 10**4)):
+    '''
+    Time both engines, the scheduling for num_ticks ticks and whole runs for run_ticks ticks
+    Return: list of dictionaries, one per benchmark and number of ticks, time in second
+    '''
+    results = []
+    for num_tick in num_ticks:
+        repeat = 5 if num_tick <= 10**4 else 2
+        results.append({'bench': 'sched', 'num_tick': num_tick,
+                        'simpy': timeit(lambda: sched_simpy(num_tick), repeat),
+                        'step': timeit(lambda: sched_step(num_tick), repeat)})
+
+    for num_tick in run_ticks:
+        # Both engines give the same results
+        assert np.array_equal(run_net('simpy', num_tick), run_net('step', num_tick))
+
+        repeat = 3 if num_tick <= 10**3 else 1
+        results.append({'bench': 'run', 'num_tick': num_tick,
+                        'simpy': timeit(lambda: run_net('simpy', num_tick), repeat),
+                        'step': timeit(lambda: run_net('step', num_tick), repeat)})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>6s}{:>8s}{:>13s}{:>12s}{:>10s}'.format('bench', 'ticks', 'simpy (ms)', 'step (ms)', 'speedup'))
+    for result in results:
+        print('{:>6s}{:>8d}{:>13.2f}{:>12.2f}{:>10.1f}'.format(result['bench'], result['num_tick'], 1e3 * result['simpy'],
+              1e3 * result['step'], result['simpy'] / result['step']))
@@ -0,0 +1,72 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: whole FlyTera.run_net runs of the six figures, all
+## beam alignment intervals of each figure, with the default
+## tick mode, simpy and overlap engine of flytera_cfg, without the
+## result cache
+##
+## Usage: python benchmark/bench_figs.py
+#######################################################
+
+import bench_util
+
+import io, time, contextlib
+
+import numpy as np
+
+import netcfg, flytera_cfg, FlyTera
+
+# Parameters of each result, the other entries are times
+params = ('fig',)
+
+def run_fig(fig_id, sim_tick):
+    '''
+    The runs of one figure, as main.py does them
+    Return: wall-clock time in second
+    '''
+    netcfg.plot_net = False
+    fig = flytera_cfg.figs[fig_id]
+    flytera_cfg.gry_trace_id = fig['gry_trace_id']
+    flytera_cfg.lac_trace_id = fig['lac_trace_id']
+    flytera_cfg.angle        = fig['beam_width']
+    flytera_cfg.sim_tick     = sim_tick
+    flytera_cfg.cache_dir    = None
+
+    np.random.seed(0)
+    time_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for almt_itvl in fig['beam_alignment_itvl']:
+            FlyTera.run_net(almt_itvl)
+
+    return time.perf_counter() - time_start
+
+def run(fig_ids = None, sim_tick = None, repeat = 1):
+    '''
+    Time the runs of each figure, the best of repeat
+    sim_tick: the number of ticks of each run, default flytera_cfg.sim_tick
+    Return: list of dictionaries, one per figure, time in second
+    '''
+    if fig_ids is None:
+        fig_ids = sorted(flytera_cfg.figs.keys())
+    if sim_tick is None:
+        sim_tick = flytera_cfg.sim_tick
+
+    return [{'fig': fig_id, 'run_net': min(run_fig(fig_id, sim_tick) for _ in range(repeat))} for fig_id in fig_ids]
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>4s}{:>14s}'.format('fig', 'run_net (s)'))
+    for result in results:
+        print('{:>4s}{:>14.3f}'.format(result['fig'], result['run_net']))
@@ -0,0 +1,99 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: one tick of a drone network with all-pairs links,
+## for each number of dhs and overlap engine
+##
+##   dhs      - dhs.step of all drones
+##   ntwk     - net_ntwk_dhs.step, relative poses, wavefronts and
+##              normalized capacity of all links
+##   per_link - ntwk divided by the number of links
+##
+## Usage: python benchmark/bench_links.py
+#######################################################
+
+import bench_util
+
+import io, time, contextlib
+
+import numpy as np
+
+import netcfg, flytera_cfg, net_ntwk, net_name, ovlpmdl
+
+# Parameters of each result, the other entries are times
+params = ('engine', 'num_dhs')
+
+def new_net(num_dhs):
+    '''
+    Create and pre-process a figure-1 network of num_dhs dhs, all ordered pairs linked
+    '''
+    netcfg.plot_net = False
+    fig = flytera_cfg.figs['1']
+    flytera_cfg.gry_trace_id = fig['gry_trace_id']
+    flytera_cfg.lac_trace_id = fig['lac_trace_id']
+    flytera_cfg.angle        = fig['beam_width']
+    flytera_cfg.num_dhs      = num_dhs
+    flytera_cfg.dhs_links    = 'all'
+
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        nt = net_ntwk.new_ntwk()
+        nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)
+        nt.add_node(net_name.dhs, flytera_cfg.num_dhs)
+        nt.pre_processing()
+
+    return nt
+
+def run(engines = ('quad', 'lut'), num_dhs = (2, 10, 50), num_tick = 20):
+    '''
+    Time the stages over num_tick ticks for each overlap engine and number of dhs
+    Return: list of dictionaries, one per engine and number of dhs, time per tick in second
+    '''
+    results = []
+    for engine in engines:
+        flytera_cfg.ovlp_engine = engine
+
+        # The lookup table is loaded, or built, before the timing
+        if engine == 'lut':
+            with contextlib.redirect_stdout(io.StringIO()):
+                ovlpmdl.get_lut()
+
+        for num in num_dhs:
+            nt = new_net(num)
+            nt.align()
+
+            spent = {'dhs': 0.0, 'ntwk': 0.0}
+            for tick in range(num_tick):
+                time_start = time.perf_counter()
+                for obj_node in nt.dhs_list:
+                    obj_node.step(tick)
+                time_dhs = time.perf_counter()
+                nt.step(tick)
+                time_end = time.perf_counter()
+
+                spent['dhs']  += time_dhs - time_start
+                spent['ntwk'] += time_end - time_dhs
+
+            results.append({'engine': engine, 'num_dhs': num, 'dhs': spent['dhs'] / num_tick,
+                            'ntwk': spent['ntwk'] / num_tick,
+                            'per_link': spent['ntwk'] / num_tick / nt.link_tsmt.size})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>9s}{:>11s}{:>11s}{:>16s}'.format('engine', 'num_dhs', 'dhs (ms)', 'ntwk (ms)', 'per link (us)'))
+    for result in results:
+        print('{:>8s}{:>9d}{:>11.3f}{:>11.3f}{:>16.2f}'.format(result['engine'], result['num_dhs'], 1e3 * result['dhs'],
+              1e3 * result['ntwk'], 1e6 * result['per_link']))
@@ -0,0 +1,86 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: overlap of transmit wavefront and receive surface,
+## ovlpmdl.get_nmlzd_cap_cfg for each overlap engine
+##
+##   single - one pose per call, as in a tick run
+##   batch  - all poses in one call, as in trace and ensemble runs
+##            (not for shapely, which loops over the poses)
+##
+## Usage: python benchmark/bench_ovlp.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, math, contextlib
+
+import numpy as np
+
+import flytera_cfg, ovlpmdl
+
+# Parameters of each result, the other entries are times
+params = ('engine',)
+
+def get_poses(num_pose, seed = 0):
+    '''
+    Random poses of the receive ellipse around the rim of the wavefront, within the communication distances of the
+    lookup table
+    Return: tuple of arrays (tsmt_radius, center_x, center_y, semi_x, semi_y, angle)
+    '''
+    rng = np.random.RandomState(seed)
+    radius = flytera_cfg.radius
+
+    tsmt_radius = math.tan(flytera_cfg.angle/180 * math.pi) * rng.uniform(*flytera_cfg.lut_comm_dist, size=num_pose)
+    rho = tsmt_radius + rng.uniform(-1.5, 1.5, size=num_pose) * radius
+    phi = rng.uniform(-math.pi, math.pi, size=num_pose)
+    semi_x = rng.uniform(0.6, 1, size=num_pose) * radius
+    semi_y = rng.uniform(0.6, 1, size=num_pose) * radius
+    angle = rng.uniform(-180, 180, size=num_pose)
+
+    return tsmt_radius, rho * np.cos(phi), rho * np.sin(phi), semi_x, semi_y, angle
+
+def run(engines = ('quad', 'lut', 'shapely'), num_single = 200, num_batch = 10**4):
+    '''
+    Time each engine on num_single poses one at a time and num_batch poses in one call
+    Return: list of dictionaries, one per engine, time per pose in second
+    '''
+    singles = get_poses(num_single)
+    batch = get_poses(num_batch, seed=1)
+
+    results = []
+    for engine in engines:
+        flytera_cfg.ovlp_engine = engine
+
+        # The lookup table is loaded, or built, before the timing
+        with contextlib.redirect_stdout(io.StringIO()):
+            ovlpmdl.get_nmlzd_cap_cfg(*[x[:1] for x in singles])
+
+        def single():
+            for i in range(num_single):
+                ovlpmdl.get_nmlzd_cap_cfg(*[float(x[i]) for x in singles])
+
+        results.append({'engine': engine, 'single': timeit(single, 3) / num_single,
+                        'batch': timeit(lambda: ovlpmdl.get_nmlzd_cap_cfg(*batch), 3) / num_batch
+                                 if engine != 'shapely' else None})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>14s}{:>14s}'.format('engine', 'single (us)', 'batch (us)'))
+    for result in results:
+        fmt = lambda t: '-' if t is None else '{:.2f}'.format(1e6 * t)
+        print('{:>8s}{:>14s}{:>14s}'.format(result['engine'], fmt(result['single']), fmt(result['batch'])))
@@ -0,0 +1,87 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: per-call cost of the ellipse polygon of antmdl.cone_mdl
+##
+##   affinity  - the former path, buffer(1) and three shapely.affinity transforms
+##   template  - cone_mdl.get_polygon, unit circle template and one affine map
+##   cached    - cone_mdl.get_polygon with unchanged information (the transmitter)
+##
+## Usage: python benchmark/bench_polygon.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import numpy as np
+import shapely.affinity
+from shapely.geometry.point import Point
+
+import antmdl
+
+# Parameters of each result, the other entries are times
+params = ()
+
+def get_polygon_affinity(info):
+    '''
+    The former cone_mdl.get_polygon
+    '''
+    polygon = Point((0, 0)).buffer(1)
+    polygon = shapely.affinity.scale(polygon, info['semi_xy'][0], info['semi_xy'][1])
+    polygon = shapely.affinity.rotate(polygon, info['angle'])
+    return shapely.affinity.translate(polygon, info['center'][0], info['center'][1], 0)
+
+def get_infos(num_call, seed = 0):
+    '''
+    Random receive ellipses, all different
+    '''
+    rng = np.random.RandomState(seed)
+    return [{'center': (rng.uniform(-1, 1), rng.uniform(-1, 1)), 'semi_xy': (rng.uniform(0.03, 0.04), rng.uniform(0.03, 0.04)),
+             'angle': rng.uniform(-180, 180)} for _ in range(num_call)]
+
+def run(num_call = 2000):
+    '''
+    Time each path over num_call calls
+    Return: dictionary of the time per call in second
+    '''
+    infos = get_infos(num_call)
+    tsmt_info = {'center': (0, 0), 'semi_xy': (1.7, 1.7), 'angle': 0}
+
+    mdl = antmdl.cone_mdl()
+
+    def affinity():
+        for info in infos:
+            get_polygon_affinity(info)
+
+    def template():
+        for info in infos:
+            mdl.get_polygon(info)
+
+    def cached():
+        for _ in infos:
+            mdl.get_polygon(tsmt_info)
+
+    # Both paths must build the same polygon
+    for info in infos[:100]:
+        xy_old = np.array(get_polygon_affinity(info).exterior.coords)
+        xy_new = np.array(mdl.get_polygon(info).exterior.coords)
+        assert np.allclose(xy_old, xy_new, rtol=0, atol=1e-12)
+
+    return {name: timeit(func, 5) / num_call for name, func in
+            [('affinity', affinity), ('template', template), ('cached', cached)]}
+
+if __name__ == '__main__':
+    result = run()
+    for name in result:
+        print('{:10s}{:10.2f} us/call'.format(name, 1e6 * result[name]))
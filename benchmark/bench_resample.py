@@ -0,0 +1,74 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: resampling of the traces to the simulation rate,
+## for each number of samples of the trace
+##
+##   up      - trace_store.resample from 15 Hz to 200 Hz
+##   down    - trace_store.resample from 200 Hz to 15 Hz
+##   down_aa - the same with the anti-alias filter
+##   cached  - trace_store.get_resampled of a trace already resampled,
+##             in a new store, i.e., loaded from the disk cache
+##
+## Usage: python benchmark/bench_resample.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, contextlib
+
+import numpy as np
+
+import flytera_cfg, trace_store
+
+# Parameters of each result, the other entries are times
+params = ('num_smpl',)
+
+def run(num_smpls = (10**3, 10**5), repeat = 3):
+    '''
+    Time the resampling of a random 4-column trace of each number of samples, and the cached large-scale trace
+    Return: list of dictionaries, one per number of samples, time in second
+    '''
+    rng = np.random.RandomState(0)
+
+    results = []
+    for num_smpl in num_smpls:
+        trace = rng.standard_normal((num_smpl, 4))
+        results.append({'num_smpl': num_smpl,
+                        'up': timeit(lambda: trace_store.resample(trace, 15, 200), repeat),
+                        'down': timeit(lambda: trace_store.resample(trace, 200, 15), repeat),
+                        'down_aa': timeit(lambda: trace_store.resample(trace, 200, 15, True), repeat)})
+
+    # Resampled once into the cache, then loaded by new stores as a new process would
+    name = flytera_cfg.gry_trace_name[8]
+    with contextlib.redirect_stdout(io.StringIO()):
+        flytera_cfg.dhs_trace.get_resampled(name, 15, 200)
+
+    def cached():
+        store = trace_store.trace_store(flytera_cfg.mat_fname)
+        with contextlib.redirect_stdout(io.StringIO()):
+            np.asarray(store.get_resampled(name, 15, 200))
+
+    results.append({'num_smpl': flytera_cfg.dhs_trace[name].shape[0], 'cached': timeit(cached, repeat)})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>10s}{:>11s}{:>13s}{:>16s}{:>15s}'.format('samples', 'up (ms)', 'down (ms)', 'down_aa (ms)', 'cached (ms)'))
+    for result in results:
+        print('{:>10d}'.format(result['num_smpl']) + ''.join('{:>{}s}'.format('-' if key not in result else
+              '{:.3f}'.format(1e3 * result[key]), width) for key, width in [('up', 11), ('down', 13), ('down_aa', 16),
+                                                                             ('cached', 15)]))
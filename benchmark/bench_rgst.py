@@ -0,0 +1,101 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: network element lookups through the registry of the
+## network (net_func.elmt_registry) as the number of nodes grows
+##
+##   ini_channel - creation of the channels of all node pairs
+##   by_name     - get_netelmt of every channel by name
+##   by_handle   - rgst[handle] of every channel
+##   chnl_name   - channel between two nodes by constructing its name
+##   chnl_index  - channel between two nodes by ntwk.get_chnl_n2n
+##
+## Usage: python benchmark/bench_rgst.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, time, contextlib
+
+import netcfg, net_ntwk, net_name
+
+# Parameters of each result, the other entries are times
+params = ('num_node',)
+
+def new_net(num_node):
+    '''
+    Create a network of num_node Wi-Fi users with the channels of all node pairs
+    Return: the network and the time of the channel creation in second
+    '''
+    netcfg.plot_net = False
+    netcfg.chnl_lazy = False
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        nt = net_ntwk.new_ntwk()
+        nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)
+        nt.add_node(net_name.wifi_usr, num_node)
+        nt.ini_dist()
+
+        time_start = time.perf_counter()
+        nt.ini_channel()
+        time_ini = time.perf_counter() - time_start
+
+    return nt, time_ini
+
+def run(num_nodes = (10, 50, 100, 200)):
+    '''
+    Time the lookups for each network size
+    Return: list of dictionaries, one per network size, time per lookup in second
+    '''
+    results = []
+    for num_node in num_nodes:
+        nt, time_ini = new_net(num_node)
+
+        chnl_names = nt.name_list_all_n2n_chnl
+        handles = [nt.rgst.get_handle(chnl_name) for chnl_name in chnl_names]
+        nodes = nt.obj_list_all_nodes
+        chnl_module = nodes[0].channel
+        num_lookup = len(chnl_names)
+
+        def by_name():
+            for chnl_name in chnl_names:
+                nt.get_netelmt(chnl_name)
+
+        def by_handle():
+            for handle in handles:
+                nt.rgst[handle]
+
+        def chnl_name():
+            for node_obj in nodes[1:]:
+                nt.get_netelmt(chnl_module.get_name_chanl_2node(nodes[0].name, node_obj.name))
+
+        def chnl_index():
+            for node_obj in nodes[1:]:
+                nt.get_chnl_n2n(0, node_obj.ntwk_wide_index)
+
+        results.append({'num_node': num_node, 'ini_channel': time_ini,
+                        'by_name': timeit(by_name, 5) / num_lookup, 'by_handle': timeit(by_handle, 5) / num_lookup,
+                        'chnl_name': timeit(chnl_name, 5) / (num_node - 1),
+                        'chnl_index': timeit(chnl_index, 5) / (num_node - 1)})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>18s}{:>14s}{:>16s}{:>16s}{:>17s}'.format('nodes', 'ini_channel (s)', 'by_name (us)', 'by_handle (us)',
+          'chnl_name (us)', 'chnl_index (us)'))
+    for result in results:
+        print('{:>8d}{:>18.3f}{:>14.3f}{:>16.3f}{:>16.3f}{:>17.3f}'.format(result['num_node'], result['ini_channel'],
+              1e6 * result['by_name'], 1e6 * result['by_handle'], 1e6 * result['chnl_name'], 1e6 * result['chnl_index']))
@@ -0,0 +1,110 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: node pairs within range in a sparse deployment, about
+## 12 neighbors per node whatever the number of nodes
+##
+##   dense  - dense distance matrix, net_ntwk.ini_dist, then the
+##            pairs within range
+##   build  - net_spatial.spatial_index.query_pairs, tree rebuilt
+##   move   - all nodes moved by less than the skin, then
+##            query_pairs, as in a run
+##   node   - spatial_index.query_node, per query
+##
+## Usage: python benchmark/bench_spatial.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, math, random, contextlib
+
+import numpy as np
+
+import netcfg, net_ntwk, net_name, net_state
+
+# Parameters of each result, the other entries are times
+params = ('num_node',)
+
+# Range in meter, and area in square meter per node
+ngbr_range = 20
+area_per_node = 100
+
+def new_net(num_node):
+    '''
+    Create a network of num_node regular nodes spread over an area growing with their number, 10 meters high
+    '''
+    netcfg.plot_net = False
+    random.seed(0)
+    side = int(math.sqrt(num_node * area_per_node))
+    with contextlib.redirect_stdout(io.StringIO()):
+        nt = net_ntwk.new_ntwk()
+        nt.set_net_area(side, side, 10)
+        nt.add_node(net_name.lte_ue, num_node)
+
+    return nt
+
+def get_pairs_dense(nt):
+    '''
+    Pairs within range from the dense distance matrix
+    '''
+    netcfg.ngbr_range = None
+    nt.ini_dist()
+    return np.argwhere(np.triu(nt.dist_matrix <= ngbr_range, 1))
+
+def run(num_nodes = (1000, 4000, 16000), max_dense = 4000, repeat = 3):
+    '''
+    Time the pair and node queries for each network size, the dense matrix only up to max_dense nodes
+    Return: list of dictionaries, one per network size, time in second
+    '''
+    rng = np.random.RandomState(0)
+
+    results = []
+    for num_node in num_nodes:
+        nt = new_net(num_node)
+        index = nt.spatial
+
+        def build():
+            index.tree = None
+            index.query_pairs(ngbr_range)
+
+        def move():
+            nt.state.get(net_state.pos)[:] += rng.uniform(-0.01, 0.01, (num_node, 3))
+            index.query_pairs(ngbr_range)
+
+        def node():
+            for idx in range(0, num_node, 10):
+                index.query_node(idx, ngbr_range)
+
+        result = {'num_node': num_node,
+                  'dense': timeit(lambda: get_pairs_dense(nt), repeat) if num_node <= max_dense else None,
+                  'build': timeit(build, repeat),
+                  'move': timeit(move, repeat),
+                  'node': timeit(node, repeat) / len(range(0, num_node, 10))}
+
+        # The index must find the same pairs as the dense matrix
+        if num_node <= max_dense:
+            assert np.array_equal(get_pairs_dense(nt), index.query_pairs(ngbr_range))
+
+        results.append(result)
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>12s}{:>12s}{:>12s}{:>12s}'.format('nodes', 'dense (ms)', 'build (ms)', 'move (ms)', 'node (us)'))
+    for result in results:
+        dense = '-' if result['dense'] is None else '{:.3f}'.format(1e3 * result['dense'])
+        print('{:>8d}{:>12s}{:>12.3f}{:>12.3f}{:>12.2f}'.format(result['num_node'], dense, 1e3 * result['build'],
+              1e3 * result['move'], 1e6 * result['node']))
@@ -0,0 +1,103 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: one kinematic tick of a swarm of nodes
+##
+##   per_node - the former dhs.operation update, scalar arithmetic and
+##              set_coord with a new dictionary for each node
+##   step     - net_ntwk.step_nodes, all nodes of the type in one
+##              vectorized, in-place step of the network state
+##
+## Usage: python benchmark/bench_state.py
+#######################################################
+
+import bench_util
+from bench_util import timeit
+
+import io, math, contextlib
+
+import numpy as np
+
+import netcfg, net_ntwk, net_name, net_state
+
+# Parameters of each result, the other entries are times
+params = ('num_node',)
+
+def new_net(num_node):
+    '''
+    Create a network of num_node nodes, all moving
+    '''
+    netcfg.plot_net = False
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        nt = net_ntwk.new_ntwk()
+        nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)
+        nt.add_node(net_name.lte_ue, num_node)
+
+    return nt
+
+def step_per_node(nodes, laac, rpy_vel, dt):
+    '''
+    The former per-node update of dhs.operation
+    '''
+    for i, node in enumerate(nodes):
+        node.roll_vel, node.pitch_vel, node.yaw_vel = rpy_vel[i]
+        node.roll  += node.roll_vel * dt
+        node.pitch += node.pitch_vel * dt
+        node.yaw   += node.yaw_vel * dt
+
+        x = node.coord_x + node.vel_x * dt + 0.5 * laac[i, 0] * math.pow(dt, 2)
+        y = node.coord_y + node.vel_y * dt + 0.5 * laac[i, 1] * math.pow(dt, 2)
+        z = node.coord_z + node.vel_z * dt + 0.5 * laac[i, 2] * math.pow(dt, 2)
+        node.set_coord({'x':x, 'y':y, 'z':z})
+
+        node.vel_x += laac[i, 0] * dt
+        node.vel_y += laac[i, 1] * dt
+        node.vel_z += laac[i, 2] * dt
+
+def run(num_nodes = (2, 10, 100, 1000, 10000), dt = 0.005):
+    '''
+    Time both paths for each number of nodes
+    Return: list of dictionaries, one per number of nodes, time per tick in second
+    '''
+    results = []
+    for num_node in num_nodes:
+        rng = np.random.RandomState(0)
+        laac = rng.standard_normal((num_node, 3))
+        rpy_vel = rng.standard_normal((num_node, 3))
+
+        nt_old = new_net(num_node)
+        nt_new = new_net(num_node)
+        nodes = list(nt_old.rgst.iter_stype(net_name.lte_ue))
+
+        # Both paths must reach the same state
+        nt_new.state.get(net_state.pos)[:] = nt_old.state.get(net_state.pos)
+        for _ in range(3):
+            step_per_node(nodes, laac, rpy_vel, dt)
+            nt_new.step_nodes(net_name.lte_ue, laac, rpy_vel, dt)
+        for name in net_state.buf_names:
+            assert np.allclose(nt_old.state.get(name), nt_new.state.get(name), rtol=1e-12, atol=1e-12)
+
+        repeat = 20 if num_node <= 1000 else 3
+        results.append({'num_node': num_node,
+                        'per_node': timeit(lambda: step_per_node(nodes, laac, rpy_vel, dt), repeat),
+                        'step': timeit(lambda: nt_new.step_nodes(net_name.lte_ue, laac, rpy_vel, dt), repeat)})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>16s}{:>12s}'.format('nodes', 'per_node (us)', 'step (us)'))
+    for result in results:
+        print('{:>8d}{:>16.1f}{:>12.1f}'.format(result['num_node'], 1e6 * result['per_node'], 1e6 * result['step']))
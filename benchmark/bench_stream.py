@@ -0,0 +1,75 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: a long IMU log read sample by sample through
+## trace_stream, as net_node.dhs.step does, for each file format
+##
+##   per_smpl - time per sample, chunks read included
+##   mem      - peak memory allocated while reading, in MB
+##
+## Usage: python benchmark/bench_stream.py
+#######################################################
+
+import bench_util
+
+import os, time, tempfile, tracemalloc
+
+import numpy as np
+
+import trace_stream
+
+# Parameters of each result, the other entries are times
+params = ('fmt', 'num_smpl')
+
+def write_log(fname, num_smpl):
+    '''
+    Write a log of num_smpl samples at 200 Hz, random angular velocity
+    '''
+    rng = np.random.RandomState(0)
+    log = np.column_stack([np.arange(num_smpl) / 200, 0.05 * rng.standard_normal((num_smpl, trace_stream.num_col - 1))])
+    if fname.endswith('.csv'):
+        np.savetxt(fname, log, delimiter=',', fmt='%.6g', header='time,x,y,z', comments='')
+    else:
+        log.tofile(fname)
+
+def run(fmts = ('bin', 'csv'), num_smpl = 200 * 600, chunk = 4096):
+    '''
+    Time the reading of a log of num_smpl samples, 10 minutes at 200 Hz by default, for each file format
+    Return: list of dictionaries, one per format, time in second
+    '''
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt in fmts:
+            fname = os.path.join(tmp_dir, 'log.' + fmt)
+            write_log(fname, num_smpl)
+
+            tracemalloc.start()
+            time_start = time.perf_counter()
+            stream = trace_stream.trace_stream(fname, chunk=chunk)
+            for idx in range(num_smpl):
+                stream.get(idx)
+            time_read = time.perf_counter() - time_start
+            mem = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results.append({'fmt': fmt, 'num_smpl': num_smpl, 'per_smpl': time_read / num_smpl, 'mem': mem / 1e6})
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>6s}{:>10s}{:>16s}{:>10s}'.format('fmt', 'samples', 'per_smpl (us)', 'mem (MB)'))
+    for result in results:
+        print('{:>6s}{:>10d}{:>16.3f}{:>10.2f}'.format(result['fmt'], result['num_smpl'], 1e6 * result['per_smpl'],
+                                                      result['mem']))
@@ -0,0 +1,215 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark suite: runs the benchmarks of this directory, saves
+## the results as JSON and flags regressions against a baseline
+##
+## Each benchmark runs in its own process, so that the settings it
+## changes in flytera_cfg and netcfg do not leak into the next one.
+## Its results are flattened into metrics named
+##     <benchmark>/<param>=<value>/.../<entry>
+## e.g., dist/num_node=1000/updt, all of them lower is better.
+##
+## Example:
+##     python benchmark/bench_suite.py --quick
+##     python benchmark/bench_suite.py --save-baseline
+##     python benchmark/bench_suite.py --bench tick ovlp --baseline benchmark/baseline.json --tol 0.3
+##
+## A run exits with status 1 if any metric is slower than the
+## baseline by more than the tolerance.
+#######################################################
+
+import bench_util
+
+import os, sys, json, time, argparse, platform, importlib, subprocess, tempfile
+
+import numpy as np
+
+# Benchmarks of the suite, name (module bench_<name>) and the arguments of run() in the quick suite, the full suite
+# runs with the defaults of each benchmark
+benches = [
+    ('tick',    {'num_tick': 200, 'repeat': 2}),
+    ('ovlp',    {'num_single': 50, 'num_batch': 10**3}),
+    ('polygon', {'num_call': 500}),
+    ('dist',    {'num_nodes': (10, 100, 1000), 'max_rebuild': 100}),
+    ('chnl',    {'num_nodes': (10, 50)}),
+    ('chnl_lazy', {'num_nodes': (200, 1000), 'repeat': 1}),
+    ('chn_cov', {'num_ants': (4, 16), 'num_smpls': (10**3, 10**4)}),
+    ('rgst',    {'num_nodes': (10, 50)}),
+    ('state',   {'num_nodes': (2, 100, 1000)}),
+    ('engine',  {'num_ticks': (10**3, 10**4), 'run_ticks': (10**3,)}),
+    ('links',   {'num_dhs': (2, 10), 'num_tick': 10}),
+    ('stream',  {'num_smpl': 20000}),
+    ('resample', {'num_smpls': (10**3, 10**4)}),
+    ('spatial', {'num_nodes': (1000, 4000), 'max_dense': 1000}),
+    ('figs',    {'sim_tick': 200}),
+]
+
+bench_dir     = os.path.dirname(os.path.abspath(__file__))
+dft_baseline  = os.path.join(bench_dir, 'baseline.json')
+dft_out_dir   = os.path.join(bench_dir, 'results')
+
+def flatten(name, result, params):
+    '''
+    Func: Metrics of the result of a benchmark, a dictionary or a list of dictionaries
+    params: the entries that are parameters, the other numeric entries are metrics, None entries are skipped
+    Return: dictionary of metric name to value
+    '''
+    rows = result if isinstance(result, list) else [result]
+
+    metrics = {}
+    for row in rows:
+        prefix = '/'.join([name] + ['{}={}'.format(key, row[key]) for key in params if key in row])
+        for key, value in row.items():
+            if key in params or value is None:
+                continue
+            metrics[prefix + '/' + key] = float(value)
+
+    return metrics
+
+def run_bench(name, kwargs):
+    '''
+    Func: Run one benchmark in the current process
+    Return: its metrics
+    '''
+    module = importlib.import_module('bench_' + name)
+
+    return flatten(name, module.run(**kwargs), module.params)
+
+def run_bench_process(name, quick):
+    '''
+    Func: Run one benchmark in a child process of this script
+    Return: its metrics and its wall-clock time in second
+    '''
+    fid, fname = tempfile.mkstemp(suffix='.json')
+    os.close(fid)
+
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', name, '--child-out', fname] + (['--quick'] if quick else [])
+    time_start = time.perf_counter()
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    wall_time = time.perf_counter() - time_start
+
+    try:
+        if proc.returncode != 0:
+            print('Error: Benchmark {} failed\n{}'.format(name, proc.stderr))
+            sys.exit(1)
+        with open(fname) as fid:
+            metrics = json.load(fid)
+    finally:
+        os.remove(fname)
+
+    return metrics, wall_time
+
+def get_meta(quick):
+    '''
+    Func: Information of the machine and the code of a run, for comparing runs over time
+    '''
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                         universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'quick': quick,
+            'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+def compare(metrics, baseline, tol):
+    '''
+    Func: Compare the metrics of a run with those of the baseline
+    tol: relative slow-down tolerated, e.g., 0.25 for 25%
+    Return: list of (metric, baseline value, value, ratio) slower than tolerated, sorted by ratio
+    '''
+    regressions = []
+    for key in sorted(metrics):
+        if key not in baseline or baseline[key] <= 0:
+            continue
+        ratio = metrics[key] / baseline[key]
+        if ratio > 1 + tol:
+            regressions.append((key, baseline[key], metrics[key], ratio))
+
+    return sorted(regressions, key=lambda item: -item[3])
+
+def get_args(argv = None):
+    '''
+    Parse the command-line arguments
+    '''
+    names = [name for name, _ in benches]
+    parser = argparse.ArgumentParser(description='Run the benchmark suite of FlyingTera.')
+    parser.add_argument('--bench', nargs='+', default=names, choices=names, help='benchmarks to run, default all')
+    parser.add_argument('--quick', action='store_true', help='smaller sizes, for a check in about a minute')
+    parser.add_argument('--out', default=None,
+                        help='result file, default benchmark/results/bench_<date>_<time>.json')
+    parser.add_argument('--baseline', default=dft_baseline, help='baseline result file to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='also save the results as the baseline')
+    parser.add_argument('--tol', type=float, default=0.25, help='relative slow-down flagged as regression, default 0.25')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--child-out', default=None, help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = get_args()
+
+    # Child process: one benchmark, metrics to --child-out
+    if args.child is not None:
+        kwargs = dict(benches)[args.child] if args.quick else {}
+        metrics = run_bench(args.child, kwargs)
+        with open(args.child_out, 'w') as fid:
+            json.dump(metrics, fid)
+        sys.exit(0)
+
+    metrics = {}
+    wall_times = {}
+    for name in args.bench:
+        print('Running {}...'.format(name))
+        metrics_bench, wall_times[name] = run_bench_process(name, args.quick)
+        metrics.update(metrics_bench)
+        print('    {} metrics in {:.1f} s'.format(len(metrics_bench), wall_times[name]))
+
+    record = {'meta': get_meta(args.quick), 'wall_time': wall_times, 'metrics': metrics}
+
+    # Save the results
+    out = args.out
+    if out is None:
+        if not os.path.isdir(dft_out_dir):
+            os.makedirs(dft_out_dir)
+        out = os.path.join(dft_out_dir, 'bench_{}.json'.format(time.strftime('%Y%m%d_%H%M%S')))
+    with open(out, 'w') as fid:
+        json.dump(record, fid, indent=1, sort_keys=True)
+    print('Results saved to {}'.format(out))
+
+    # Compare with the baseline
+    num_regression = 0
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as fid:
+            baseline = json.load(fid)
+        if baseline['meta'].get('quick') != args.quick:
+            print('Warning: The baseline was run with quick = {}'.format(baseline['meta'].get('quick')))
+
+        regressions = compare(metrics, baseline['metrics'], args.tol)
+        num_regression = len(regressions)
+        print('{} of {} metrics slower than the baseline ({}) by more than {:.0%}'.format(num_regression,
+              len(set(metrics) & set(baseline['metrics'])), baseline['meta'].get('commit'), args.tol))
+        for key, value_base, value, ratio in regressions:
+            print('    REGRESSION {:60s}{:>12.4g}{:>12.4g}{:>8.2f}x'.format(key, value_base, value, ratio))
+    else:
+        print('No baseline at {}'.format(args.baseline))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fid:
+            json.dump(record, fid, indent=1, sort_keys=True)
+        print('Baseline saved to {}'.format(args.baseline))
+
+    sys.exit(1 if num_regression > 0 else 0)
@@ -0,0 +1,106 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Benchmark: one tick of a figure-1 run, for each overlap engine
+##
+##   dhs   - dhs.step of both drones
+##   align - net_ntwk_dhs.align, once every 10 ticks
+##   ntwk  - net_ntwk_dhs.step, the body of net_ntwk_dhs.operation
+##   tick  - all of the above
+##
+## Usage: python benchmark/bench_tick.py
+#######################################################
+
+import bench_util
+
+import io, time, contextlib
+
+import numpy as np
+
+import netcfg, flytera_cfg, net_ntwk, net_name
+
+# Parameters of each result, the other entries are times
+params = ('engine',)
+
+def new_net(fig_id = '1'):
+    '''
+    Create and pre-process the network of a figure, as FlyTera.run_net does
+    '''
+    netcfg.plot_net = False
+    fig = flytera_cfg.figs[fig_id]
+    flytera_cfg.gry_trace_id = fig['gry_trace_id']
+    flytera_cfg.lac_trace_id = fig['lac_trace_id']
+    flytera_cfg.angle        = fig['beam_width']
+
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        nt = net_ntwk.new_ntwk()
+        nt.set_net_area(netcfg.area_x, netcfg.area_y, netcfg.area_z)
+        nt.add_node(net_name.dhs, flytera_cfg.num_dhs)
+        nt.pre_processing()
+
+    return nt
+
+def run(engines = ('quad', 'lut', 'shapely'), num_tick = 500, almt_itvl = 10, repeat = 3):
+    '''
+    Time the stages over num_tick ticks, the best of repeat fresh networks for each overlap engine
+    Return: list of dictionaries, one per engine, time per tick in second
+    '''
+    results = []
+    for engine in engines:
+        flytera_cfg.ovlp_engine = engine
+
+        # The lookup table is loaded, or built, before the timing
+        if engine == 'lut':
+            import ovlpmdl
+            with contextlib.redirect_stdout(io.StringIO()):
+                ovlpmdl.get_lut()
+
+        best = {'dhs': float('inf'), 'align': float('inf'), 'ntwk': float('inf'), 'tick': float('inf')}
+        for _ in range(repeat):
+            nt = new_net()
+            dhs = list(nt.rgst.iter_stype(net_name.dhs))
+
+            spent = {'dhs': 0.0, 'align': 0.0, 'ntwk': 0.0}
+            for tick in range(num_tick):
+                time_start = time.perf_counter()
+                for obj_node in dhs:
+                    obj_node.step(tick)
+                time_dhs = time.perf_counter()
+                if tick % almt_itvl == 0:
+                    nt.align()
+                time_align = time.perf_counter()
+                nt.step(tick)
+                time_end = time.perf_counter()
+
+                spent['dhs']   += time_dhs - time_start
+                spent['align'] += time_align - time_dhs
+                spent['ntwk']  += time_end - time_align
+
+            spent['tick'] = spent['dhs'] + spent['align'] + spent['ntwk']
+            for stage in best:
+                best[stage] = min(best[stage], spent[stage] / num_tick)
+
+        result = {'engine': engine}
+        result.update(best)
+        results.append(result)
+
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    print('{:>8s}{:>11s}{:>12s}{:>11s}{:>11s}'.format('engine', 'dhs (us)', 'align (us)', 'ntwk (us)', 'tick (us)'))
+    for result in results:
+        print('{:>8s}{:>11.1f}{:>12.1f}{:>11.1f}{:>11.1f}'.format(result['engine'], 1e6 * result['dhs'], 1e6 * result['align'],
+              1e6 * result['ntwk'], 1e6 * result['tick']))
@@ -0,0 +1,36 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Common functions of the benchmarks
+#######################################################
+
+import os, sys, time
+
+# Run from the repository root, where the traces and the modules are
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(root)
+sys.path.insert(0, os.path.join(root, 'network'))
+sys.path.insert(0, root)
+
+def timeit(func, repeat):
+    '''
+    Best of repeat calls, in second
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - time_start)
+
+    return best
@@ -18,15 +18,24 @@
 ## Configurations related FlyingTera
 #######################################################
 import numpy as np
-import scipy.io as sio
+
+import trace_store
 
 # Number of drone hotspots
 num_dhs = 2                         
 
+# Directed links (transmitter, receiver) of the drone network, the dhs numbered from 0 in the order they are created
+# 'all': all ordered pairs of distinct dhs, 'range': both directions of the pairs of dhs within link_range at the
+# start of the run, found with the spatial index, see net_ntwk.net_ntwk_dhs.get_links
+dhs_links  = [(0, 1)]
+link_range = 20         # in meter
+
 # Initial coordinates of the two drones, with distance around 10 meters
 ini_axis_x = np.matrix('100   107')
 ini_axis_y = np.matrix('100   107')
 ini_axis_z = np.matrix('10     10')
+ini_spacing = 7         # with more dhs than initial coordinates, all dhs are placed on a square grid with this spacing
+                        # in meter, starting from the first initial coordinates
 
 #######################################################
 ## Load traces of the drones
@@ -58,11 +67,14 @@ ini_axis_z = np.matrix('10     10')
 #######################################################
 
 mat_fname = 'dhs_trace.mat'
-dhs_trace = sio.loadmat(mat_fname)
+
+# Converted once into per-trace .npy files (dhs_trace_npy/), each trace memory-mapped at first access
+# See trace_store.py
+dhs_trace = trace_store.trace_store(mat_fname)
 # print(dhs_trace['lac_micro_1000_inst1'])
 # exit(0)
 
-# Trace selection
+# Trace selection, the lists are used cyclically by the dhs beyond their length
 gry_trace_id    = [0, 1]            # [for dhs1, for dhs2]
 gry_trace_name  = ['gyr_micro_1000_inst1', 'gyr_micro_1000_inst2', 'gyr_micro_1000_inst3', 'gyr_micro_1000_inst4',\
                    'gyr_small_1000_inst1', 'gyr_small_1000_inst2', 'gyr_small_1000_inst3', 'gyr_small_1000_inst4',\
@@ -72,7 +84,7 @@ gry_trace_name  = ['gyr_micro_1000_inst1', 'gyr_micro_1000_inst2', 'gyr_micro_10
 # exit(0)
 
 # Sampling rat for each trace
-gry_trace_smpl_rate = [200, 200, 200, 200, 200, 200, 200, 200, 200, 200]                  
+gry_trace_smpl_rate = [200, 200, 200, 200, 200, 200, 200, 200, 15, 15]                  
 # print(gry_trace_smpl_rate)
 
 # Large scale linear acceleration is not collected, will be generated randomly
@@ -81,18 +93,65 @@ lac_trace_name = ['lac_micro_1000_inst1', 'lac_micro_1000_inst2', 'lac_small_100
                   'lac_large_inst1', 'lac_large_inst2']
 lac_trace_smpl_rate = [200, 200, 200, 200]  
 
+# Streamed traces, e.g., hour-long flight captures, read chunk by chunk as the ticks advance, see trace_stream.py
+# None: the traces of dhs_trace above. Otherwise one dictionary per dhs, used cyclically like the trace ids:
+# {'gyr': gyroscope log, 'lac': linear acceleration log or None for a generated one}, .csv or raw binary files
+# Only with kin_mode 'tick'
+stream_trace     = None
+stream_smpl_rate = 200      # sampling rate of the streamed logs
+stream_chunk     = 4096     # samples read at a time, bounds the memory of each log
+stream_bin_dtype = '<f8'    # type of the values of the raw binary logs, 4 values per sample
+
+# Sampling rate of the simulation, one sample per tick: the measured traces at other rates are resampled to it once,
+# and the resampled traces cached on disk, see trace_store.resample. None: each trace at its own rate
+sim_smpl_rate   = 200
+resample_filter = True      # low-pass filter the traces before downsampling them, against aliasing
+
 #######################################################
 ##    Configurations related to discrete simulation 
 #######################################################
 time_wait  = 0.1        # time to wait, used for animation only
 sim_tick   = 1000       # the number ticks to simulate
+kin_mode   = 'tick'     # 'tick': dhs poses advanced by simpy processes, 'trace': whole pose traces precomputed,
+                        # 'ensemble': statistics over independent realizations of the generated laac traces
+sim_engine = 'simpy'    # engine of kin_mode 'tick', 'simpy': discrete-event simulation, 'step': fixed-step loop,
+                        # the same results, see step_engine.py
+prof_mode  = None       # stage profiling of a run, None: off, 'time': calls and time, 'alloc': also the allocated
+                        # memory (slower), see profiler.py
+
+# Checkpoints of tick runs, see FlyTera.run_net
+ckpt_itvl  = 10000      # ticks between checkpoints
+ckpt_dir   = None       # directory of the checkpoints of the sweep runs, see sweep.run_job, None: no checkpoints
+
+# Cache of the results of runs, keyed by the configuration, trace data and code, see result_cache.py
+cache_dir       = 'result_cache'    # directory of the cache, None: no caching
+cache_max_bytes = 2**30             # size bound of the cache in byte, least recently used entries removed beyond
+
+# Monte Carlo ensemble, used if kin_mode is 'ensemble', see net_ntwk.net_ntwk_dhs.run_ensemble
+ens_num_rlz = 1000      # number of realizations
+ens_chunk   = 100       # number of realizations evaluated together, bounds the memory
+ens_conf    = 0.95      # confidence level of the bands
 
 
 #######################################################
 ##    Antenna model 
 #######################################################
 angle   = 5               # Beamwidth in degree 
-radius  = 0.04            # Radius of receive surface in meter 
+radius  = 0.04            # Radius of receive surface in meter
+
+# Engine for the overlap of transmit wavefront and receive surface, see ovlpmdl.py
+ovlp_engine   = 'quad'    # 'quad': vectorized quadrature (default), 'lut': lookup table, 'shapely': polygon intersection (reference)
+ovlp_num_quad = 1024      # number of quadrature directions
+ovlp_chunk    = 1024      # number of poses evaluated together
+
+# Lookup table of the overlap ratio, used if ovlp_engine is 'lut', see ovlpmdl.ovlp_lut. Faster than 'quad' for batches
+# of poses, e.g., kin_mode 'trace', slower for a single pose in partial overlap
+lut_dir       = 'ovlp_lut'                  # cache directory of the tables
+lut_comm_dist = (5, 20)                     # range of communication distance in meter
+lut_grid      = {'radius': 4, 'offset': 121, 'semi': 6, 'psi': 7}   # number of grid points per dimension
+lut_max_offset = 1.5                        # offset range of the table, relative to the half-extent of the ellipse
+lut_min_semi  = 0.5                         # smallest semi-axis in the table, relative to radius, quadrature below
+lut_num_valid = 20000                       # number of random poses for measuring the interpolation error
 
 
 # Beam searching time
@@ -101,14 +160,6 @@ beam_sch_time = 0.01      # in second, takes values from [0.01, 0.05, 0.1, 0.5]
 # Beam alignment interval
 beam_alignment_itvl = [1, 50, 5000]
 
-# Plot, updated as the network runs
-sim_index   = 0           # 0, 1, 2, updating data1, data2, data3, respectively. sim_time updated if 0
-
-sim_time    = [0]
-data1       = [1]
-data2       = [1]
-data3       = [1]
-
 #######################################################
 ##    Configurations for different figures
 #######################################################
@@ -20,56 +20,59 @@
 # network configuration
 import netcfg, flytera_cfg
 
-import FlyTera
+import sweep
 
-import matplotlib
+import matplotlib, matplotlib.pyplot
 
-print('Please select the figure to be ploted from [1, 2, 3, 4, 5, 6]')
-print('(for Linux OS, please quote the input with \'\')')
-fig_id = input('[Input Please:]')
+def plot_fig(fig_id, sim_time, data1, data2, data3):
+    '''
+    Plot the normalized capacity of the three beam alignment intervals of a figure
+    '''
+    font = {'family' : 'sans',
+            'size'   : 14}	
+    matplotlib.rc('font', **font)
 
-# print(flytera_cfg.figs[fig_id])
-# exit(0)
+    matplotlib.pyplot.plot(sim_time, data1, 'k--', sim_time, data2, 'r-',\
+                           sim_time, data3, 'b.-', )
+    if fig_id in ['1']:                       
+        # The shapely engine approximates the circles by 64-gons, which scales the ideal capacity by 0.998394
+        if flytera_cfg.ovlp_engine == 'shapely':
+            matplotlib.pyplot.ylim(0.9983935, 0.9983945)
+        else:
+            matplotlib.pyplot.ylim(0.9999995, 1.0000005)
+        matplotlib.pyplot.legend(('Ideal Beam Alignment', 'Adaptive Beam Alignment', 'No Beam Alignment'),
+                   loc='lower left')   
+    elif fig_id in ['4']:                       
+        if flytera_cfg.ovlp_engine == 'shapely':
+            matplotlib.pyplot.ylim(0.97, 0.999)
+        else:
+            matplotlib.pyplot.ylim(0.97, 1.0006)
+        matplotlib.pyplot.legend(('Ideal Beam Alignment', 'Adaptive Beam Alignment', 'No Beam Alignment'),
+                   loc='lower left')                  
+    elif fig_id in ['2', '5']:
+        matplotlib.pyplot.legend(('Ideal Beam Alignment', 'Adaptive Beam Alignment', 'No Beam Alignment'),
+                   loc='lower left')                
+    else:
+        matplotlib.pyplot.legend(('Ideal Beam Alignment', 'Adaptive Beam Alignment', 'No Beam Alignment'),
+                   loc='center right')                   
+        
+    matplotlib.pyplot.xlabel('Time (s)') 
+    matplotlib.pyplot.ylabel('Normalized Capacity') 
 
-# Update the simulation parameters
-flytera_cfg.gry_trace_id        = flytera_cfg.figs[fig_id]['gry_trace_id']
-flytera_cfg.lac_trace_id        = flytera_cfg.figs[fig_id]['lac_trace_id']
-flytera_cfg.beam_alignment_itvl = flytera_cfg.figs[fig_id]['beam_alignment_itvl']
-flytera_cfg.angle               = flytera_cfg.figs[fig_id]['beam_width']
+    matplotlib.pyplot.grid(True)
 
-# loop over all beam alignment intervals
-for almt_itvl in flytera_cfg.beam_alignment_itvl:
-    FlyTera.run_net(almt_itvl)
-    flytera_cfg.sim_index += 1   
-    # input('...')    
-    
-# print(flytera_cfg.sim_time)    
+# Guard needed by the worker processes of the sweep runner
+if __name__ == '__main__':
+    print('Please select the figure to be ploted from [1, 2, 3, 4, 5, 6]')
+    print('(for Linux OS, please quote the input with \'\')')
+    fig_id = input('[Input Please:]')
 
-# Plot figures
-font = {'family' : 'sans',
-        'size'   : 14}	
-matplotlib.rc('font', **font)
+    # Run all beam alignment intervals of the figure in parallel, see sweep.py
+    fig = flytera_cfg.figs[fig_id]
+    results = sweep.run_sweep([fig_id])
+    series  = [results[(fig_id, almt_itvl, fig['beam_width'])] for almt_itvl in fig['beam_alignment_itvl']]
 
-matplotlib.pyplot.plot(flytera_cfg.sim_time, flytera_cfg.data1, 'k--', flytera_cfg.sim_time, flytera_cfg.data2, 'r-',\
-                       flytera_cfg.sim_time, flytera_cfg.data3, 'b.-', )
-if fig_id in ['1']:                       
-    matplotlib.pyplot.ylim(0.9983935, 0.9983945)
-    matplotlib.pyplot.legend(('Ideal Beam Alignment', 'Adaptive Beam Alignment', 'No Beam Alignment'),
-               loc='lower left')   
-elif fig_id in ['4']:                       
-    matplotlib.pyplot.ylim(0.97, 0.999)
-    matplotlib.pyplot.legend(('Ideal Beam Alignment', 'Adaptive Beam Alignment', 'No Beam Alignment'),
-               loc='lower left')                  
-elif fig_id in ['2', '5']:
-    matplotlib.pyplot.legend(('Ideal Beam Alignment', 'Adaptive Beam Alignment', 'No Beam Alignment'),
-               loc='lower left')                
-else:
-    matplotlib.pyplot.legend(('Ideal Beam Alignment', 'Adaptive Beam Alignment', 'No Beam Alignment'),
-               loc='center right')                   
-    
-matplotlib.pyplot.xlabel('Time (s)') 
-matplotlib.pyplot.ylabel('Normalized Capacity') 
-
-matplotlib.pyplot.grid(True)
-  
-matplotlib.pyplot.show()
+    # Plot figures
+    plot_fig(fig_id, series[0]['sim_time'], series[0]['nmlzd_cap'], series[1]['nmlzd_cap'], series[2]['nmlzd_cap'])
+      
+    matplotlib.pyplot.show()
@@ -26,6 +26,15 @@ area_x = 200                        # x-axis
 area_y = 200                        # y-axis
 area_z = 200                        # z-axis
 
+# Range in meter of the node pairs with channels, None: all pairs, with the dense distance matrix. With a range, the
+# nodes within range are found by the spatial index, see net_spatial.py, and there is no distance matrix
+ngbr_range   = None
+spatial_skin = 1.0                  # distance in meter a node may move before the spatial index is rebuilt
+
+# Channels of node pairs, True: created on first access by net_ntwk.get_chnl_n2n, and only the channels used in a
+# coherent time interval regenerated at the next one; False: the channels of all node pairs created by ini_channel
+chnl_lazy = True
+
 # The number of pixels per meter, used to enlarge the canvas of the GUI
 num_pixel_per_meter = 5             # The x-dimension of the GUI canvas would be area_x * num_pixel_per_meter
 
@@ -56,6 +65,7 @@ dft_num_ant_usr = 1         # for wifi user
 #######################################################
 # The number of symbols used in channel covariance estimation for LTE base stations
 num_sym_4chn_cov_est = 1000
+chn_cov_chunk        = 10000     # channel samples generated and reduced together, bounds the memory
 
 # The unit of time is tick, each tick corresponds to 9us, the time slot duration of wifi
 
@@ -69,3 +79,11 @@ chn_cohr_time_tic = chn_cohr_time_sec/usec_per_tick             # Coherent time
 wifi_tsmt_time_sec = 100*1e-6                                   # wifi transmission time in second, 10us
 wifi_tsmt_time_tick = wifi_tsmt_time_sec/usec_per_tick          # wifi transmission time in tick
 
+#######################################################
+##    Configurations related to event tracing, see net_trace.py
+#######################################################
+trace_level  = 'info'           # 'debug', 'info', 'warning', 'error', 'off', events below this level are dropped
+trace_subsys = {'sim': True, 'ntwk': True, 'node': True, 'chnl': True}    # switch of each subsystem
+trace_file   = None             # output file, None for the terminal; each job of a sweep worker writes <file>.job<n>
+trace_format = 'text'           # 'text', 'jsonl': one JSON object per event, 'binary': fixed-size records
+trace_sample = 1                # keep one of every trace_sample events of each event name
@@ -17,8 +17,247 @@
 # wireless channel class and functions
 #######################################################
 
+import math
 import numpy as np
-import net_func, net_name, netcfg, net_channel
+import net_func, net_name, netcfg, net_channel, net_trace
+
+# Events of the channels
+trc = net_trace.get_tracer('chnl')
+
+def calc_rician_coeff(dist):
+    '''
+    Func: Calculate distance-dependent Rician channel coefficients
+    dist: distance in meter, scalar or array
+
+    For the LOS case, the Ricean K factor is based on K = 13-0.03*d (dB) where d is the
+    distance between MS and BS in meters.  See 
+    "Spatial channel model for multiple input multiple output simulations"    
+    '''
+    return 13 -  0.03 * dist
+
+def gnrt_rician(K, shape):
+    '''
+    Func: Generate Rician channel coefficients
+    K: parameter of the Rician channel, scalar or array broadcast against shape (e.g., one value per pair)
+    shape: shape of the coefficients to be generated
+    '''
+    mu  = np.sqrt(K/(K+1))
+    s   = np.sqrt(1/(2*(K+1)))
+
+    return s*(np.random.standard_normal(shape) + np.random.standard_normal(shape)*1j) + mu
+
+class chnl_store:
+    '''
+    Network-level store of the channel coefficients of all node pairs
+
+    Pairs with the same dimension (row: antennas of the first node, col: antennas of the second node) share one
+    preallocated complex tensor of shape (num_pair, row, col, 1), so that all the pairs are regenerated with a single
+    vectorized Rician draw per block in each coherent time interval. A pair is addressed by the network-wide indexes
+    of its two nodes; the channel_node2node objects are thin views into the tensors.
+
+    Only the pairs used in a coherent time interval are regenerated at the next one, the others are regenerated when
+    they are accessed again, see get_chnl and refresh
+    '''
+    def __init__(self, ntwk):
+        # The network, for the distance matrix
+        self.ntwk = ntwk
+
+        # Per block, keyed by the dimension (row, col):
+        # network-wide indexes of the first and second node of each pair, in the order of registration
+        self.idx1 = {}
+        self.idx2 = {}
+        # channel tensor, effectiveness and use since the last refresh of each pair, enlarged when pairs have been added
+        self.chnl = {}
+        self.efft = {}
+        self.used = {}
+
+        # Block and slot in the block of each pair, keyed by (index of first node, index of second node)
+        self.slot = {}
+
+    def add_pair(self, idx1, idx2, row, col):
+        '''
+        Func: Register the channel between the nodes with network-wide index idx1 (row) and idx2 (column)
+        The pair is not in effect until the next refresh
+        '''
+        if (idx1, idx2) in self.slot or (idx2, idx1) in self.slot:
+            trc.warning('chnl_exists', 'Warning: Channel between {} and {} already in the channel store.', idx1, idx2)
+            return
+
+        key = (row, col)
+        if key not in self.idx1:
+            self.idx1[key] = []
+            self.idx2[key] = []
+            self.chnl[key] = np.zeros((0, row, col, 1), dtype=complex)
+            self.efft[key] = np.zeros(0, dtype=bool)
+            self.used[key] = np.zeros(0, dtype=bool)
+
+        self.slot[(idx1, idx2)] = (key, len(self.idx1[key]))
+        self.idx1[key].append(idx1)
+        self.idx2[key].append(idx2)
+
+    def get_block(self, key):
+        '''
+        Func: The channel tensor, effectiveness and use of the pairs of the block, views into the preallocated buffers
+        The buffers are enlarged, doubling their size, if pairs have been added beyond their size
+        '''
+        num_pair = len(self.idx1[key])
+        if self.chnl[key].shape[0] < num_pair:
+            size = max(num_pair, 2 * self.chnl[key].shape[0])
+            chnl = np.zeros((size,) + self.chnl[key].shape[1:], dtype=complex)
+            efft = np.zeros(size, dtype=bool)
+            used = np.zeros(size, dtype=bool)
+            chnl[:self.chnl[key].shape[0]] = self.chnl[key]
+            efft[:self.efft[key].size] = self.efft[key]
+            used[:self.used[key].size] = self.used[key]
+            self.chnl[key] = chnl
+            self.efft[key] = efft
+            self.used[key] = used
+
+        return self.chnl[key][:num_pair], self.efft[key][:num_pair], self.used[key][:num_pair]
+
+    def get_slot(self, idx1, idx2):
+        '''
+        Func: Block, slot in the block, and whether the pair was registered the other way around (idx2, idx1)
+        '''
+        if (idx1, idx2) in self.slot:
+            return self.slot[(idx1, idx2)] + (False,)
+
+        return self.slot[(idx2, idx1)] + (True,)
+
+    def get_chnl(self, idx1, idx2):
+        '''
+        Func: The channel coefficients between two nodes, a view into the channel tensor
+        The coefficients are regenerated first if the channel is ineffective, and the channel is marked as used
+        Return: array of shape (antennas of node idx1, antennas of node idx2, 1)
+        '''
+        key, slot, swap = self.get_slot(idx1, idx2)
+        chnl, efft, used = self.get_block(key)
+        if not efft[slot]:
+            self.gnrt(key, [slot])
+        used[slot] = True
+
+        return chnl[slot].swapaxes(0, 1) if swap else chnl[slot]
+
+    def is_efft(self, idx1, idx2):
+        '''
+        Func: Whether the channel between two nodes is in effect
+        '''
+        key, slot = self.get_slot(idx1, idx2)[:2]
+        return bool(self.get_block(key)[1][slot])
+
+    def set_efft(self, idx1, idx2, efft):
+        '''
+        Func: Set the effectiveness of the channel between two nodes
+        '''
+        key, slot = self.get_slot(idx1, idx2)[:2]
+        self.get_block(key)[1][slot] = efft
+
+    def reset(self):
+        '''
+        Func: Set all channels to be ineffective, called at the beginning of each coherent time interval
+        '''
+        for key in self.idx1:
+            self.get_block(key)[1][:] = False
+
+    def get_num_used(self):
+        '''
+        Func: The number of channels used since the last refresh
+        '''
+        return sum(int(np.count_nonzero(self.get_block(key)[2])) for key in self.idx1)
+
+    def gnrt(self, key, sel):
+        '''
+        Func: Generate the coefficients of the selected pairs of a block in one draw, and set them in effect
+        sel: slots of the pairs in the block
+        '''
+        chnl, efft = self.get_block(key)[:2]
+
+        # Distance-dependent Rician factor of each pair, at the current coordinates of the nodes. Only the selected
+        # entries of the index lists are read, a single pair generated on first access costs the same in any block
+        idx1 = np.array([self.idx1[key][slot] for slot in sel], dtype=int)
+        idx2 = np.array([self.idx2[key][slot] for slot in sel], dtype=int)
+        ricean_fact = calc_rician_coeff(self.ntwk.get_dist(idx1, idx2))
+
+        chnl[sel] = gnrt_rician(ricean_fact[:, None, None, None], (len(sel),) + chnl.shape[1:])
+        efft[sel] = True
+
+    def refresh(self, sel_all = False):
+        '''
+        Func: Regenerate the coefficients of the ineffective channels used since the last refresh, one vectorized draw
+        per block, and start tracking the use again. The other channels are regenerated when accessed, see get_chnl
+        sel_all: regenerate all ineffective channels, used or not
+        '''
+        for key in self.idx1:
+            efft, used = self.get_block(key)[1:]
+            sel = np.flatnonzero(~efft if sel_all else ~efft & used)
+            if sel.size > 0:
+                self.gnrt(key, sel)
+            used[:] = False
+
+    def get_ckpt(self):
+        '''
+        Func: Copies of the node pairs, coefficients, effectiveness and use of all blocks, for a checkpoint of the run
+        Return: dictionary keyed by pair_<row>x<col>, chnl_<row>x<col>, efft_<row>x<col> and used_<row>x<col>
+        '''
+        ckpt = {}
+        for key in self.idx1:
+            chnl, efft, used = self.get_block(key)
+            name = '{}x{}'.format(*key)
+            ckpt['pair_' + name] = np.array([self.idx1[key], self.idx2[key]], dtype=int).T
+            ckpt['chnl_' + name] = chnl.copy()
+            ckpt['efft_' + name] = efft.copy()
+            ckpt['used_' + name] = used.copy()
+
+        return ckpt
+
+    def get_ckpt_pairs(self, ckpt):
+        '''
+        Func: The node pairs of a checkpoint, see get_ckpt
+        Return: list of (index of first node, index of second node)
+        '''
+        pairs = []
+        for name in sorted(ckpt):
+            if name.startswith('pair_'):
+                pairs.extend((int(idx1), int(idx2)) for idx1, idx2 in ckpt[name])
+
+        return pairs
+
+    def set_ckpt(self, ckpt):
+        '''
+        Func: Restore the coefficients, effectiveness and use from a checkpoint of the same network, see get_ckpt
+        The channels of the checkpoint must have been created first, in any order, see get_ckpt_pairs. The other
+        channels are set ineffective and unused
+        '''
+        for key in self.idx1:
+            efft, used = self.get_block(key)[1:]
+            efft[:] = False
+            used[:] = False
+
+        for name in ckpt:
+            if not name.startswith('pair_'):
+                continue
+            name = name[len('pair_'):]
+
+            # Slots of the pairs of the checkpoint in the blocks of this store
+            if any(tuple(pair) not in self.slot for pair in ckpt['pair_' + name].tolist()):
+                print('Error: The checkpoint has different channels.')
+                exit(0)
+            slot = [self.slot[tuple(pair)][1] for pair in ckpt['pair_' + name].tolist()]
+
+            chnl, efft, used = self.get_block(tuple(int(dim) for dim in name.split('x')))
+            chnl[slot] = ckpt['chnl_' + name]
+            efft[slot] = ckpt['efft_' + name]
+            used[slot] = ckpt['used_' + name]
+
+    def refresh_pair(self, idx1, idx2):
+        '''
+        Func: Regenerate the coefficients of the channel between two nodes if it is ineffective, and mark it as used
+        '''
+        key, slot = self.get_slot(idx1, idx2)[:2]
+        efft, used = self.get_block(key)[1:]
+        if not efft[slot]:
+            self.gnrt(key, [slot])
+        used[slot] = True
 
 class channel(net_func.netelmt_group):
     '''
@@ -28,46 +267,67 @@ class channel(net_func.netelmt_group):
         # from base network element
         net_func.netelmt_group.__init__(self, net_info)
         
-        # Initialize the channels from this node to all the other nodes
-        self.ini_channel_2node()
+        # Initialize the channels from this node to all the other nodes, or none if they are created on first access
+        if not netcfg.chnl_lazy:
+            self.ini_channel_2node()
 
     def ping(self):
         net_func.netelmt_group.ping()
         
     def ini_channel_2node(self):
-        print('Initializing channels from {} to all the other nodes...'.format(self.parent.type))
+        '''
+        Create the channels from this node to all the other nodes, or with netcfg.ngbr_range to the nodes within range
+        '''
+        trc.debug('ini_chnl_2node', 'Initializing channels from {} to all the other nodes...', self.parent.type)
         
-        # Loop over all nodes in the network
-        for node_name in self.ntwk.name_list_all_nodes:
+        # Loop over all nodes in the network, or those within range from the spatial index
+        index1 = self.parent.ntwk_wide_index
+        if netcfg.ngbr_range is None:
+            node_objs = self.ntwk.obj_list_all_nodes
+        else:
+            node_objs = [self.ntwk.obj_list_all_nodes[idx] for idx in self.ntwk.spatial.query_node(index1, netcfg.ngbr_range)]
+        for node_obj in node_objs:
+            node_name = node_obj.type
             
             # No need to consider the channel from a node to itself
-            if node_name == self.parent.type:
+            if node_obj is self.parent:
                 continue 
-                                    
-            # Otherwise, create the channel module for the node
-            ###################################################################           
-            # Construct a unique channel name with the names of two nodes
-            elmt_name = self.get_name_chanl_2node(self.parent.type, node_name)               
             
             # If the channel module has been created, skip
             # This may happen since only one channel needed for each pair of nodes
-            if elmt_name in self.ntwk.name_list_all_n2n_chnl:
+            if self.ntwk.get_chnl_n2n(index1, node_obj.ntwk_wide_index, create=False) is not None:
                 continue 
-                       
-            elmt_type = net_name.chnl_n2n
-            elmt_num  = 1                                  # Dummy parameter
-            
-            # network topology info, 1 network created
-            addi_info = {'ntwk':self.ntwk, 'parent':self, 'node1': self.parent.type, 'node2': node_name}
-            info = net_func.mkinfo(elmt_name, elmt_type, elmt_num, addi_info)
+                                    
+            # Otherwise, create the channel module for the node
+            self.add_chnl_2node(node_obj)
 
-            # create node object            
-            chnl_obj  = net_channel.channel_node2node(info)      
-            ###################################################################   
+    def add_chnl_2node(self, node_obj):
+        '''
+        Func: Create the channel from this node to another node
+        Return: the channel object
+        '''
+        node_name = node_obj.type
+
+        ###################################################################           
+        # Construct a unique channel name with the names of two nodes
+        elmt_name = self.get_name_chanl_2node(self.parent.type, node_name)               
+                   
+        elmt_type = net_name.chnl_n2n
+        elmt_num  = 1                                  # Dummy parameter
+        
+        # network topology info, 1 network created
+        addi_info = {'ntwk':self.ntwk, 'parent':self, 'node1': self.parent.type, 'node2': node_name}
+        info = net_func.mkinfo(elmt_name, elmt_type, elmt_num, addi_info)
+
+        # create node object            
+        chnl_obj  = net_channel.channel_node2node(info)      
+        ###################################################################   
+
+        # Add the channel name to the overall list maintained by the network
+        self.ntwk.name_list_all_n2n_chnl.append(elmt_name)
+        trc.debug('chnl_created', '{} created.', elmt_name)
 
-            # Add the channel name to the overall list maintained by the network
-            self.ntwk.name_list_all_n2n_chnl.append(elmt_name)
-            print('{} created.'.format(elmt_name))
+        return chnl_obj
 
     def get_name_chanl_2node(self, node_name1, node_name2):
         '''
@@ -98,6 +358,7 @@ class channel(net_func.netelmt_group):
 class channel_node2node(net_func.netelmt_group):
     '''
     Definition of the class for channels between a node pair
+    The channel coefficients and effectiveness are kept in the channel store of the network, see chnl_store
     '''
     def __init__(self, net_info):      
         # from base network element
@@ -106,43 +367,45 @@ class channel_node2node(net_func.netelmt_group):
         # The two nodes corresponding to the channel
         self.node1 = net_info['addi_info']['node1']
         self.node2 = net_info['addi_info']['node2']
+
+        # Objects and network-wide indexes of the two nodes, the index pair is the address of the channel in the
+        # channel store and in ntwk.n2n_chnl
+        self.obj1 = self.get_netelmt(self.node1)
+        self.obj2 = self.get_netelmt(self.node2)
+        self.idx1 = self.obj1.ntwk_wide_index
+        self.idx2 = self.obj2.ntwk_wide_index
+        self.ntwk.n2n_chnl[(min(self.idx1, self.idx2), max(self.idx1, self.idx2))] = self
 		
         # Dimension of the channel, depending on the number of antennas of the two nodes associated to the channel
 		# num_slot: For regular channel updating, this parameter is default 1. For channel covariance estimation, 
 		# this is the number of instances of channel states to be generated.
         self.chnl_dim = self.get_dimension(num_slot = 1)		
                 
-        # Current channel coefficients
-        self.chnl_matrix = None
-		
-        # Effectiveness Indication: False - the channel has expired; True - in effects        
-        self.efft = False		
-		
-		# Initialize current channel coefficients
-		# First check if the channel is still in effect, refresh if not, otherwise do nothing
-        if self.efft == False:
-            self.chnl_matrix = self.gnrt_chnl_matrix(self.chnl_dim)
-        else:
-            pass
-        
-        # Set the channel state to be effectiveness, and refresh the channel for the involved receiver
-		# No need to refresh the involved receiver, because for any two nodes, the corresponding channel
-		# object will be identified by constructing a unique name, which will point to the same channel
-		# object involving the transmitter and the receiver. So just set the channel to be effective
-        self.efft = True
+        # Register the channel in the channel store. The coefficients of all channels are generated together by
+        # the network once all channels have been created, see net_ntwk.ini_channel, or on first access
+        self.ntwk.chnl_store.add_pair(self.idx1, self.idx2, self.chnl_dim[net_name.chn_row], self.chnl_dim[net_name.chn_col])
         
-        print('Channel matrix initialized for {} and {}'.format(self.node1, self.node2))
-        print(self.chnl_matrix)
+        trc.debug('chnl_registered', 'Channel registered for {} and {}', self.node1, self.node2)
+
+    @property
+    def chnl_matrix(self):
+        '''
+        Current channel coefficients, a view into the channel store
+        '''
+        return self.ntwk.chnl_store.get_chnl(self.idx1, self.idx2)
+
+    @property
+    def efft(self):
+        '''
+        Effectiveness Indication: False - the channel has expired; True - in effects
+        '''
+        return self.ntwk.chnl_store.is_efft(self.idx1, self.idx2)
         
     def refresh(self):
         '''
         Refresh the channel coefficients, called at the beginning of each channel choerent time interval
         '''
-        if self.efft == False:
-            self.chnl_matrix = self.gnrt_chnl_matrix(self.chnl_dim)
-            self.efft = True
-        else:
-            pass            
+        self.ntwk.chnl_store.refresh_pair(self.idx1, self.idx2)
         
     def gnrt_chnl_matrix(self, chnl_dim):
         '''
@@ -180,13 +443,9 @@ class channel_node2node(net_func.netelmt_group):
 		for estimating covariance matrix. Set to num_slot.
         '''
         
-        # get the objects and then the network-wide index of the two nodes associated with the channel
-        node_obj1 = self.get_netelmt(self.node1)            # get objects
-        node_obj2 = self.get_netelmt(self.node2)        
-        
-        # number of antennas
-        num_ant1 = node_obj1.num_ant
-        num_ant2 = node_obj2.num_ant
+        # number of antennas of the two nodes associated with the channel
+        num_ant1 = self.obj1.num_ant
+        num_ant2 = self.obj2.num_ant
         
         return {net_name.chn_row:num_ant1, net_name.chn_col:num_ant2, net_name.chn_third_dim: num_slot}
         
@@ -195,52 +454,29 @@ class channel_node2node(net_func.netelmt_group):
 
     def get_dist(self):
         '''
-        Func: Get the distance for the channel. The distance information is stored in ntwk.dist_matrix and updated 
-        if node moves
+        Func: Get the distance for the channel, at the current coordinates of the two nodes
         '''
-        
-        # get the objects and then the network-wide index of the two nodes associated with the channel
-        node_obj1 = self.get_netelmt(self.node1)            # get objects
-        node_obj2 = self.get_netelmt(self.node2)
-        
-        idx1 = node_obj1.ntwk_wide_index                    # get indexes
-        idx2 = node_obj2.ntwk_wide_index
-        
-        # Get the distance from the distance matrix 
-        dist = None
-        if self.ntwk.dist_matrix is None:
-            print('Error: The distance matrix has not been initialized.')
-        else:
-            dist = self.ntwk.dist_matrix[idx1][idx2]
-        
-        return dist
+        return self.ntwk.get_dist(self.idx1, self.idx2)
         
     def reset(self):
         '''
         Func: Reset the effectiveness of the channel
         '''
-        self.efft = False
+        self.ntwk.chnl_store.set_efft(self.idx1, self.idx2, False)
         #print('Channel {} has been reset.'.format(self.type))
         
     def set_chnl(self):
         '''
         Func: Reset the channel to be in effects
         '''        
-        self.efft = True
+        self.ntwk.chnl_store.set_efft(self.idx1, self.idx2, True)
         
     def calc_rician_coeff(self, dist):
         '''
-        Func: Calculate distance-dependent Rician channel coefficients
+        Func: Calculate distance-dependent Rician channel coefficients, see calc_rician_coeff
         dist: distance in meter
-        
-        For the LOS case, the Ricean K factor is based on K = 13-0.03*d (dB) where d is the
-        distance between MS and BS in meters.  See 
-        "Spatial channel model for multiple input multiple output simulations"    
         '''
-        
-        Rician_K = 13 -  0.03 * dist
-
-        return Rician_K
+        return calc_rician_coeff(dist)
 
     def gnrt_rician(self, K, dic_data_size):
         '''
@@ -256,12 +492,7 @@ class channel_node2node(net_func.netelmt_group):
         col = dic_data_size[net_name.chn_col]
         third_dim = dic_data_size[net_name.chn_third_dim]
         
-        # Ricean channel parameters        
-        mu  = np.math.sqrt(K/(K+1))
-        s   = np.math.sqrt(1/(2*(K+1)))
-        rician_chn = s*(np.random.standard_normal((row, col, third_dim)) + np.random.standard_normal((row, col, third_dim))*1j) + mu
-        
-        return rician_chn    
+        return gnrt_rician(K, (row, col, third_dim))
         
     def check_rule(self):
         '''
@@ -277,10 +508,8 @@ class channel_node2node(net_func.netelmt_group):
         # Rule 1: single antenna only for wifi nodes. 
        
         # Check each of the two nodes involved in the channel
-        for node in [self.node1, self.node2]:
+        for node, obj_node in [(self.node1, self.obj1), (self.node2, self.obj2)]:
             if net_name.wifi in node:
-                # get the object of the node
-                obj_node = self.get_netelmt(node)
                 if obj_node.num_ant > 1:
                     b_passed = False
                     break
@@ -31,6 +31,65 @@ def mkinfo(elmt_type, elmt_subtype, elmt_num, addi_info):
     net_info = {'elmt_type': elmt_type, 'elmt_subtype': elmt_subtype, 'elmt_num': elmt_num, 'addi_info': addi_info}
     return net_info   
     
+# -------------------------------------------------------------------------
+# registry of network elements, kept by the network
+# -------------------------------------------------------------------------
+class elmt_registry:
+    '''
+    Registry of all network elements of a network
+    Each element gets a dense integer handle at registration, its position in the registry. Elements can be looked
+    up by name or handle, and iterated by subtype, e.g., all nodes of a node type
+    '''
+    def __init__(self):
+        self.elmt   = []        # element of each handle
+        self.handle = {}        # handle of each element name
+        self.stype  = {}        # handles of the elements of each subtype, in the order of registration
+
+    def add(self, elmt):
+        '''
+        Register an element under its name
+        Return: the handle of the element
+        '''
+        if elmt.name in self.handle:
+            print('Error: Duplicated network element!')
+            exit(0)
+
+        handle = len(self.elmt)
+        self.elmt.append(elmt)
+        self.handle[elmt.name] = handle
+        self.stype.setdefault(elmt.stype, []).append(handle)
+
+        return handle
+
+    def get(self, elmt_name):
+        '''
+        The element with the given name, None if there is no such element
+        '''
+        handle = self.handle.get(elmt_name)
+        return None if handle is None else self.elmt[handle]
+
+    def get_handle(self, elmt_name):
+        '''
+        The handle of the element with the given name, None if there is no such element
+        '''
+        return self.handle.get(elmt_name)
+
+    def iter_stype(self, stype):
+        '''
+        Iterate over the elements of a subtype, e.g., net_name.dhs, in the order of registration
+        '''
+        for handle in self.stype.get(stype, []):
+            yield self.elmt[handle]
+
+    def __getitem__(self, handle):
+        return self.elmt[handle]
+
+    def __contains__(self, elmt_name):
+        return elmt_name in self.handle
+
+    def __len__(self):
+        return len(self.elmt)
+
 # -------------------------------------------------------------------------
 # basic network element class 
 # base class of all other element classes
@@ -47,6 +106,7 @@ class netelmt_group:
         self.ntwk       = info['addi_info']['ntwk']                 # to network
         if self.ntwk == None:                                       # when creating a network, None 
             self.ntwk = self 
+            self.rgst = elmt_registry()                             # registry of all elements of the network
 
         self.parent     = info['addi_info']['parent']               # to parent
 
@@ -59,13 +119,10 @@ class netelmt_group:
         else:             
             b_rgst = 1
                       
+        # handle of the element in the registry of the network, None if not registered
+        self.handle = None
         if b_rgst == 1:                                             # need to register, or not specified    
-            ptr_name = '_'+self.type                                # to itself; pointer name format: node: _node
-            if hasattr(self.ntwk, ptr_name):
-                print('Error: Duplicated network element!')           
-                exit(0)
-            else:
-                setattr(self.ntwk, ptr_name, self)
+            self.handle = self.ntwk.rgst.add(self)
         else:
             pass
                                               
@@ -146,20 +203,7 @@ class netelmt_group:
 
     def get_netelmt(self, elmt_name):
         '''
-        return the network object
+        return the network element with the given name, None if it does not exist
         '''         
-        # get network
-        ntwk = self.get_ntwk()
-         
-        # get network element
-        _elmt_name = '_'+elmt_name                                            # construct network attribute cosrresponding to elmt_name
-        
-        if hasattr(ntwk, _elmt_name) == False:      
-            #print('Network element {} does not exist, ntwk notified.'.format(_elmt_name))    # the request network element doesn't exist
-            
-            # if the wanted element does not exist, notify the network
-            # will be implemented in future
-            
-            return None
-        else:
-            return getattr(ntwk, _elmt_name)             
\ No newline at end of file
+        # look up the registry of the network
+        return self.ntwk.rgst.get(elmt_name)
@@ -18,17 +18,17 @@
 #######################################################
 
 # from current folder
-import net_name, net_func, net_node, netcfg, net_channel
-
-# Antenna model
-import antmdl
+import net_name, net_func, net_node, netcfg, net_channel, net_state, net_trace
 
 import random, math
 
-import flytera_cfg
+import flytera_cfg, trace_stream
 
 import numpy as np
 
+# Events of the nodes
+trc = net_trace.get_tracer('node')
+
 def new_group(ntwk_obj, group_name):
     '''
     Func: create a group for base station
@@ -63,7 +63,7 @@ class node_group(net_func.netelmt_group):
         '''
         
         # Construct the name of the node type        
-        print('Adding '+node_type+'...')
+        trc.info('add_node', 'Adding {}...', node_type)
         
         # Add node one by one, num_node will be added in total
         # node_id starts from 1 rather than 0
@@ -137,22 +137,22 @@ class node(net_func.netelmt_group):
         # Add the node to the list of all nodes in the network
         # to maintain the full list of nodes in the network
         self.ntwk.name_list_all_nodes.append(self.type)             # Node name
+        self.ntwk.obj_list_all_nodes.append(self)                   # Node object
         
         # Initialize the coordinate of the node
-        self.coord_x = random.randint(0, self.ntwk.net_width)
-        self.coord_y = random.randint(0, self.ntwk.net_length)                      
-        self.coord_z = random.randint(0, self.ntwk.net_height)
-
-        # Add the node location the list of all nodes in the network
-        # to maintain the information of the full list of nodes in the network
-        self.ntwk.axis_x.append(self.coord_x)                     
-        self.ntwk.axis_y.append(self.coord_y)
-        self.ntwk.axis_z.append(self.coord_z)   
+        x = random.randint(0, self.ntwk.net_width)
+        y = random.randint(0, self.ntwk.net_length)                      
+        z = random.randint(0, self.ntwk.net_height)
 
         # Network-wide index, calculated based on the total number of nodes in the network
         # The index of the first node is 0, incremented by 1 everytime a new node is created
         self.ntwk_wide_index = self.ntwk.tot_node_num
         
+        # Add the node to the kinematic state of the network, the row of the node is its network-wide index
+        # The coordinates, velocity and roll/pitch/yaw of the node are read and written there, see the properties below
+        self.ntwk.state.add(x, y, z)
+        self.state_index = slice(self.ntwk_wide_index, self.ntwk_wide_index + 1)
+        
         # Increase the total number of nodes by 1
         self.ntwk.tot_node_num += 1
         
@@ -169,7 +169,7 @@ class node(net_func.netelmt_group):
         
         # Check if the channel module has been created, do nothing if yes
         if self.channel is not None:
-            print('Warning: The channel module has already been created for {}'.format(self.type))
+            trc.warning('chnl_module_exists', 'Warning: The channel module has already been created for {}', self.type)
             return 0
         
         # Otherwise, create the channel module for the node
@@ -188,14 +188,14 @@ class node(net_func.netelmt_group):
         
         # update the channel module for this node
         self.channel = chnl_obj
-        print('Channel modulate created for node {}'.format(self.type))
+        trc.debug('chnl_module_created', 'Channel modulate created for node {}', self.type)
         
     def operation(self, env):
         '''
         test function
         '''
         while True:
-            print(self.type + ': Start sensing at %d' % env.now)
+            trc.debug('sensing', '{}: Start sensing at {}', self.type, env.now, tick=env.now)
             sensing_duration = 1500
             yield env.timeout(sensing_duration)
             
@@ -203,6 +203,20 @@ class node(net_func.netelmt_group):
             # print(self.type + ': Start transmitting at %d' % env.now)           
             # yield env.timeout(netcfg.wifi_tsmt_time_tick)        
         
+    # Kinematic state of the node, its row in the network state
+    coord_x   = net_state.state_attr(net_state.pos, 0, moved = True)
+    coord_y   = net_state.state_attr(net_state.pos, 1, moved = True)
+    coord_z   = net_state.state_attr(net_state.pos, 2, moved = True)
+    vel_x     = net_state.state_attr(net_state.vel, 0)
+    vel_y     = net_state.state_attr(net_state.vel, 1)
+    vel_z     = net_state.state_attr(net_state.vel, 2)
+    roll      = net_state.state_attr(net_state.att, 0)
+    pitch     = net_state.state_attr(net_state.att, 1)
+    yaw       = net_state.state_attr(net_state.att, 2)
+    roll_vel  = net_state.state_attr(net_state.att_vel, 0)
+    pitch_vel = net_state.state_attr(net_state.att_vel, 1)
+    yaw_vel   = net_state.state_attr(net_state.att_vel, 2)
+        
     def get_coord(self):
         '''
         Func: get the current coordinates of the node
@@ -214,15 +228,14 @@ class node(net_func.netelmt_group):
         '''
         Func: Set the coordinates of the node       
         '''
-        # update coordinate information of this node
-        self.coord_x = dict_xyz['x']
-        self.coord_y = dict_xyz['y']
-        self.coord_z = dict_xyz['z']
+        # update coordinate information of this node, its row in the network state
+        row = self.ntwk.state.buf[net_state.pos][self.ntwk_wide_index]
+        row[0] = dict_xyz['x']
+        row[1] = dict_xyz['y']
+        row[2] = dict_xyz['z']
         
-        # update the information recorded in the network
-        self.ntwk.axis_x[self.ntwk_wide_index] = self.coord_x
-        self.ntwk.axis_y[self.ntwk_wide_index] = self.coord_y
-        self.ntwk.axis_z[self.ntwk_wide_index] = self.coord_z
+        # mark the node as moved, its distances will be recalculated in ntwk.updt_dist
+        self.ntwk.moved_node.add(self.ntwk_wide_index)
         
 class lte_bs(net_node.node):
     '''
@@ -240,11 +253,8 @@ class lte_bs(net_node.node):
         self.active_usr = []  
         
         # The LTE drone base station should fly with a minimum altitude (which has been set to zero in the father class)
-        # so regenerate the initial altitude with the actual minimum altitude                    
+        # so regenerate the initial altitude with the actual minimum altitude, written to the network state directly
         self.coord_z = random.randint(netcfg.min_flying_height, self.ntwk.net_height)
-
-        # update the initial altitude for the LTE drone base station, which is the last element (just appended)
-        self.ntwk.axis_z[-1] = self.coord_z      
         
         # Register the LTE BS in the network. For each of the registered LTE BS, channel covariance matrix will be
         # estimated
@@ -258,10 +268,10 @@ class lte_bs(net_node.node):
         
         if self.name in self.ntwk.list_lte_bs:
             # already registered, do nothing
-            print('Warning: {} already registered.'.format(self.name))
+            trc.warning('node_registered', 'Warning: {} already registered.', self.name)
         else:
             self.ntwk.list_lte_bs.append(self.name)
-            print('{} registered.'.format(self.name))
+            trc.debug('node_registered', '{} registered.', self.name)
 
         
 class lte_bs_cog(net_node.lte_bs): 
@@ -276,35 +286,27 @@ class lte_bs_cog(net_node.lte_bs):
         # Initialized to None, updated by calling self.est_chn_cov_from_wifi()
         self.chn_cov = None
         
-    def est_chn_cov_from_wifi(self, num_chn_smpl=1000):
+    def est_chn_cov_from_wifi(self, num_chn_smpl = None, chunk = None):
         '''
         Estimate the channel covariance matrix between all active wifi users and this lte base station
         
-        num_chn_smpl: The number of channel samples used for covariance estimation, default 1000
+        num_chn_smpl: The number of channel samples used for covariance estimation, default netcfg.num_sym_4chn_cov_est
+        chunk: The number of channel samples generated and reduced together, default netcfg.chn_cov_chunk. The samples
+               are streamed chunk by chunk, so the memory does not grow with num_chn_smpl
         '''
+        if num_chn_smpl is None:
+            num_chn_smpl = netcfg.num_sym_4chn_cov_est
+        if chunk is None:
+            chunk = netcfg.chn_cov_chunk
         
-        # dummy operation 
-        chn_cov = None
-        
-        # The sum of channel matrices over all wifi stations
-        sum_chn_matrix = None
-               
         # Get the list of active wifi stations, including wifi ap and users
         list_active_wifi_sta = self.ntwk.list_active_wifi_sta
         
-        
-        # For each wifi station, for each symbol duration, generate the channel state information from the wifi station to each antennas
-        # of this lte BS
-        
-        # First get the name of this LTE base station
-        name_lte_bs = self.name  
+        # For each wifi station, get the channel to this lte BS, checked once for all chunks
+        list_chnl = []
         for name_wifi_sta in list_active_wifi_sta:
-            # get the name of the channel between name_lte_bs and name_wifi_sta
-            name_chnl = self.channel.get_name_chanl_2node(name_lte_bs, name_wifi_sta)
-            #print(name_chnl)
-            
-            # The corresponding channel object
-            obj_chnl = self.get_netelmt(name_chnl)
+            # The channel object between this LTE BS and the wifi station, by the network-wide indexes of the two nodes
+            obj_chnl = self.ntwk.get_chnl_n2n(self.ntwk_wide_index, self.get_netelmt(name_wifi_sta).ntwk_wide_index)
             
             # Check if all rules followed by the channel
             # This checking is only conducted when estimating channel covariance matrix,
@@ -314,75 +316,54 @@ class lte_bs_cog(net_node.lte_bs):
             if b_passed == False:
                 print('Error: Failed to pass the channel dimension check.')
                 exit(0)
-            else:
-                pass
-                #print('Passed channel dimension check.')     
                 
-            # Get the dimension of the channel matrix. num_sym_4chn_cov_est is the number of symbols used
-            # for covariance estimation, i.e., the third dimension of the dimension
-            # The first two dimensions are determined by the number of antennas of the involved two nodes
-            # and will be obtained by the function automatically
-            # chnl_dim = obj_chnl.get_dimension(6)    # for test only
-            third_dim = netcfg.num_sym_4chn_cov_est
-            chnl_dim = obj_chnl.get_dimension(third_dim)
-            
-            # To make sure the generate channel matrix consistent with each other in dimension, the first node
-            # must be LTE base station and the second must be wifi station. 
-            # Otherwise, matrix transpose will be needed
-            if net_name.lte in obj_chnl.node1 and net_name.wifi in obj_chnl.node2:
-                # this is the wanted configuration, do nothing
-                pass
-            elif net_name.wifi in obj_chnl.node1 and net_name.lte in obj_chnl.node2:
-                # the first and second dimension needs to be switched
-                tmp_dim = chnl_dim[net_name.chn_row]                        # temporary variable for switching
-                chnl_dim[net_name.chn_row] = chnl_dim[net_name.chn_col]     # switch
-                chnl_dim[net_name.chn_col] = tmp_dim
-                                       
-            # generate channel matrix for this LTE BS and wifi station
-            matx_chnl = obj_chnl.gnrt_chnl_matrix(chnl_dim)
-            
-            # Add the signals received from this wifi station to the overall signal
-            if sum_chn_matrix is None:
-                sum_chn_matrix = matx_chnl
-            else:
-                sum_chn_matrix = sum_chn_matrix + matx_chnl
-                        
-            #print(matx_chnl)
-            #exit(0)
-        
-        # print(sum_chn_matrix)
-        # print(sum_chn_matrix.shape)
-        # exit(0)
+            list_chnl.append(obj_chnl)
         
-        # Loop over all time slots. For each time slot, get the channel matrix and multiple it by its conjugate
-        # transpose. Sum up all multiplication results                
-        for slot_id in range(num_chn_smpl):
-            # Get the channel state in this time slot
-            sum_chnl_this_slot = sum_chn_matrix[:, :, slot_id]
-            # print(sum_chnl_this_slot)
-            # exit(0)
+        # Sum over all slots of the channel matrix multiplied by its conjugate transpose
+        chn_cov = np.zeros((self.num_ant, self.num_ant), dtype=complex)
+        for start in range(0, num_chn_smpl, chunk):
+            num_slot = min(chunk, num_chn_smpl - start)
             
-            # get the conjugate transpose
-            sum_chnl_this_slot_H = np.matrix.getH(sum_chnl_this_slot)
+            # For each wifi station, for each symbol duration of this chunk, generate the channel state information from
+            # the wifi station to each antennas of this lte BS, and sum over all wifi stations
+            sum_chn_matrix = None
+            for obj_chnl in list_chnl:
+                # Get the dimension of the channel matrix. The third dimension is the number of symbols in this chunk
+                # The first two dimensions are determined by the number of antennas of the involved two nodes
+                # and will be obtained by the function automatically
+                chnl_dim = obj_chnl.get_dimension(num_slot)
+                
+                # To make sure the generate channel matrix consistent with each other in dimension, the first node
+                # must be LTE base station and the second must be wifi station. 
+                # Otherwise, matrix transpose will be needed
+                if net_name.wifi in obj_chnl.node1 and net_name.lte in obj_chnl.node2:
+                    # the first and second dimension needs to be switched
+                    chnl_dim[net_name.chn_row], chnl_dim[net_name.chn_col] = chnl_dim[net_name.chn_col], chnl_dim[net_name.chn_row]
+                                           
+                # generate channel matrix for this LTE BS and wifi station
+                matx_chnl = obj_chnl.gnrt_chnl_matrix(chnl_dim)
+                
+                # Add the signals received from this wifi station to the overall signal
+                if sum_chn_matrix is None:
+                    sum_chn_matrix = matx_chnl
+                else:
+                    sum_chn_matrix += matx_chnl
             
-            # Multiple 
-            mul_chnl_chnlH = np.matmul(sum_chnl_this_slot, sum_chnl_this_slot_H)
+            # No active wifi station, no interference
+            if sum_chn_matrix is None:
+                break
             
-            # Add the measurement of this time slot to the overall measurement
-            if chn_cov is None:
-                chn_cov = mul_chnl_chnlH
-            else:
-                chn_cov += mul_chnl_chnlH
+            # All slots at once: H[:, :, s] H[:, :, s]^H summed over the slots s is one matrix product with the
+            # column and slot axes flattened together
+            sum_chn_matrix = sum_chn_matrix.reshape(self.num_ant, -1)
+            chn_cov += np.matmul(sum_chn_matrix, sum_chn_matrix.conj().T)
                 
         # Finally, divided the aggregated measurement by the number of time slots
         chn_cov = chn_cov/num_chn_smpl
-        
-        # print(chn_cov)
-        # exit(0)
                 
         # Update the channel covariance matrix for this LTE BS
         self.chn_cov = chn_cov
-        print('Channel covariance matrix updated for {}'.format(self.name))
+        trc.info('chn_cov_updated', 'Channel covariance matrix updated for {}', self.name)
         # print(self.chn_cov)
              
 class lte_ue(net_node.node):
@@ -401,28 +382,15 @@ class dhs(net_node.node):
         # from base network element
         net_node.node.__init__(self, net_info) 
         
-        # Is this node a transmitter or receiver
-        self.is_tsmt = None
-        self.is_rcvr = None
-        
-        # Set the dhs as transmitter or receiver according to the ingroup id
-        if self.ingroup_id == 1:
-            self.ntwk.tsmt = self     # First dhs, set as transmitter
-            self.is_tsmt = True 
-        elif self.ingroup_id == 2:
-            self.ntwk.rcvr = self     # Second dhs, set as receiver
-            self.is_rcvr = True
-        else:
-            print('Error: This experiment requires two dhs only.')
-            exit(0)
+        # A dhs can be the transmitter or the receiver of any number of links, see net_ntwk.net_ntwk_dhs.get_links
                
         # Initialize coordinates of the dhs
         self.ini_coord()
         
-        # Gyroscope trace and sampling rate
+        # Gyroscope trace and sampling rate, an array or a trace_stream.trace_stream (flytera_cfg.stream_trace)
         gyr, smpl_rate = self.set_gyr() 
         self.gyr = gyr                      # gyr trace
-        self.gyr_len = self.gyr.shape[0]    # Total number samples         
+        self.gyr_len = None if self.is_stream() else self.gyr.shape[0]    # Total number samples, unknown if streamed
         self.smpl_rate = smpl_rate          # Sampling rate
         self.smpl_itvl = 1/self.smpl_rate   # Sampling interval
         #print(self.smpl_itvl)
@@ -450,22 +418,39 @@ class dhs(net_node.node):
         self.vel_y = 0
         self.vel_z = 0                   
         
-        # Antenna model: cone model
-        self.ant_mdl = antmdl.cone_mdl()
-        
+    def get_trace_id(self, trace_ids):
+        '''
+        Func: The trace id of this dhs in a list of trace ids, one per dhs, e.g., flytera_cfg.gry_trace_id
+        The list is used cyclically by the dhs beyond its length
+        '''
+        return trace_ids[(self.ingroup_id-1) % len(trace_ids)]     # ingroup_id starts from 1
+
+    def is_stream(self):
+        '''
+        Whether the traces of this dhs are streamed logs, see flytera_cfg.stream_trace
+        '''
+        return flytera_cfg.stream_trace is not None
+
     def set_laac(self):
         '''
         Set the laac trace for this node
         '''
+        # Streamed log, or standard normal samples drawn chunk by chunk with a seed of the numpy random state
+        if self.is_stream():
+            fname = self.get_trace_id(flytera_cfg.stream_trace)['lac']
+            if fname is None:
+                return trace_stream.trace_stream(seed=np.random.randint(2**31))
+            return trace_stream.trace_stream(fname)
+
         # Get the trace id name
-        trace_id =  flytera_cfg.lac_trace_id[self.ingroup_id-1]     # ingroup_id starts from 1
+        trace_id = self.get_trace_id(flytera_cfg.lac_trace_id)
         
         # There are only four sets of data for micro- and small-scale mobility
         # No measurements for large-scale mobility, in which case the laac data will be generated randomly
         if trace_id in [0, 1]:      # Micro-scale movemenent 
             # Measured trace     
             trace_name = flytera_cfg.lac_trace_name[trace_id] 
-            trace = flytera_cfg.dhs_trace[trace_name]
+            trace, smpl_rate = self.get_trace(trace_name, flytera_cfg.lac_trace_smpl_rate[trace_id])
         elif trace_id in [2, 3]:    # Small-scale movement
             # Generated trace
             # self.gry_len: the same number of lines as the gyroscope measurement
@@ -474,10 +459,15 @@ class dhs(net_node.node):
         elif trace_id in [4, 5]:   
             # Large-scale movement. In flytera_cfg, large-scale measurements are stored in lac_small_1000_inst1.
             trace_name = flytera_cfg.lac_trace_name[trace_id - 2] 
-            trace = flytera_cfg.dhs_trace[trace_name]            
+            trace, smpl_rate = self.get_trace(trace_name, flytera_cfg.lac_trace_smpl_rate[trace_id - 2])
         else:
             print('Error: Trace id must in [0, 1, 2, 3, 4, 5]')
             exit(0)
+
+        # The laac trace is sampled with the ticks of the gyroscope trace
+        if trace_id not in [2, 3] and smpl_rate != self.smpl_rate:
+            trc.warning('trace_rate', 'Warning: {} has laac and gyroscope traces at different rates, {} and {}',
+                        self.name, smpl_rate, self.smpl_rate)
             
         # print(trace)
         # exit(0)
@@ -487,18 +477,33 @@ class dhs(net_node.node):
         '''
         Set the gyroscope trace for this dhs
         '''     
+        # Streamed log, not resampled
+        if self.is_stream():
+            if flytera_cfg.sim_smpl_rate not in [None, flytera_cfg.stream_smpl_rate]:
+                print('Error: Streamed traces must be sampled at flytera_cfg.sim_smpl_rate.')
+                exit(0)
+            return trace_stream.trace_stream(self.get_trace_id(flytera_cfg.stream_trace)['gyr']), flytera_cfg.stream_smpl_rate
                 
         # Get the trace id name
-        trace_id = flytera_cfg.gry_trace_id[self.ingroup_id-1]      #ingroup_id starts from 1
+        trace_id = self.get_trace_id(flytera_cfg.gry_trace_id)
         trace_name = flytera_cfg.gry_trace_name[trace_id]       
         
-        # Get the variable with variable name
-        trace = flytera_cfg.dhs_trace[trace_name]
-        
-        # Sampling rate
-        sampl_rate = flytera_cfg.gry_trace_smpl_rate[trace_id]
-        
-        return trace, sampl_rate
+        # Get the variable with variable name, and its sampling rate, at the simulation rate
+        return self.get_trace(trace_name, flytera_cfg.gry_trace_smpl_rate[trace_id])
+
+    def get_trace(self, trace_name, smpl_rate):
+        '''
+        Func: A measured trace at the simulation rate flytera_cfg.sim_smpl_rate, resampled once and cached, see
+        trace_store.trace_store.get_resampled
+        smpl_rate: the sampling rate of the trace
+        Return: the trace and its sampling rate after resampling
+        '''
+        if flytera_cfg.sim_smpl_rate is None or flytera_cfg.sim_smpl_rate == smpl_rate:
+            return flytera_cfg.dhs_trace[trace_name], smpl_rate
+
+        trace = flytera_cfg.dhs_trace.get_resampled(trace_name, smpl_rate, flytera_cfg.sim_smpl_rate,
+                                                    flytera_cfg.resample_filter)
+        return trace, flytera_cfg.sim_smpl_rate
    
     def ini_coord(self):
         '''
@@ -507,11 +512,14 @@ class dhs(net_node.node):
         # print(flytera_cfg.ini_axis_x.size)
         # exit(0)
         
-        # Check if the initial axis has not been defined for this node 
-        if self.ingroup_id > flytera_cfg.ini_axis_x.size:
-            # Not defined
-            print('Error: The initial axis is not defined for {}'.format(self.name))
-            exit(0)
+        # Check if the initial axis has not been defined for all dhs
+        if flytera_cfg.num_dhs > flytera_cfg.ini_axis_x.size:
+            # Not defined, all dhs on a square grid in the xy-plane starting from the first initial coordinates
+            side = math.ceil(math.sqrt(flytera_cfg.num_dhs))
+            x = flytera_cfg.ini_axis_x[0, 0] + flytera_cfg.ini_spacing * ((self.ingroup_id - 1) % side)
+            y = flytera_cfg.ini_axis_y[0, 0] + flytera_cfg.ini_spacing * ((self.ingroup_id - 1) // side)
+            z = flytera_cfg.ini_axis_z[0, 0]
+            self.set_coord({'x':x, 'y':y, 'z':z})
         else:
             # Defined, initialize the coordinates
             x = flytera_cfg.ini_axis_x[0, self.ingroup_id - 1]
@@ -530,111 +538,135 @@ class dhs(net_node.node):
         
     def operation(self, env):
         '''
-        test function
+        Per-tick simpy process of the dhs, see step()
         '''
-        meas_idx = 0        # measurement index, starting from 0
         while True:
-            # Sampling time
-            self.time       =  self.gyr[meas_idx, 0]
-            
-            # Sampled roll, pitch, yaw
-            self.roll_vel   =  self.gyr[meas_idx, -3]
-            self.pitch_vel  =  self.gyr[meas_idx, -2]
-            self.yaw_vel    =  self.gyr[meas_idx, -1]
-            
-            # Sampled laac in x-, y-, and z-axis
-            laac_x          =  self.laac[meas_idx, -3]
-            laac_y          =  self.laac[meas_idx, -2]
-            laac_z          =  self.laac[meas_idx, -1]
-                       
-            # move to the next measurement 
-            meas_idx += 1
-            
-            # If already the last measurement, stay there
-            meas_idx = min(meas_idx, self.gyr_len-1) 
-            
-            # Update the absolute roll, pitch, yaw based on this tick
-            self.roll   += self.roll_vel * self.smpl_itvl
-            self.pitch  += self.pitch_vel * self.smpl_itvl
-            self.yaw    += self.yaw_vel * self.smpl_itvl
-                       
-            # Update coordinates, this should be done before updating velocity
-            x = self.coord_x + self.vel_x * self.smpl_itvl + 0.5 * laac_x * math.pow(self.smpl_itvl, 2)
-            y = self.coord_y + self.vel_y * self.smpl_itvl + 0.5 * laac_y * math.pow(self.smpl_itvl, 2)
-            z = self.coord_z + self.vel_z * self.smpl_itvl + 0.5 * laac_z * math.pow(self.smpl_itvl, 2)
-            
-            # Update coordiantes in the network coordinate matrix
-            xyz = {'x':x, 'y':y, 'z':z}
-            self.set_coord(xyz)            
-            
-            # Update velocity with acceleration velocity in this tick, for use in the next tick
-            self.vel_x  += laac_x * self.smpl_itvl
-            self.vel_y  += laac_y * self.smpl_itvl
-            self.vel_z  += laac_z * self.smpl_itvl            
-            
-            # If this node is the transmitter, the coordinates are assumed to be at the origon 
-            # Given beamwidth, the wavefront is a circle with radius depending only on the communication distance
-            
+            # The process starts at tick 0 and runs once per tick
+            self.step(env.now)
 
             # print('Time:', self.time)
             # print(self.name + '(roll, pitch, yaw): ({}, {}, {})'.format(self.roll, self.pitch, self.yaw)) 
-            # print(self.name + '(vel_x, vel_y, vel_z): ({}, {}, {})'.format(self.vel_x, self.vel_y, self.vel_z)) 
+            # print(self.name + '(vel_x, vel_y, vel_z): ({}, {}, {})'.format(self.vel_x, self.vel_y, self.vel_z))
             yield env.timeout(1)
-            
-    def updt_tsmt_wavefront(self):
+
+    def step(self, tick):
         '''
-        Update the wavefront of the transmitter. 
+        Func: Advance the dhs by one tick with the measurement of this tick
+        tick: the tick, starting from 0
         '''
+        self.ntwk.prof.start()
+
+        # Measurements of this tick
+        gyr, laac = self.get_meas(tick)
         
-        # This node must be a transmitter
-        if self.is_tsmt == False:
-            print('Error: updt_tsmt_wavefront() supported by only transmitter.')
-            exit(0)
-        
-        #print('Commun. dist:', self.ntwk.comm_dist)
-        
-        # The wavefront of the transmitter is a circle in xy-plane, centered at (x=0, y=0). The radius can be calcuulated
-        # with given beamwidth and communication distance 
-        
-        # First calculate radius of the circle
-        radius = math.tan(flytera_cfg.angle/180 * math.pi) * self.ntwk.comm_dist
-        # print(radius)
-        # exit(0)
+        # Sampling time
+        self.time       =  gyr[0]
         
-        # Information of the wavefront circle 
-        info = {'center':(0, 0), 'semi_xy':(radius, radius), 'angle': 0}
+        # Sampled roll, pitch, yaw velocity and laac in x-, y-, and z-axis
+        rpy_vel         =  gyr[-3:]
+        laac            =  laac[-3:]
         
-        # Get the polygon of the transmitter
-        self.ant_mdl.polygon = self.ant_mdl.get_polygon(info)
-        # print(self.ant_mdl.polygon)
-        # exit(0)
-    
-    def updt_rcv_area(self):
+        # Update the absolute roll, pitch, yaw, then the coordinates and the velocity, in place in the row of this
+        # node in the network state, see net_state.node_state.step
+        self.ntwk.state.step(self.state_index, laac, rpy_vel, self.smpl_itvl)
+        self.ntwk.moved_node.add(self.ntwk_wide_index)
+        self.ntwk.prof.lap('kinematics')
+
+    def get_meas(self, tick):
         '''
-        Update the receive area of the receiver. 
+        Func: The gyroscope and laac measurements of a tick, staying at the last measurement once the trace is exhausted
+        Streamed traces are read forward as the ticks advance
+        Return: the two rows of the traces
         '''
-        
-        # This node must be a receiver
-        if self.is_rcvr == False:
-            print('updt_rcv_area() supported by only receiver.')
-            exit(0)
-            
-        # center of the receive circle
-        center = (self.ntwk.x_rel_adj, self.ntwk.y_rel_adj)
-        # print(center)
-        
-        # calculate the semi-axis of the ellipse
-        semi_x = flytera_cfg.radius * math.cos(self.ntwk.roll_rel_adj)        
-        semi_y = flytera_cfg.radius * math.cos(self.ntwk.pitch_rel_adj)   
-        
-        # rotation of the ellipse
-        rotation = self.ntwk.yaw_rel_adj * 180
+        if self.is_stream():
+            return self.gyr.get(tick), self.laac.get(tick)
 
-        # Information of the wavefront circle 
-        info = {'center':center, 'semi_xy':(semi_x, semi_y), 'angle': rotation}
-        
-        # Update the polygon of the receiver
-        self.ant_mdl.polygon = self.ant_mdl.get_polygon(info)
+        meas_idx = min(tick, self.gyr_len-1)
+        return self.gyr[meas_idx], self.laac[meas_idx]
+
+    def get_kinematics(self, num_tick, laac):
+        '''
+        Func: Integrate the pose of this dhs over num_tick ticks from its current state, the same kinematics as operation()
+        laac: laac trace(s) with the layout of self.laac, i.e., (..., samples, columns); leading axes are independent
+              realizations
+        Return: measurement index of each tick, and dictionary of the pose after each tick: roll/pitch/yaw with num_tick
+                entries, x/y/z and vel with the leading axes of laac
+
+        The state of the node is not changed
+        '''
+        # Measurement index of each tick, staying at the last measurement once the trace is exhausted
+        meas_idx = np.minimum(np.arange(num_tick), self.gyr_len-1)
+
+        dt = self.smpl_itvl
+
+        # Absolute roll, pitch, yaw: cumulative sum of the sampled angular velocity
+        roll  = self.roll  + np.cumsum(self.gyr[meas_idx, -3] * dt)
+        pitch = self.pitch + np.cumsum(self.gyr[meas_idx, -2] * dt)
+        yaw   = self.yaw   + np.cumsum(self.gyr[meas_idx, -1] * dt)
+
+        # Sampled laac in x-, y-, and z-axis
+        laac = laac[..., meas_idx, -3:]
+
+        # Velocity after each tick, and the velocity used in each tick (i.e., the one of the previous tick)
+        vel_ini  = np.array([self.vel_x, self.vel_y, self.vel_z])
+        vel      = vel_ini + np.cumsum(laac * dt, axis=-2)
+        vel_prev = np.concatenate([np.broadcast_to(vel_ini, vel[..., :1, :].shape), vel[..., :-1, :]], axis=-2)
+
+        # Coordinates after each tick
+        coord_ini = np.array([self.coord_x, self.coord_y, self.coord_z])
+        coord = coord_ini + np.cumsum(vel_prev * dt + 0.5 * laac * math.pow(dt, 2), axis=-2)
+
+        return meas_idx, {'roll':roll, 'pitch':pitch, 'yaw':yaw, 'x':coord[..., 0], 'y':coord[..., 1], 'z':coord[..., 2],
+                          'vel':vel}
+
+    def get_pose_trace(self, num_tick):
+        '''
+        Func: Precompute the pose of this dhs for num_tick ticks in one pass, the same kinematics as operation()
+        num_tick: the number of ticks, e.g., flytera_cfg.sim_tick
+        Return: dictionary of arrays with num_tick entries, pose after the update of each tick
+
+        The node is left in the state it would have after num_tick calls of operation()
+        '''
+        meas_idx, pose = self.get_kinematics(num_tick, self.laac)
+        vel = pose.pop('vel')
+
+        # Leave the node in its final state
+        self.time = self.gyr[meas_idx[-1], 0]
+        self.roll_vel, self.pitch_vel, self.yaw_vel = self.gyr[meas_idx[-1], -3:]
+        self.roll, self.pitch, self.yaw = pose['roll'][-1], pose['pitch'][-1], pose['yaw'][-1]
+        self.vel_x, self.vel_y, self.vel_z = vel[-1]
+        self.set_coord({'x':pose['x'][-1], 'y':pose['y'][-1], 'z':pose['z'][-1]})
+
+        return pose
+
+    def is_laac_gnrtd(self):
+        '''
+        Whether the laac trace of this dhs is generated randomly (lac trace id 2 or 3) rather than measured
+        '''
+        if self.is_stream():
+            return self.get_trace_id(flytera_cfg.stream_trace)['lac'] is None
+
+        return self.get_trace_id(flytera_cfg.lac_trace_id) in [2, 3]
+
+    def get_pose_ensemble(self, num_tick, num_rlz, rng):
+        '''
+        Func: Pose traces of num_rlz independent realizations at once, the same kinematics as get_pose_trace
+        num_rlz: the number of realizations
+        rng: np.random.RandomState drawing the generated laac traces, one (gyr_len, 4) trace per realization as set_laac
+        Return: dictionary of arrays, roll/pitch/yaw with num_tick entries, x/y/z of shape (num_rlz, num_tick)
+
+        A measured laac trace is shared by all realizations, its x/y/z are computed once with shape (1, num_tick)
+        The state of the node is not changed
+        '''
+        if self.is_laac_gnrtd():
+            laac = rng.standard_normal((num_rlz, self.gyr_len, 4))
+        else:
+            laac = self.laac[None]
+
+        pose = self.get_kinematics(num_tick, laac)[1]
+        del pose['vel']
+
+        return pose
             
 class wifi_sta(net_node.node):
     '''
@@ -655,15 +687,15 @@ class wifi_sta(net_node.node):
         if status == net_name.on:
             if self.name not in self.ntwk.list_active_wifi_sta:
                 self.ntwk.list_active_wifi_sta.append(self.name)
-                print('{} is set on.'.format(self.name))
+                trc.debug('status', '{} is set on.', self.name)
             else:
-                print('Warning: {} is already active.'.format(self.name))
+                trc.warning('status', 'Warning: {} is already active.', self.name)
         elif status == net_name.off: 
             if self.name in self.ntwk.list_active_wifi_sta:
                 self.ntwk.list_active_wifi_sta.remove(self.name)
-                print('{} is set off.'.format(self.name))
+                trc.debug('status', '{} is set off.', self.name)
             else:
-                print('Warning: {} is already inactive.'.format(self.name))
+                trc.warning('status', 'Warning: {} is already inactive.', self.name)
         else:
             print('Errror: Unsupported network node status.')
             exit(0)
@@ -18,11 +18,15 @@
 #######################################################
 
 # from current folder
-import net_name, net_func, net_node, netcfg, net_channel, net_gui
+import net_name, net_func, net_node, netcfg, net_channel, net_gui, net_state, net_trace, net_spatial
 
-import flytera_cfg
+import flytera_cfg, ovlpmdl, recorder, profiler, result_cache
 
-import math, numpy as np
+import os, math, random, numpy as np
+import scipy.stats
+
+# Events of the network
+trc = net_trace.get_tracer('ntwk')
 
 def new_ntwk(ntwk_type = None):
     '''
@@ -52,25 +56,43 @@ class net_ntwk(net_func.netelmt_group):
         # Updated when nodes are created
         self.name_list_all_nodes = []
         
+        # Objects of all nodes, indexed by the network-wide index of the node
+        self.obj_list_all_nodes = []
+        
         # The list of the names of all node_to_node channel modules
         # Initialized to empty, updated when channel modules are created 
         # Also updated at each coherent time interval: reset all the channels and generate new channel states
         self.name_list_all_n2n_chnl = []
         
+        # Node-to-node channel objects keyed by the network-wide indexes (smaller first) of the two nodes, only the
+        # pairs with a channel, see get_chnl_n2n
+        self.n2n_chnl = {}
+        
+        # Channel coefficients of all node-to-node channels, see net_channel.chnl_store
+        self.chnl_store = net_channel.chnl_store(self)
+        
         # Total number of nodes in the network, incremented by 1 when a new node is created
         # The network-wide index of the node is also calculated based on this parameter
         # Initialize to 0
         self.tot_node_num = 0
                
-        # x-, y- and z-axis coordinates of the nodes in name_list_all_nodes, updated when nodes created, move
-        self.axis_x = []
-        self.axis_y = []
-        self.axis_z = []
+        # Kinematic state (position, velocity, roll/pitch/yaw and their velocity) of the nodes in name_list_all_nodes,
+        # one row per node, updated when nodes created, move. See net_state.py
+        self.state = net_state.node_state()
+        
+        # Rows of the nodes of each type in the state, see get_state_index
+        self.state_index = {}
         
         # distance from between nodes: row index for transmitter, column index for receiver
         # will be updated when coordinates of the nodes changes
         self.dist_matrix = None 
         
+        # Network-wide indexes of the nodes moved since the last distance update, see node.set_coord
+        self.moved_node = set()
+
+        # Spatial index of the node coordinates, for the nodes and node pairs within a range, see net_spatial.py
+        self.spatial = net_spatial.spatial_index(self)
+        
         # positive path loss factor 
         self.positive_pathloss_fact = 4
         
@@ -88,40 +110,78 @@ class net_ntwk(net_func.netelmt_group):
         # GUI, created when the network elements have been created
         self.gui = None
                
-        print('Blank network created.')
+        trc.info('new_ntwk', 'Blank network created.')
+        
+    @property
+    def axis_x(self):
+        '''
+        x-axis coordinates of all nodes, a view of the network state
+        '''
+        return self.state.get(net_state.pos)[:, 0]
+        
+    @property
+    def axis_y(self):
+        '''
+        y-axis coordinates of all nodes, a view of the network state
+        '''
+        return self.state.get(net_state.pos)[:, 1]
+        
+    @property
+    def axis_z(self):
+        '''
+        z-axis coordinates of all nodes, a view of the network state
+        '''
+        return self.state.get(net_state.pos)[:, 2]
+        
+    def get_state_index(self, node_type):
+        '''
+        Func: Rows of the nodes of a type in the network state, a slice if they are contiguous
+        '''
+        # Recalculated only when nodes have been added
+        if node_type not in self.state_index or self.state_index[node_type][0] != self.tot_node_num:
+            rows = [obj_node.ntwk_wide_index for obj_node in self.rgst.iter_stype(node_type)]
+            self.state_index[node_type] = (self.tot_node_num, self.state.get_index(rows))
+        
+        return self.state_index[node_type][1]
+        
+    def step_nodes(self, node_type, laac, rpy_vel, dt):
+        '''
+        Func: Advance all nodes of a type by one tick in one vectorized step, see net_state.node_state.step
+        laac, rpy_vel: linear acceleration and velocity of roll, pitch, yaw of each node, shape (nodes, 3), in the 
+                       order of the registry
+        '''
+        index = self.get_state_index(node_type)
+        self.state.step(index, laac, rpy_vel, dt)
+        
+        # mark the nodes as moved
+        if isinstance(index, slice):
+            self.moved_node.update(range(index.start, index.stop))
+        else:
+            self.moved_node.update(index.tolist())
         
     def reset_chnl(self):
         '''
         Reset all the node-to-node channels, called at the beginning of each coherent time interval
         '''
         
-        # loop over all channel modules
-        for chnl_name in self.name_list_all_n2n_chnl:
-            # get the object of the channel modules
-            chnl_obj = self.get_netelmt(chnl_name)
-            
-            # reset the channel
-            chnl_obj.reset()
+        # all channels at once in the channel store
+        self.chnl_store.reset()
             
     def refresh_chnl(self):
         '''
-        Refresh all the node-to-node channels, called at the beginning of each coherent time interval
+        Refresh the node-to-node channels used in the last coherent time interval, called at the beginning of each
+        coherent time interval. The other channels are refreshed when they are accessed again
         '''
         
-        # loop over all channel modules
-        for chnl_name in self.name_list_all_n2n_chnl:
-            # get the object of the channel modules
-            chnl_obj = self.get_netelmt(chnl_name)
-            
-            # reset the channel
-            chnl_obj.refresh()            
+        # all channels at once in the channel store, one vectorized draw per channel dimension
+        self.chnl_store.refresh()
 
     def operation(self, env):
         '''
         Periodic network operations
         '''
         while True:
-            print(self.name + ': Refreshing channel at {}'.format(env.now))
+            trc.debug('refresh_chnl', '{}: Refreshing channel at {}', self.name, env.now, tick=env.now)
             self.reset_chnl()                               # set channel to be ineffective
             self.refresh_chnl()                             # regenerate channel state information
             yield env.timeout(netcfg.chn_cohr_time_tic)     # wait for next channel coherent time interval
@@ -151,61 +211,129 @@ class net_ntwk(net_func.netelmt_group):
     def ini_channel(self):
         '''
         Func: Generate the channel modules for each pair of the nodes in the network
+        With netcfg.chnl_lazy, only the channel module of each node, the channels of the pairs are created on first
+        access, see get_chnl_n2n
         '''
         
         # Initialize channel for each node
-        for node_name in self.name_list_all_nodes:
-            node_obj = self.get_netelmt(node_name)          # Get the object of the node 
+        for node_obj in self.obj_list_all_nodes:
             node_obj.ini_channel()                          # Initialize channel
         
+        # Generate the coefficients of all channels together
+        self.chnl_store.refresh(sel_all=True)
+        trc.info('ini_channel', 'Channel matrices initialized for {} node pairs', len(self.name_list_all_n2n_chnl))
+        
                 
+    def get_chnl_n2n(self, idx1, idx2, create = None):
+        '''
+        Func: The channel object between the nodes with network-wide index idx1 and idx2
+        create: create the channel if it does not exist, default netcfg.chnl_lazy. Its coefficients are generated on
+                first access, see net_channel.chnl_store.get_chnl
+        Return: the channel object, None if not created, or if the nodes are beyond netcfg.ngbr_range
+        '''
+        key = (idx1, idx2) if idx1 < idx2 else (idx2, idx1)
+        chnl_obj = self.n2n_chnl.get(key)
+        if chnl_obj is not None or idx1 == idx2 or not (netcfg.chnl_lazy if create is None else create):
+            return chnl_obj
+
+        # No channel beyond the range, as ini_channel
+        if netcfg.ngbr_range is not None and self.get_dist(idx1, idx2) > netcfg.ngbr_range:
+            return None
+
+        return self.add_chnl_n2n(key[0], key[1])
+
+    def add_chnl_n2n(self, idx1, idx2):
+        '''
+        Func: Create the channel between the nodes with network-wide index idx1 and idx2, by the channel module of the
+        first node, itself created if needed
+        Return: the channel object
+        '''
+        node_obj = self.obj_list_all_nodes[idx1]
+        if node_obj.channel is None:
+            node_obj.ini_channel()
+
+        return node_obj.channel.add_chnl_2node(self.obj_list_all_nodes[idx2])
+        
+    def get_dist(self, idx1, idx2):
+        '''
+        Func: Distance between the nodes of each pair at their current coordinates, without the distance matrix
+        idx1, idx2: network-wide indexes of the first and the second node of each pair, scalars or arrays
+        '''
+        pos = self.state.get(net_state.pos)
+        diff = pos[idx1] - pos[idx2]
+
+        return np.sqrt(np.square(diff[..., 0]) + np.square(diff[..., 1]) + np.square(diff[..., 2]))
+
     def ini_dist(self):
         '''
         Calculate the distance between nodes: row index - first node; column index - second node
+        The matrix is allocated once here, and then maintained by updt_dist for the nodes that moved
+        With netcfg.ngbr_range, there is no distance matrix, the nodes within range are found by the spatial index
         '''
         
         # check if there are nodes in the network
         if self.name_list_all_nodes == []:
             print('Error: There are no nodes in the network.')
             exit(0)        
-        
-        # Loop over all node names in self.name_list_all_nodes. For each name, calculate the distance to all other nodes
-        # including itself. Then, append the obtained array to the distance matrix.
-        for node_name in self.name_list_all_nodes:           
-            # Obtain the object of the node, and then get the network-wide node index of the node
-            node_obj = self.get_netelmt(node_name)
-            node_index = node_obj.ntwk_wide_index
-            
-            # x-, y- and z-axis of current node
-            curr_x = self.axis_x[node_index]
-            curr_y = self.axis_y[node_index]
-            curr_z = self.axis_z[node_index]
-            
-            # convert x-, y- and z-axis from list to array
-            array_axis_x = np.asarray(self.axis_x)
-            array_axis_y = np.asarray(self.axis_y)
-            array_axis_z = np.asarray(self.axis_z)
-            
-            # calculate distance 
-            curr_dst_array = np.sqrt(np.power(curr_x - array_axis_x, 2) + np.power(curr_y - array_axis_y, 2) + np.power(curr_z - array_axis_z, 2))
 
-            # Update the overall distance matrix
-            if self.dist_matrix is None:
-                # This is the first row
-                self.dist_matrix = curr_dst_array
-            else:
-                # append the current row to the overall distance matrix
-                self.dist_matrix = np.vstack([self.dist_matrix, curr_dst_array])    
+        # Nodes within range from the spatial index, no distance matrix
+        if netcfg.ngbr_range is not None:
+            self.moved_node.clear()
+            return
+        
+        # x-, y- and z-axis of all nodes, indexed by network-wide node index
+        array_axis_x = np.asarray(self.axis_x, dtype=float)
+        array_axis_y = np.asarray(self.axis_y, dtype=float)
+        array_axis_z = np.asarray(self.axis_z, dtype=float)
+        
+        # calculate distance for all pairs at once with broadcasting, one axis at a time and in place to bound
+        # the temporary memory to one extra matrix
+        self.dist_matrix = np.square(np.subtract.outer(array_axis_x, array_axis_x))
+        tmp = np.empty_like(self.dist_matrix)
+        for array_axis in [array_axis_y, array_axis_z]:
+            np.subtract.outer(array_axis, array_axis, out=tmp)
+            self.dist_matrix += np.square(tmp, out=tmp)
+        np.sqrt(self.dist_matrix, out=self.dist_matrix)
+        
+        # All distances are up to date
+        self.moved_node.clear()
 
         # print(self.dist_matrix)
         # exit(0)
         
     def updt_dist(self):
         '''
-        Recalculate distance among nodes
+        Recalculate distance among nodes, only the rows and columns of the nodes that moved since last update
+        With netcfg.ngbr_range, there is no distance matrix to update
         '''
-        self.dist_matrix = None    # First initialize the matrix to None. Otherwise, the new matrix will be appended to the existing one
-        self.ini_dist()            # The recalculate the matrix
+        if netcfg.ngbr_range is not None:
+            self.moved_node.clear()
+            return
+
+        # The matrix has not been initialized, or nodes have been added since
+        if self.dist_matrix is None or self.dist_matrix.shape[0] != self.tot_node_num:
+            self.ini_dist()
+            return
+        
+        # No node moved, do nothing
+        if not self.moved_node:
+            return
+            
+        idx = np.fromiter(self.moved_node, dtype=int, count=len(self.moved_node))
+        self.moved_node.clear()
+        
+        # x-, y- and z-axis of all nodes
+        array_axis_x = np.asarray(self.axis_x, dtype=float)
+        array_axis_y = np.asarray(self.axis_y, dtype=float)
+        array_axis_z = np.asarray(self.axis_z, dtype=float)
+        
+        # distance from the moved nodes to all nodes, one row per moved node
+        curr_dst = np.sqrt(np.square(array_axis_x[idx, None] - array_axis_x) + np.square(array_axis_y[idx, None] - array_axis_y)\
+                           + np.square(array_axis_z[idx, None] - array_axis_z))
+        
+        # Update the rows and the columns of the moved nodes
+        self.dist_matrix[idx, :] = curr_dst
+        self.dist_matrix[:, idx] = curr_dst.T
                                            
     def ping(self):
         '''
@@ -220,7 +348,7 @@ class net_ntwk(net_func.netelmt_group):
         self.net_width  = net_width
         self.net_length = net_length
         self.net_height = net_height
-        print('Network dimension is set to {}x{}x{} in meter.'.format(self.net_width, self.net_length, self.net_height))
+        trc.info('net_area', 'Network dimension is set to {}x{}x{} in meter.', self.net_width, self.net_length, self.net_height)
         
     def add_node(self, node_type, node_number):
         '''
@@ -269,7 +397,7 @@ class net_ntwk(net_func.netelmt_group):
         # Get the node list
         if hasattr(self, group_name) == False:
             # If there is no such a group, do nothing
-            print('Warning: No such node type {}'.format(group_name))                
+            trc.warning('no_node_type', 'Warning: No such node type {}', group_name)                
         else:
             # Otherwise, get the group object
             group_obj = getattr(self, group_name)
@@ -279,173 +407,203 @@ class net_ntwk(net_func.netelmt_group):
 
 class net_ntwk_dhs(net_ntwk):
     '''
-    Class of drone network
+    Class of drone network: N dhs and a set of directed links between them, see flytera_cfg.dhs_links
+
+    The relative poses, wavefronts and normalized capacity of all links are computed together as arrays, one row per
+    link, so the cost of a tick in Python does not grow with the number of links
     '''
+    # Relative pose of a link, the columns of the relative pose arrays
+    pose_keys = ['x', 'y', 'z', 'roll', 'pitch', 'yaw']
+
+    # Statistics of the normalized capacity over the links, recorded per tick; the minimum and maximum only for
+    # more than one link
+    link_stats = [('nmlzd_cap', np.mean), ('nmlzd_cap_min', np.min), ('nmlzd_cap_max', np.max)]
+
     def __init__(self, net_info):      
         # from base network element
         net_ntwk.__init__(self, net_info)   
 
-        # Transmitter (the first dhs) and receiver (the second dhs)
-        # Updated when the dhs are created
-        self.tsmt = None
-        self.rcvr = None
-        
-        # Roll, yaw, pitch of receiver with respect to the transmitter
-        # Updated in each tick
-        self.roll_rel   = 0
-        self.pitch_rel  = 0
-        self.yaw_rel    = 0
-        
-        # Initial relative roll, pitch, yaw, initialized before the network runs, updated periodically
-        self.roll_rel_ini   = 0
-        self.pitch_rel_ini  = 0
-        self.yaw_rel_ini    = 0
-               
-        # Relative coordinates in x-, y-, and z-axis, updated in pre_processing and every tick operation
-        self.x_rel = 0
-        self.y_rel = 0
-        self.z_rel = 0
-        
-        # Initial relative coordinates, initialized before the network runs, updated periodically
-        self.x_rel_ini  = 0
-        self.y_rel_ini  = 0
-        self.z_rel_ini  = 0    
+        # The dhs in the order they are created, set in pre_processing
+        self.dhs_list = []
 
-        # Adjusted relative coordinates since last time beam alignment
-        self.x_rel_adj  = 0
-        self.y_rel_adj  = 0
-        self.z_rel_adj  = 0
-        
-        # Adjusted gyro (roll, pitch, yaw) coordinates since last time beam alignment
-        self.roll_rel_adj   = 0
-        self.pitch_rel_adj  = 0
-        self.yaw_rel_adj    = 0        
-        
-        # Distance between transmitter, updated in pre_processing and tick operation
-        self.comm_dist = 0
+        # Transmitter and receiver of each directed link, as positions in dhs_list, and as rows of the network state
+        # Set in pre_processing from flytera_cfg.dhs_links
+        self.link_tsmt = None
+        self.link_rcvr = None
+        self.link_tsmt_row = None
+        self.link_rcvr_row = None
+
+        # Relative pose (x, y, z, roll, pitch, yaw) of the receiver with respect to the transmitter of each link,
+        # shape (3, links, 6): current, at the last beam alignment, and adjusted since the last beam alignment
+        # rel, rel_ini and rel_adj are dictionaries of views of its columns keyed by pose_keys
+        self.rel_state = None
+        self.rel = {}
+        self.rel_ini = {}
+        self.rel_adj = {}
+
+        # Communication distance of each link, updated in pre_processing and tick operation
+        self.comm_dist = None
+
+        # Normalized capacity of each link in the last tick
+        self.link_cap = None
+
+        # Tick length in second, the sampling interval of the first dhs
+        self.smpl_itvl = None
         
+        # Results of this run, one entry per tick plus the initial one
+        self.rcd = recorder.recorder(flytera_cfg.sim_tick + 1)
+
+        # Stage profiler of this run, see profiler.py, replaced by the run if profiling is on
+        self.prof = profiler.null_prof()
         
+    def get_links(self):
+        '''
+        Func: The directed links of flytera_cfg.dhs_links, found once before the network runs
+        Return: arrays of the transmitter and the receiver of each link, as positions in dhs_list
+        '''
+        num_dhs = len(self.dhs_list)
+
+        if flytera_cfg.dhs_links == 'all':
+            # All ordered pairs of distinct dhs
+            tsmt, rcvr = np.nonzero(~np.eye(num_dhs, dtype=bool))
+        elif flytera_cfg.dhs_links == 'range':
+            # Both directions of the pairs of dhs within range, from the spatial index
+            pos_in_list = np.full(self.tot_node_num, -1)
+            pos_in_list[[obj_node.ntwk_wide_index for obj_node in self.dhs_list]] = np.arange(num_dhs)
+            pairs = pos_in_list[self.spatial.query_pairs(flytera_cfg.link_range)]
+            pairs = pairs[np.all(pairs >= 0, axis=1)]
+            tsmt = np.concatenate([pairs[:, 0], pairs[:, 1]])
+            rcvr = np.concatenate([pairs[:, 1], pairs[:, 0]])
+            order = np.lexsort((rcvr, tsmt))
+            tsmt, rcvr = tsmt[order], rcvr[order]
+        else:
+            links = np.asarray(flytera_cfg.dhs_links, dtype=int).reshape(-1, 2)
+            tsmt, rcvr = links[:, 0], links[:, 1]
+
+        if tsmt.size == 0:
+            print('Error: The drone network requires at least one link.')
+            exit(0)
+        if min(tsmt.min(), rcvr.min()) < 0 or max(tsmt.max(), rcvr.max()) >= num_dhs:
+            print('Error: The links must be between dhs 0 to {}'.format(num_dhs - 1))
+            exit(0)
+        if np.any(tsmt == rcvr):
+            print('Error: The transmitter and the receiver of a link must be different dhs.')
+            exit(0)
+
+        return tsmt, rcvr
+
     def pre_processing(self):
         # pre_processing from parent class
         net_ntwk.pre_processing(self)
+
+        # The dhs and the links between them
+        self.dhs_list = list(self.rgst.iter_stype(net_name.dhs))
+        self.link_tsmt, self.link_rcvr = self.get_links()
+        rows = np.array([obj_node.ntwk_wide_index for obj_node in self.dhs_list])
+        self.link_tsmt_row = rows[self.link_tsmt]
+        self.link_rcvr_row = rows[self.link_rcvr]
+        self.smpl_itvl = self.dhs_list[0].smpl_itvl
+
+        # One sample per tick for all dhs, i.e., the same sampling rate, see flytera_cfg.sim_smpl_rate
+        if any(obj_node.smpl_itvl != self.smpl_itvl for obj_node in self.dhs_list):
+            trc.warning('trace_rate', 'Warning: The dhs traces have different sampling rates, the time of the ticks is '
+                        'that of {}', self.dhs_list[0].name)
+
+        num_link = self.link_tsmt.size
+        self.rel_state = np.zeros((3, num_link, len(self.pose_keys)))
+        for rel, buf in zip([self.rel, self.rel_ini, self.rel_adj], self.rel_state):
+            for col, key in enumerate(self.pose_keys):
+                rel[key] = buf[:, col]
+        self.comm_dist = np.zeros(num_link)
+        self.link_cap = np.ones(num_link)
+        trc.info('links', '{} dhs, {} directed links', len(self.dhs_list), num_link)
         
         # Update initial relative coordinates and roll, pitch, yaw
-        self.updt_rel_xyz_ini()
-        self.updt_rel_rpy_ini()
+        self.updt_rel_ini()
                        
-        # Update the communication distance between transmitter and receiver
-        self.comm_dist =  self.get_comm_dist()
-               
+        # Update the communication distance of the links
+        self.updt_comm_dist()
         
-    def updt_rel_xyz(self):
-        '''
-        Update relative coordinates of the receiver with respect to the transmitter
-        '''
-        self.x_rel = self.rcvr.coord_x - self.tsmt.coord_x 
-        self.y_rel = self.rcvr.coord_y - self.tsmt.coord_y 
-        self.z_rel = self.rcvr.coord_z - self.tsmt.coord_z 
-        # print(self.x_rel, self.y_rel, self.z_rel)
+        # Initial point of the results: beams aligned at time 0
+        self.rcd.add('sim_time', 0)
+        self.record_cap(self.link_cap, self.rcd.add)
         
-    def updt_rel_rpy(self):
+    def updt_rel(self):
         '''
-        Update relative roll, pitch, yaw
+        Update relative coordinates and roll, pitch, yaw of the receivers with respect to the transmitters
         '''
-        self.roll_rel   = self.rcvr.roll  - self.tsmt.roll
-        self.pitch_rel  = self.rcvr.pitch - self.tsmt.pitch
-        self.yaw_rel    = self.rcvr.yaw   - self.tsmt.yaw   
+        rel = self.rel_state[0]
+        pos = self.state.buf[net_state.pos]
+        att = self.state.buf[net_state.att]
+        np.subtract(pos[self.link_rcvr_row], pos[self.link_tsmt_row], out=rel[:, :3])
+        np.subtract(att[self.link_rcvr_row], att[self.link_tsmt_row], out=rel[:, 3:])
 
-    def updt_rel_xyz_ini(self):
-        '''
-        Update initial relative xyz
+    def updt_rel_ini(self):
         '''
-        # First update relative coordinates
-        self.updt_rel_xyz()     
-        
-        # Then update the initial
-        self.x_rel_ini  = self.x_rel
-        self.y_rel_ini  = self.y_rel
-        self.z_rel_ini  = self.z_rel       
-        
-    def updt_rel_rpy_ini(self):
+        Update initial relative pose, the reference of the adjusted relative pose
         '''
-        Update initial relative rpy
-        '''
-        # First update relative roll, pitch, yaw
-        self.updt_rel_rpy()  
+        # First update relative pose
+        self.updt_rel()
         
         # Then update the initial
-        self.roll_rel_ini   = self.roll_rel
-        self.pitch_rel_ini  = self.pitch_rel
-        self.yaw_rel_ini    = self.yaw_rel
+        self.rel_state[1] = self.rel_state[0]
         
-    def updt_rel_xyz_adj(self):
+    def updt_rel_adj(self):
         '''
-        Update adjusted relative xyz
+        Update adjusted relative pose since last time beam alignment
         '''      
-        # Update relative coordinates
-        self.updt_rel_xyz()      
-        
-        # Updated adjusted relative xyz
-        self.x_rel_adj  = self.x_rel - self.x_rel_ini
-        self.y_rel_adj  = self.y_rel - self.y_rel_ini
-        self.z_rel_adj  = self.z_rel - self.z_rel_ini
+        # Update relative pose
+        self.updt_rel()
         
-        # print(self.x_rel_adj, self.y_rel_adj, self.z_rel_adj)
+        # Updated adjusted relative pose
+        np.subtract(self.rel_state[0], self.rel_state[1], out=self.rel_state[2])
         
-    def updt_rel_rpy_adj(self):
+    def updt_comm_dist(self):
         '''
-        Update adjusted relative rpy
+        Update the communication distance of the links from their relative coordinates
+
+        The same as the entries of the distance matrix, which is only updated when needed, see updt_dist
         '''
-        # Update relative roll, pitch, yaw
-        self.updt_rel_rpy()  
+        rel = self.rel
+        np.sqrt(np.square(rel['x']) + np.square(rel['y']) + np.square(rel['z']), out=self.comm_dist)
         
-        # Updated adjusted relative rpy
-        self.roll_rel_adj   = self.roll_rel - self.roll_rel_ini
-        self.pitch_rel_adj  = self.pitch_rel - self.pitch_rel_ini
-        self.yaw_rel_adj    = self.yaw_rel - self.yaw_rel_ini        
-        
-    def get_comm_dist(self):
+    def get_wavefront(self, adj, comm_dist):
         '''
-        Get the communication distance between the transmitter and the receiver
+        Func: Wavefront of the transmitter and receive area of the receiver, from the adjusted relative pose and the
+              communication distance, see get_rel_trace
+        The wavefront is a circle in xy-plane centered at (x=0, y=0), its radius depends only on the communication
+        distance given the beamwidth. The receive area is an ellipse at the adjusted relative coordinates, scaled by
+        roll and pitch and rotated by yaw.
+        Return: tuple of arrays (tsmt_radius, center_x, center_y, semi_x, semi_y, angle), see ovlpmdl.get_nmlzd_cap_cfg
         '''
-        # Get the index of the transmitter and receiver
-        idx1 = self.tsmt.ntwk_wide_index
-        idx2 = self.rcvr.ntwk_wide_index
-        
-        # print('***', self.comm_dist)
-        
-        return self.dist_matrix[idx1, idx2]
-        
-    def updt_tsmt_wavefront(self):
+        tsmt_radius = math.tan(flytera_cfg.angle/180 * math.pi) * comm_dist
+        semi_x = flytera_cfg.radius * np.cos(adj['roll'])
+        semi_y = flytera_cfg.radius * np.cos(adj['pitch'])
+        rotation = adj['yaw'] * 180
+
+        return tsmt_radius, adj['x'], adj['y'], semi_x, semi_y, rotation
+
+    def get_link_stats(self):
         '''
-        Update the wavefront of the transmitter
+        Func: The statistics over the links recorded in this network, see link_stats
         '''
-        self.tsmt.updt_tsmt_wavefront()
-    
-    def updt_rcv_area(self):
+        return self.link_stats[:1 if self.link_tsmt.size == 1 else None]
+
+    def get_cap_stats(self, nmlzd_cap):
         '''
-        Update the receive area of the receiver
+        Func: Statistics over the links of the normalized capacity, see get_link_stats
+        nmlzd_cap: normalized capacity with the links along the first axis
+        Return: list of (name, array without the first axis)
         '''
-        self.rcvr.updt_rcv_area()
-        
-    def get_normalized(self):
+        return [(name, func(nmlzd_cap, axis=0)) for name, func in self.get_link_stats()]
+
+    def record_cap(self, nmlzd_cap, add):
         '''
-        Get the normalized achievable capacity
+        Func: Record the statistics over the links of the normalized capacity, see get_cap_stats
+        add: self.rcd.add for one tick, or self.rcd.extend for the ticks along the last axis
         '''
-        
-        # First, get the overlapping area of the transmit wavefront and the receive antenna surface
-        tsmt_polygon = self.tsmt.ant_mdl.polygon
-        rcvr_polygon = self.rcvr.ant_mdl.polygon
-        ovlp_area = tsmt_polygon.intersection(rcvr_polygon).area
-        
-        # The total area of the receive antenna
-        tot_area = math.pi * math.pow(flytera_cfg.radius, 2)
-        
-        nmlzd_cap = ovlp_area/tot_area
-        
-        # print(nmlzd_cap)
-        
-        return nmlzd_cap
+        for name, value in self.get_cap_stats(nmlzd_cap):
+            add(name, value)
         
     def beam_alignment(self, env, almt_itvl):
         '''
@@ -454,51 +612,347 @@ class net_ntwk_dhs(net_ntwk):
         almt_itvl: alignment interval, in ticks
         '''      
         while True:
-            
-            # Reset relative angle of roll, pitch, and yaw
-            self.updt_rel_rpy_ini()
-            
-            # Reset displacement in x-, y- and z-axis
-            self.updt_rel_xyz_ini()
-            
+            self.align()
             
             yield env.timeout(almt_itvl)           # wait for next interval
             
+    def align(self):
+        '''
+        Beam alignment: the current relative pose of all links becomes the reference of the adjusted relative pose
+        '''
+        self.prof.start()
+
+        # Reset relative angle of roll, pitch, and yaw and displacement in x-, y- and z-axis
+        self.updt_rel_ini()
+
+        self.prof.lap('align')
+            
     def operation(self, env):
         '''
         Periodic network operations
         '''
         while True:
             # print('Network operating...')
+            self.step(env.now)
             
-            # Update adjust relative xyz and rpy
-            self.updt_rel_xyz_adj()
-            self.updt_rel_rpy_adj()
-                                          
-            # Update communication distance             
-            self.updt_dist()  # First, update distance matrix
-            self.comm_dist = self.get_comm_dist()
-            # print(self.comm_dist)            
-            
-            # Update the wavefront of the transmitter
-            self.updt_tsmt_wavefront()
+            yield env.timeout(1)           # wait for next tick
             
-            # Update the receive area of the receiver
-            self.updt_rcv_area()  
+    def step(self, tick):
+        '''
+        Network operation of one tick: normalized capacity of all links with the current poses of the dhs
+        tick: the tick, starting from 0
+        '''
+        prof = self.prof
+        prof.start()
 
-            # Calculate the normalized capacity
-            nmlzd_cap = self.get_normalized()
-            
-            if flytera_cfg.sim_index == 0:
-                flytera_cfg.sim_time.append(self.tsmt.smpl_itvl * env.now)
-                flytera_cfg.data1.append(nmlzd_cap)
-                
-            if flytera_cfg.sim_index == 1:
-                flytera_cfg.data2.append(nmlzd_cap)
-                
-            if flytera_cfg.sim_index == 2:
-                flytera_cfg.data3.append(nmlzd_cap)                
-              
-            
-            # print(self.roll_rel)
-            yield env.timeout(1)           # wait for next tick
\ No newline at end of file
+        # Update adjust relative pose
+        self.updt_rel_adj()
+        prof.lap('rel_pose')
+                                      
+        # Update communication distance             
+        self.updt_comm_dist()
+        prof.lap('dist')
+        
+        # Wavefront of the transmitters and receive area of the receivers
+        wavefront = self.get_wavefront(self.rel_adj, self.comm_dist)
+        prof.lap('wavefront')
+
+        # Calculate the normalized capacity
+        self.link_cap = ovlpmdl.get_nmlzd_cap_cfg(*wavefront)
+        prof.lap('overlap')
+        
+        # Record the results of this tick
+        self.rcd.add('sim_time', self.smpl_itvl * tick)
+        self.record_cap(self.link_cap, self.rcd.add)
+        prof.lap('record')
+
+    def get_almt_ref_tick(self, num_tick, almt_itvl):
+        '''
+        Func: For each tick, the tick whose pose is used as the reference of the latest beam alignment
+
+        In the simpy run, the alignment at t = m*almt_itvl (m >= 1) is scheduled before the dhs updates of that
+        tick unless almt_itvl is 1, so it sees the pose of the previous tick. The alignment at t = 0 sees tick 0.
+        '''
+        tick = np.arange(num_tick)
+        almt_tick = tick // almt_itvl * almt_itvl
+
+        if almt_itvl == 1:
+            return almt_tick
+
+        return np.where(almt_tick == 0, 0, almt_tick - 1)
+
+    def get_rel_trace(self, tsmt_pose, rcvr_pose, almt_itvl):
+        '''
+        Func: Relative pose traces of the receiver with respect to the transmitter, see dhs.get_pose_trace
+        The ticks are along the last axis, leading axes (e.g., realizations) are broadcast
+        almt_itvl: alignment interval, in ticks
+        Return: relative and adjusted (since the last beam alignment) x/y/z/roll/pitch/yaw, and the communication distance
+        '''
+        num_tick = tsmt_pose['roll'].shape[-1]
+        ref = self.get_almt_ref_tick(num_tick, almt_itvl)
+
+        # Relative coordinates and roll, pitch, yaw, adjusted since the last beam alignment
+        rel = {}
+        adj = {}
+        for key in ['x', 'y', 'z', 'roll', 'pitch', 'yaw']:
+            rel[key] = rcvr_pose[key] - tsmt_pose[key]
+            adj[key] = rel[key] - rel[key][..., ref]
+
+        # Communication distance
+        comm_dist = np.sqrt(np.square(tsmt_pose['x'] - rcvr_pose['x']) + np.square(tsmt_pose['y'] - rcvr_pose['y'])\
+                            + np.square(tsmt_pose['z'] - rcvr_pose['z']))
+
+        return rel, adj, comm_dist
+
+    def get_nmlzd_rel(self, adj, comm_dist):
+        '''
+        Func: Normalized capacity from the adjusted relative pose and the communication distance, see get_rel_trace
+        Return: array of normalized capacity with the broadcast shape of the inputs
+        '''
+        return ovlpmdl.get_nmlzd_cap_cfg(*self.get_wavefront(adj, comm_dist))
+
+    def get_link_pose(self, poses):
+        '''
+        Func: Pose traces of the transmitters and the receivers of the links
+        poses: pose traces of the dhs in the order of dhs_list, see dhs.get_pose_trace and dhs.get_pose_ensemble
+        Return: two dictionaries of arrays, with the links along a new first axis
+        '''
+        ndim = max(pose[key].ndim for pose in poses for key in self.pose_keys)
+
+        tsmt_pose = {}
+        rcvr_pose = {}
+        for key in self.pose_keys:
+            # The same number of axes for all keys, and the same shape for all dhs, e.g., measured and generated
+            # laac traces of an ensemble
+            arrays = [pose[key].reshape((1,) * (ndim - pose[key].ndim) + pose[key].shape) for pose in poses]
+            shape = np.broadcast_shapes(*[array.shape for array in arrays])
+            stack = np.stack([np.broadcast_to(array, shape) for array in arrays])
+
+            tsmt_pose[key] = stack[self.link_tsmt]
+            rcvr_pose[key] = stack[self.link_rcvr]
+
+        return tsmt_pose, rcvr_pose
+
+    def get_nmlzd_trace(self, tsmt_pose, rcvr_pose, almt_itvl):
+        '''
+        Func: Normalized capacity for whole pose traces of the transmitters and the receivers of the links, see
+              get_link_pose
+        almt_itvl: alignment interval, in ticks
+        Return: array of normalized capacity, one row per link and one column per tick
+        '''
+        rel, adj, comm_dist = self.get_rel_trace(tsmt_pose, rcvr_pose, almt_itvl)
+        self.prof.lap('rel_pose')
+
+        # Keep the network state consistent with the last tick
+        for key in self.pose_keys:
+            self.rel[key][:] = rel[key][..., -1]
+            self.rel_adj[key][:] = adj[key][..., -1]
+        self.comm_dist[:] = comm_dist[..., -1]
+
+        return self.get_nmlzd_rel(adj, comm_dist)
+
+    def run_trace(self, num_tick, almt_itvl):
+        '''
+        Func: Run the network for num_tick ticks with precomputed pose traces, instead of per-tick simpy processes
+        num_tick: the number of ticks, e.g., flytera_cfg.sim_tick
+        almt_itvl: alignment interval, in ticks
+        '''
+        prof = self.prof
+        prof.start()
+
+        # Pose traces of all dhs in one pass each
+        poses = [obj_node.get_pose_trace(num_tick) for obj_node in self.dhs_list]
+        tsmt_pose, rcvr_pose = self.get_link_pose(poses)
+        prof.lap('kinematics')
+
+        nmlzd_cap = self.get_nmlzd_trace(tsmt_pose, rcvr_pose, almt_itvl)
+        self.link_cap = nmlzd_cap[:, -1]
+        prof.lap('overlap')
+
+        # Record the results of all ticks
+        self.rcd.extend('sim_time', self.smpl_itvl * np.arange(num_tick))
+        self.record_cap(nmlzd_cap, self.rcd.extend)
+        prof.lap('record')
+
+    def get_nmlzd_ensemble(self, num_tick, almt_itvl, num_rlz, seed = None, chunk = None):
+        '''
+        Func: Normalized capacity of num_rlz independent realizations of the generated laac traces (lac trace id 2 and 3),
+              all realizations of a chunk evaluated together as a (links x realizations x ticks) array
+        num_rlz: the number of realizations; only one is computed if no dhs has a generated laac trace
+        seed: seed of the generated laac traces, None to draw from the global np.random state as dhs.set_laac
+        chunk: the number of realizations evaluated together, default flytera_cfg.ens_chunk
+        Return: dictionary of the statistics over the links of the normalized capacity, see get_cap_stats, arrays of
+                shape (realizations, num_tick)
+
+        The network is left unchanged, so any number of ensembles can be run on it
+        '''
+        if chunk is None:
+            chunk = flytera_cfg.ens_chunk
+
+        # Deterministic network, all realizations are the same
+        if not any(obj_node.is_laac_gnrtd() for obj_node in self.dhs_list):
+            num_rlz = 1
+
+        rng = np.random if seed is None else np.random.RandomState(seed)
+
+        prof = self.prof
+        prof.start()
+
+        nmlzd_cap = {name: np.empty((num_rlz, num_tick)) for name, _ in self.get_link_stats()}
+        for start in range(0, num_rlz, chunk):
+            num = min(chunk, num_rlz - start)
+
+            # Pose traces of the dhs, drawn in the order of dhs_list for each chunk
+            poses = [obj_node.get_pose_ensemble(num_tick, num, rng) for obj_node in self.dhs_list]
+            tsmt_pose, rcvr_pose = self.get_link_pose(poses)
+            prof.lap('kinematics')
+
+            adj, comm_dist = self.get_rel_trace(tsmt_pose, rcvr_pose, almt_itvl)[1:]
+            prof.lap('rel_pose')
+            for name, value in self.get_cap_stats(self.get_nmlzd_rel(adj, comm_dist)):
+                nmlzd_cap[name][start:start + num] = value
+            prof.lap('overlap')
+
+        return nmlzd_cap
+
+    def run_ensemble(self, num_tick, almt_itvl, num_rlz = None, seed = None, conf = None):
+        '''
+        Func: Run an ensemble of realizations, see get_nmlzd_ensemble, and record its statistics over time
+        num_rlz: the number of realizations, default flytera_cfg.ens_num_rlz
+        conf: confidence level of the bands, default flytera_cfg.ens_conf
+
+        Recorded per tick, with the initial point (all beams aligned) first:
+            nmlzd_cap                               mean over the realizations, of the mean over the links
+            nmlzd_cap_var                           variance over the realizations (unbiased)
+            nmlzd_cap_ci_low, nmlzd_cap_ci_high     normal confidence interval of the mean
+            nmlzd_cap_band_low, nmlzd_cap_band_high central quantiles of the realizations
+            nmlzd_cap_min, nmlzd_cap_max            mean over the realizations of the minimum and the maximum over the
+                                                    links, with more than one link
+        '''
+        if num_rlz is None:
+            num_rlz = flytera_cfg.ens_num_rlz
+        if conf is None:
+            conf = flytera_cfg.ens_conf
+
+        link_cap = self.get_nmlzd_ensemble(num_tick, almt_itvl, num_rlz, seed)
+        nmlzd_cap = link_cap.pop('nmlzd_cap')
+        num_rlz = nmlzd_cap.shape[0]
+        self.prof.start()
+
+        mean = nmlzd_cap.mean(axis=0)
+        var = nmlzd_cap.var(axis=0, ddof=1) if num_rlz > 1 else np.zeros(num_tick)
+        half = scipy.stats.norm.ppf(0.5 + conf/2) * np.sqrt(var / num_rlz)
+        band_low, band_high = np.quantile(nmlzd_cap, [0.5 - conf/2, 0.5 + conf/2], axis=0)
+        self.prof.lap('stats')
+
+        # sim_time and nmlzd_cap start with the initial point recorded in pre_processing, the other statistics
+        # start with that of the initial point here: all beams aligned in every realization
+        stats = [('nmlzd_cap_var', 0, var), ('nmlzd_cap_ci_low', 1, mean - half), ('nmlzd_cap_ci_high', 1, mean + half),
+                 ('nmlzd_cap_band_low', 1, band_low), ('nmlzd_cap_band_high', 1, band_high)]
+
+        self.rcd.extend('sim_time', self.smpl_itvl * np.arange(num_tick))
+        self.rcd.extend('nmlzd_cap', mean)
+        for name, value in link_cap.items():
+            self.rcd.extend(name, value.mean(axis=0))
+        for name, ini, value in stats:
+            self.rcd.add(name, ini)
+            self.rcd.extend(name, value)
+        self.rcd.add('num_rlz', num_rlz)
+        self.prof.lap('record')
+
+    def get_ckpt_cfg(self, almt_itvl):
+        '''
+        Func: Size of the network a checkpoint is valid for, a resumed run must have the same, the full configuration
+        is checked by its digest, see result_cache.get_cfg_digest
+        '''
+        return np.array([flytera_cfg.sim_tick, almt_itvl, flytera_cfg.angle, flytera_cfg.radius, len(self.dhs_list),
+                         self.link_tsmt.size] + list(flytera_cfg.gry_trace_id) + list(flytera_cfg.lac_trace_id), dtype=float)
+
+    def save_ckpt(self, fname, tick, almt_itvl):
+        '''
+        Func: Save the state of a tick run to a checkpoint file, before the tick is run
+        The state is: node poses and velocities, the time and laac trace of each dhs (the measurement index follows
+        from the tick; of a streamed trace, only the seed of generated samples), relative pose and alignment
+        references of the links, channels, recorded results and the states of the random generators. The distance
+        matrix is not saved, it follows from the node coordinates, see load_ckpt.
+        The file is replaced atomically, a crash while saving keeps the previous one.
+        '''
+        cfg_digest = result_cache.get_cfg_digest(almt_itvl)
+        if cfg_digest is None:
+            print('Error: The configuration cannot be digested, no checkpoint of the run is saved.')
+            exit(0)
+
+        ckpt = {'tick': tick, 'cfg': self.get_ckpt_cfg(almt_itvl), 'cfg_digest': cfg_digest, 'rel_state': self.rel_state,
+                'comm_dist': self.comm_dist, 'link_cap': self.link_cap}
+
+        for name, value in self.state.get_ckpt().items():
+            ckpt['state_' + name] = value
+        for name, value in self.chnl_store.get_ckpt().items():
+            ckpt['chnl_store_' + name] = value
+        for name, value in self.rcd.to_dict().items():
+            ckpt['rcd_' + name] = value
+
+        for obj_node in self.rgst.iter_stype(net_name.dhs):
+            ckpt['dhs_time_' + obj_node.name] = obj_node.time
+            ckpt['dhs_laac_' + obj_node.name] = obj_node.laac.get_ckpt() if obj_node.is_stream() else obj_node.laac
+
+        # Random generators, numpy (e.g., generated laac traces and channels) and Python (initial positions)
+        np_state = np.random.get_state()
+        ckpt['np_random_keys'] = np_state[1]
+        ckpt['np_random_param'] = np.array([np_state[2], np_state[3], np_state[4]], dtype=float)
+        py_state = random.getstate()
+        ckpt['py_random_state'] = np.array(py_state[1], dtype=np.int64)
+        ckpt['py_random_param'] = np.array([py_state[0], np.nan if py_state[2] is None else py_state[2]])
+
+        fname_tmp = fname + '.tmp'
+        with open(fname_tmp, 'wb') as fid:
+            np.savez(fid, **ckpt)
+        os.replace(fname_tmp, fname)
+
+    def load_ckpt(self, fname, almt_itvl):
+        '''
+        Func: Restore the state of a tick run from a checkpoint file, see save_ckpt
+        The network must have been built and pre-processed with the same configuration
+        Return: the tick to continue from
+        '''
+        with np.load(fname) as data:
+            ckpt = {name: data[name] for name in data.files}
+
+        if (not np.array_equal(ckpt['cfg'], self.get_ckpt_cfg(almt_itvl)) or 'cfg_digest' not in ckpt
+                or str(ckpt['cfg_digest']) != result_cache.get_cfg_digest(almt_itvl)):
+            print('Error: The checkpoint {} is of a different configuration.'.format(fname))
+            exit(0)
+
+        self.state.set_ckpt({name: ckpt['state_' + name] for name in net_state.buf_names})
+        # The channels of the checkpoint, those not accessed yet created
+        chnl_ckpt = {name[len('chnl_store_'):]: ckpt[name] for name in ckpt if name.startswith('chnl_store_')}
+        for idx1, idx2 in self.chnl_store.get_ckpt_pairs(chnl_ckpt):
+            if self.get_chnl_n2n(idx1, idx2, create=False) is None:
+                self.add_chnl_n2n(idx1, idx2)
+        self.chnl_store.set_ckpt(chnl_ckpt)
+        self.rcd.from_dict({name[len('rcd_'):]: ckpt[name] for name in ckpt if name.startswith('rcd_')})
+
+        # The distances of the restored coordinates
+        self.ini_dist()
+
+        # In place, rel, rel_ini and rel_adj are views of the relative pose
+        self.rel_state[:] = ckpt['rel_state']
+        self.comm_dist[:] = ckpt['comm_dist']
+        self.link_cap = ckpt['link_cap']
+
+        for obj_node in self.rgst.iter_stype(net_name.dhs):
+            obj_node.time = float(ckpt['dhs_time_' + obj_node.name])
+            if obj_node.is_stream():
+                obj_node.laac.set_ckpt(ckpt['dhs_laac_' + obj_node.name])
+            else:
+                obj_node.laac = ckpt['dhs_laac_' + obj_node.name]
+
+        param = ckpt['np_random_param']
+        np.random.set_state(('MT19937', ckpt['np_random_keys'], int(param[0]), int(param[1]), float(param[2])))
+        param = ckpt['py_random_param']
+        random.setstate((int(param[0]), tuple(int(x) for x in ckpt['py_random_state']),
+                         None if np.isnan(param[1]) else float(param[1])))
+
+        trc.info('load_ckpt', 'Resuming from tick {} of checkpoint {}', int(ckpt['tick']), fname)
+
+        return int(ckpt['tick'])
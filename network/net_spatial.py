@@ -0,0 +1,91 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+# Spatial index of the node coordinates of a network
+#
+# A KD-tree over the coordinates answers range queries, the nodes
+# within range of a node and all node pairs within range, without
+# computing the distances of all pairs. Nodes move every tick, so
+# the tree is built on a snapshot of the coordinates with a skin:
+# it is rebuilt only once a node has moved by more than the skin
+# since the snapshot. A query searches the tree with the range
+# widened by the skin, then keeps the candidates within range at
+# the current coordinates, so its results are always exact.
+#######################################################
+
+import numpy as np
+import scipy.spatial
+
+import netcfg, net_state
+
+class spatial_index:
+    '''
+    KD-tree over the coordinates of all nodes of a network, rebuilt as the nodes move
+    '''
+    def __init__(self, ntwk, skin = None):
+        # The network, for the coordinates in its state
+        self.ntwk = ntwk
+
+        # Distance in meter a node may move before the tree is rebuilt, default netcfg.spatial_skin
+        self.skin = netcfg.spatial_skin if skin is None else skin
+
+        # Tree and the coordinates it was built on, None until the first query
+        self.tree = None
+        self.pos_built = None
+
+        # Number of builds of the tree, for profiling
+        self.num_build = 0
+
+    def update(self):
+        '''
+        Func: Rebuild the tree if nodes have been added, or a node has moved by more than the skin, since the last build
+        Return: the current coordinates of all nodes, a view of the network state
+        '''
+        pos = self.ntwk.state.get(net_state.pos)
+
+        if self.tree is None or self.pos_built.shape[0] != pos.shape[0] or\
+           np.max(np.sum(np.square(pos - self.pos_built), axis=1)) > self.skin * self.skin:
+            self.pos_built = pos.copy()
+            self.tree = scipy.spatial.cKDTree(self.pos_built)
+            self.num_build += 1
+
+        return pos
+
+    def query_node(self, idx, dist):
+        '''
+        Func: The nodes within dist meters of a node, itself excluded
+        idx: network-wide index of the node
+        Return: sorted array of the network-wide indexes of the nodes
+        '''
+        pos = self.update()
+
+        # The query point is current, the coordinates in the tree are off by at most the skin
+        cand = np.asarray(self.tree.query_ball_point(pos[idx], dist + self.skin), dtype=int)
+        cand_dist = np.sqrt(np.sum(np.square(pos[cand] - pos[idx]), axis=1))
+
+        return np.sort(cand[(cand_dist <= dist) & (cand != idx)])
+
+    def query_pairs(self, dist):
+        '''
+        Func: All node pairs within dist meters
+        Return: array of shape (pairs, 2), network-wide indexes with the smaller one first, sorted
+        '''
+        pos = self.update()
+
+        # Both ends of a pair are off by at most the skin in the tree
+        pairs = self.tree.query_pairs(dist + 2 * self.skin, output_type='ndarray')
+        pair_dist = np.sqrt(np.sum(np.square(pos[pairs[:, 0]] - pos[pairs[:, 1]]), axis=1))
+        pairs = pairs[pair_dist <= dist]
+
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
@@ -0,0 +1,144 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+# Kinematic state of all nodes of a network, structure of arrays
+#
+# Position, velocity, attitude (roll, pitch, yaw) and attitude rates
+# of all nodes are kept in contiguous (nodes x 3) NumPy buffers owned
+# by the network, indexed by the network-wide index of the node. Node
+# objects read and write their row through the properties defined
+# with state_attr. The nodes of a type can be advanced together by
+# one vectorized, in-place step.
+#######################################################
+
+import numpy as np
+
+# Buffers of the kinematic state, 3 columns each
+pos     = 'pos'         # x, y, z in meter
+vel     = 'vel'         # velocity in x-, y- and z-axis
+att     = 'att'         # roll, pitch, yaw
+att_vel = 'att_vel'     # velocity of roll, pitch, yaw
+
+buf_names = [pos, vel, att, att_vel]
+
+class node_state:
+    '''
+    Preallocated kinematic state of the nodes, one row per node
+    '''
+    def __init__(self, capacity = 16):
+        # Number of nodes
+        self.num = 0
+
+        # Buffers, enlarged (doubled) when nodes are added beyond the capacity
+        self.buf = {name: np.zeros((capacity, 3)) for name in buf_names}
+
+        # Scratch buffer of the in-place step
+        self.tmp = np.zeros((capacity, 3))
+
+    def add(self, x, y, z):
+        '''
+        Func: Add a node at (x, y, z), at rest
+        Return: the row of the node, i.e., its network-wide index
+        '''
+        if self.num == self.tmp.shape[0]:
+            capacity = 2 * self.num
+            for name in buf_names:
+                buf = np.zeros((capacity, 3))
+                buf[:self.num] = self.buf[name][:self.num]
+                self.buf[name] = buf
+            self.tmp = np.zeros((capacity, 3))
+
+        self.buf[pos][self.num] = (x, y, z)
+        self.num += 1
+
+        return self.num - 1
+
+    def get(self, name):
+        '''
+        Func: The rows of all nodes of a buffer, a view
+        '''
+        return self.buf[name][:self.num]
+
+    def get_index(self, rows):
+        '''
+        Func: Index of the given rows, a slice if they are contiguous, so that buffers are indexed without copies
+        '''
+        rows = np.asarray(rows, dtype=int)
+        if rows.size > 0 and np.array_equal(rows, np.arange(rows[0], rows[0] + rows.size)):
+            return slice(int(rows[0]), int(rows[0]) + rows.size)
+
+        return rows
+
+    def step(self, index, laac, rpy_vel, dt):
+        '''
+        Func: Advance the nodes of index by one tick of dt, in place, the kinematics of net_node.dhs.operation
+        index: rows of the nodes, preferably a slice, see get_index
+        laac: linear acceleration in x-, y- and z-axis of each node, shape (nodes, 3)
+        rpy_vel: velocity of roll, pitch, yaw of each node in this tick, shape (nodes, 3)
+        '''
+        buf_pos = self.buf[pos]
+        buf_vel = self.buf[vel]
+        buf_att = self.buf[att]
+        buf_att_vel = self.buf[att_vel]
+
+        num = buf_pos[index].shape[0]
+        tmp = self.tmp[:num]
+
+        # Absolute roll, pitch, yaw
+        buf_att_vel[index] = rpy_vel
+        np.multiply(buf_att_vel[index], dt, out=tmp)
+        buf_att[index] += tmp
+
+        # Coordinates, this should be done before updating velocity
+        np.multiply(buf_vel[index], dt, out=tmp)
+        buf_pos[index] += tmp
+        np.multiply(laac, 0.5, out=tmp)
+        tmp *= dt * dt
+        buf_pos[index] += tmp
+
+        # Velocity with the acceleration in this tick, for use in the next tick
+        np.multiply(laac, dt, out=tmp)
+        buf_vel[index] += tmp
+
+    def get_ckpt(self):
+        '''
+        Func: Copies of the buffers of all nodes, for a checkpoint of the run
+        Return: dictionary keyed by buffer name
+        '''
+        return {name: self.get(name).copy() for name in buf_names}
+
+    def set_ckpt(self, ckpt):
+        '''
+        Func: Restore the buffers from a checkpoint of the same network, see get_ckpt
+        '''
+        for name in buf_names:
+            if ckpt[name].shape != self.get(name).shape:
+                print('Error: The checkpoint has a different number of nodes.')
+                exit(0)
+            self.get(name)[:] = ckpt[name]
+
+def state_attr(name, col, moved = False):
+    '''
+    Func: Property of a node class reading and writing one column of the node's row in a buffer of the network state
+    moved: mark the node as moved when written, for the distance matrix, see net_ntwk.updt_dist
+    '''
+    def fget(self):
+        return self.ntwk.state.buf[name][self.ntwk_wide_index, col]
+
+    def fset(self, value):
+        self.ntwk.state.buf[name][self.ntwk_wide_index, col] = value
+        if moved:
+            self.ntwk.moved_node.add(self.ntwk_wide_index)
+
+    return property(fget, fset)
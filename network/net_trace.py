@@ -0,0 +1,249 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+# Leveled event tracing of the network subsystems
+#
+# Each subsystem (e.g., ntwk, node, chnl) has a tracer, created
+# once at import with get_tracer. An event has a level, a name, a
+# message template with its arguments, and optionally the tick and
+# further fields. The message is only formatted if the level and
+# the subsystem are switched on, so a disabled event costs one
+# method call and one integer comparison. Events can be written to
+# the terminal, or to a file as text, JSON lines or fixed-size
+# binary records, optionally keeping only one of every n events of
+# each name. The settings are in netcfg.py, see configure.
+#######################################################
+
+import json, time, atexit, struct
+
+import numpy as np
+
+import netcfg
+
+# Levels, events below the level of the subsystem are dropped
+debug   = 10
+info    = 20
+warning = 30
+error   = 40
+off     = 100
+
+level_names = {'debug': debug, 'info': info, 'warning': warning, 'error': error, 'off': off}
+
+# Fixed-size record of the binary format: wall time, level, subsystem id, event id, tick (-1 if none)
+bin_record = struct.Struct('<dBBHq')
+bin_dtype  = np.dtype([('wall', '<f8'), ('level', 'u1'), ('subsys', 'u1'), ('event', '<u2'), ('tick', '<i8')])
+
+class trace_sink:
+    '''
+    Destination of the events of all subsystems
+    '''
+    def __init__(self, fname = None, fmt = 'text', sample = 1):
+        # Output file, None for the terminal (text only)
+        self.fname  = fname
+        self.fmt    = fmt
+        self.sample = max(1, int(sample))
+
+        if fmt not in ['text', 'jsonl', 'binary']:
+            print('Error: Trace format must be in [text, jsonl, binary]')
+            exit(0)
+        if fmt != 'text' and fname is None:
+            print('Error: A file name is required for {} traces'.format(fmt))
+            exit(0)
+
+        if fname is None:
+            self.fid = None
+        else:
+            self.fid = open(fname, 'wb' if fmt == 'binary' else 'w')
+
+        # Number of events seen of each event name, for the sampling
+        self.count = {}
+
+        # Ids of subsystems and event names in the binary records, saved to <fname>.json on close
+        self.subsys_id = {}
+        self.event_id  = {}
+
+        # Wall time of the events relative to the creation of the sink
+        self.time_start = time.perf_counter()
+
+    def emit(self, subsys, level, event, msg, args, tick, fields):
+        '''
+        Func: Write one event
+        '''
+        if self.sample > 1:
+            num = self.count.get(event, 0)
+            self.count[event] = num + 1
+            if num % self.sample != 0:
+                return
+
+        if self.fmt == 'text':
+            text = msg.format(*args) if args else msg
+            if self.fid is None:
+                print(text)
+            else:
+                self.fid.write(text + '\n')
+        elif self.fmt == 'jsonl':
+            record = {'wall': time.perf_counter() - self.time_start, 'level': level, 'subsys': subsys,
+                      'event': event, 'tick': tick, 'msg': msg.format(*args) if args else msg}
+            record.update(fields)
+            self.fid.write(json.dumps(record, default=str) + '\n')
+        else:
+            subsys_id = self.subsys_id.setdefault(subsys, len(self.subsys_id))
+            event_id  = self.event_id.setdefault(event, len(self.event_id))
+            self.fid.write(bin_record.pack(time.perf_counter() - self.time_start, level, subsys_id, event_id,
+                                           -1 if tick is None else tick))
+
+    def flush(self):
+        '''
+        Func: Flush the output file, e.g., before forking worker processes that inherit it
+        '''
+        if self.fid is not None:
+            self.fid.flush()
+
+    def close(self):
+        '''
+        Func: Flush and close the output file, with the name tables of binary traces
+        '''
+        if self.fid is None:
+            return
+
+        self.fid.close()
+        self.fid = None
+
+        if self.fmt == 'binary':
+            with open(self.fname + '.json', 'w') as fid:
+                json.dump({'subsys': sorted(self.subsys_id, key=self.subsys_id.get),
+                           'event': sorted(self.event_id, key=self.event_id.get)}, fid)
+
+class tracer:
+    '''
+    Events of one subsystem
+    '''
+    def __init__(self, subsys):
+        self.subsys = subsys
+
+        # Lowest level written, set by configure
+        self.level = info
+
+    def on(self, level):
+        '''
+        Func: whether events of the level are written, to guard events with expensive fields
+        '''
+        return level >= self.level
+
+    def debug(self, event, msg = '', *args, tick = None, **fields):
+        if self.level <= debug:
+            sink.emit(self.subsys, debug, event, msg, args, tick, fields)
+
+    def info(self, event, msg = '', *args, tick = None, **fields):
+        if self.level <= info:
+            sink.emit(self.subsys, info, event, msg, args, tick, fields)
+
+    def warning(self, event, msg = '', *args, tick = None, **fields):
+        if self.level <= warning:
+            sink.emit(self.subsys, warning, event, msg, args, tick, fields)
+
+    def error(self, event, msg = '', *args, tick = None, **fields):
+        if self.level <= error:
+            sink.emit(self.subsys, error, event, msg, args, tick, fields)
+
+# Tracers of all subsystems and the common sink
+tracers = {}
+sink = trace_sink(netcfg.trace_file, netcfg.trace_format, netcfg.trace_sample)
+
+def get_level(subsys):
+    '''
+    Func: Level of the subsystem from netcfg.trace_level and netcfg.trace_subsys
+    '''
+    if not netcfg.trace_subsys.get(subsys, True):
+        return off
+
+    return level_names[netcfg.trace_level]
+
+def get_tracer(subsys):
+    '''
+    Func: The tracer of the subsystem, created at its first use
+    '''
+    if subsys not in tracers:
+        tracers[subsys] = tracer(subsys)
+        tracers[subsys].level = get_level(subsys)
+
+    return tracers[subsys]
+
+def configure(level = None, subsys = None, fname = None, fmt = None, sample = None):
+    '''
+    Func: Apply the tracing settings, the arguments not given are taken from netcfg
+    level: 'debug', 'info', 'warning', 'error' or 'off'
+    subsys: dictionary of switches by subsystem, e.g., {'chnl': False}, subsystems not listed are on
+    fname: output file, see netcfg.trace_file
+    fmt: 'text', 'jsonl' or 'binary'
+    sample: keep one of every sample events of each event name
+    '''
+    global sink
+
+    if level is not None:
+        netcfg.trace_level = level
+    if subsys is not None:
+        netcfg.trace_subsys = dict(netcfg.trace_subsys, **subsys)
+    if fname is not None:
+        netcfg.trace_file = fname
+    if fmt is not None:
+        netcfg.trace_format = fmt
+    if sample is not None:
+        netcfg.trace_sample = sample
+
+    if netcfg.trace_level not in level_names:
+        print('Error: Trace level must be in [debug, info, warning, error, off]')
+        exit(0)
+
+    sink.close()
+    sink = trace_sink(netcfg.trace_file, netcfg.trace_format, netcfg.trace_sample)
+
+    for name in tracers:
+        tracers[name].level = get_level(name)
+
+def close():
+    '''
+    Func: Flush and close the trace file
+    '''
+    sink.close()
+
+def flush():
+    '''
+    Func: Flush the trace file
+    '''
+    sink.flush()
+
+def set_sink(new_sink):
+    '''
+    Func: Write the events of all tracers to another sink from now on, e.g., one file per job in a worker process
+    Return: the previous sink, left as it is, neither flushed nor closed
+    '''
+    global sink
+
+    old_sink = sink
+    sink = new_sink
+
+    return old_sink
+
+def read_binary(fname):
+    '''
+    Func: Read a binary trace for offline analysis
+    Return: the records as a structured array, see bin_dtype, and the names of the subsystem and event ids
+    '''
+    with open(fname + '.json') as fid:
+        names = json.load(fid)
+
+    return np.fromfile(fname, dtype=bin_dtype), names
+
+atexit.register(close)
@@ -0,0 +1,419 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+############################################################
+## Overlap model: area of the transmit wavefront (circle) covered
+## by the receive antenna surface (rotated, scaled ellipse)
+
+## The receive ellipse is parameterized as
+##     p = center + rot(angle) * diag(semi_x, semi_y) * u,  |u| <= 1
+## For each direction phi of the unit disk, the part of the ray
+## u = s * (cos(phi), sin(phi)) lying inside the transmit circle is an
+## interval [s_lo, s_hi] found in closed form. The overlap area is then
+##     |semi_x * semi_y| * int_0^2pi 0.5 * (s_hi^2 - s_lo^2) dphi
+## evaluated with a fixed trapezoidal rule over phi. Full containment and
+## full separation are exact; partial overlaps converge with num_quad.
+
+## All functions accept arrays of poses (broadcast against each other)
+## and return arrays, so a whole trace can be evaluated in one call.
+############################################################
+
+import os, math, hashlib
+
+import numpy as np
+import scipy.interpolate
+
+import flytera_cfg
+
+def get_quad_dir(num_quad):
+    '''
+    Func: unit directions and weights of the fixed quadrature over the unit disk
+    num_quad: number of directions
+    '''
+    phi = np.arange(num_quad) * (2 * math.pi / num_quad)
+    wgt = 2 * math.pi / num_quad
+
+    return np.cos(phi), np.sin(phi), wgt
+
+def get_ovlp_area(tsmt_radius, center_x, center_y, semi_x, semi_y, angle, num_quad = None, chunk = None):
+    '''
+    Func: overlap area of the transmit circle and the receive ellipse
+    tsmt_radius: radius of the transmit circle, centered at (0, 0)
+    center_x, center_y: center of the receive ellipse
+    semi_x, semi_y: semi-axes of the receive ellipse before rotation
+    angle: counter-clockwise rotation of the ellipse in degrees, as shapely.affinity.rotate
+    num_quad: number of quadrature directions, default flytera_cfg.ovlp_num_quad
+    chunk: number of poses evaluated together, bounds the temporary memory, default flytera_cfg.ovlp_chunk
+    Return: array of overlap areas with the broadcast shape of the inputs
+    '''
+    if num_quad is None:
+        num_quad = flytera_cfg.ovlp_num_quad
+    if chunk is None:
+        chunk = flytera_cfg.ovlp_chunk
+
+    # Broadcast all pose parameters to a common shape, then flatten
+    args  = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in
+                                  (tsmt_radius, center_x, center_y, semi_x, semi_y, angle)])
+    shape = args[0].shape
+    R, cx, cy, a, b, ang = [x.reshape(-1) for x in args]
+
+    # Linear part of the ellipse mapping: rot(angle) * diag(a, b)
+    theta = np.deg2rad(ang)
+    cos_t = np.cos(theta)
+    sin_t = np.sin(theta)
+
+    cos_p, sin_p, wgt = get_quad_dir(num_quad)
+
+    area = np.empty(R.size)
+    for start in range(0, R.size, chunk):
+        sl = slice(start, start + chunk)
+
+        # Ray directions d = M * (cos(phi), sin(phi)), shape (poses, num_quad)
+        ux = a[sl, None] * cos_p
+        uy = b[sl, None] * sin_p
+        dx = cos_t[sl, None] * ux - sin_t[sl, None] * uy
+        dy = sin_t[sl, None] * ux + cos_t[sl, None] * uy
+
+        # |c + s d|^2 = R^2  =>  dd s^2 + 2 cd s + (cc - R^2) = 0
+        dd = dx * dx + dy * dy
+        cd = cx[sl, None] * dx + cy[sl, None] * dy
+        cc = cx[sl] * cx[sl] + cy[sl] * cy[sl] - R[sl] * R[sl]
+        disc = cd * cd - dd * cc[:, None]
+
+        # Rays missing the circle (or degenerate ellipses) contribute nothing
+        valid = (disc > 0) & (dd > 0)
+        sq = np.sqrt(np.where(valid, disc, 0))
+        dd = np.where(valid, dd, 1)
+        s_lo = np.clip((-cd - sq) / dd, 0, 1)
+        s_hi = np.clip((-cd + sq) / dd, 0, 1)
+
+        seg = np.where(valid, 0.5 * (s_hi * s_hi - s_lo * s_lo), 0)
+        area[sl] = np.abs(a[sl] * b[sl]) * wgt * seg.sum(axis=1)
+
+    return area.reshape(shape)
+
+def get_nmlzd_cap(tsmt_radius, center_x, center_y, semi_x, semi_y, angle, rcv_radius = None, num_quad = None):
+    '''
+    Func: normalized capacity, i.e., overlap area divided by the area of the (unrotated) receive surface
+    rcv_radius: radius of the receive surface, default flytera_cfg.radius
+    Return: array of normalized capacity
+    '''
+    if rcv_radius is None:
+        rcv_radius = flytera_cfg.radius
+
+    ovlp_area = get_ovlp_area(tsmt_radius, center_x, center_y, semi_x, semi_y, angle, num_quad)
+
+    return ovlp_area / (math.pi * math.pow(rcv_radius, 2))
+
+# Transmit and receive cone models of the shapely engine, created at the first call and kept across calls, so that
+# the transmit polygon is reused while the transmit radius does not change
+cone_mdls = None
+
+def get_nmlzd_cap_shapely(tsmt_radius, center_x, center_y, semi_x, semi_y, angle, rcv_radius = None):
+    '''
+    Func: reference implementation with shapely polygons, one pose at a time through antmdl.cone_mdl
+    Return: array of normalized capacity
+    '''
+    global cone_mdls
+
+    if cone_mdls is None:
+        import antmdl
+        cone_mdls = (antmdl.cone_mdl(), antmdl.cone_mdl())
+    tsmt_mdl, rcvr_mdl = cone_mdls
+
+    if rcv_radius is None:
+        rcv_radius = flytera_cfg.radius
+
+    args  = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in
+                                  (tsmt_radius, center_x, center_y, semi_x, semi_y, angle)])
+    shape = args[0].shape
+
+    tot_area = math.pi * math.pow(rcv_radius, 2)
+
+    nmlzd_cap = np.empty(args[0].size)
+    for i, (R, cx, cy, a, b, ang) in enumerate(zip(*[x.reshape(-1) for x in args])):
+        tsmt_polygon = tsmt_mdl.get_polygon({'center':(0, 0), 'semi_xy':(R, R), 'angle': 0})
+        rcvr_polygon = rcvr_mdl.get_polygon({'center':(cx, cy), 'semi_xy':(a, b), 'angle': ang})
+        nmlzd_cap[i] = tsmt_polygon.intersection(rcvr_polygon).area/tot_area
+
+    return nmlzd_cap.reshape(shape)
+
+############################################################
+## Lookup table of the overlap ratio, optional engine 'lut'
+
+## The transmit circle is invariant under rotation about (0, 0), so a pose
+## reduces to five scalars:
+##     R/r          transmit radius, relative to the receive radius r
+##     (rho - R)/h  signed offset of the ellipse center from the circle boundary,
+##                  relative to the half-extent h of the ellipse along the radius
+##     a/r, b/r     semi-axes
+##     psi          ellipse angle relative to the radial direction, folded into [0, pi/2]
+## For a straight boundary, the fraction of the ellipse area inside depends on
+## (rho - R)/h only, so the table is nearly flat along the other dimensions and
+## the curvature of the circle is the only correction to interpolate.
+## Ellipses fully inside (rho + max(a, b) <= R) or outside (rho - max(a, b) >= R)
+## are exact. The table holds the fraction of the ellipse area inside the circle,
+## interpolated multilinearly; queries outside the table fall back to the
+## quadrature engine.
+##
+## An interpolation call has a fixed cost of a few hundred microseconds, more
+## than the quadrature of a single pose. The table pays off for batches of
+## poses, e.g., kin_mode 'trace' or the links of a tick together, and when
+## most poses are fully inside or outside the circle.
+############################################################
+
+# Tables built or loaded in this process, keyed by their parameters, see get_lut
+lut_cache = {}
+
+def get_half_extent(a, b, psi):
+    '''
+    Func: half-extent along the x-axis of an ellipse with semi-axes a, b rotated by psi (radian)
+    '''
+    return np.sqrt(np.square(a * np.cos(psi)) + np.square(b * np.sin(psi)))
+
+class ovlp_lut:
+    '''
+    Lookup table of the overlap ratio for a beam width and a receive radius
+    '''
+    def __init__(self, angle, rcv_radius, comm_dist = None, grid = None, num_quad = None):
+        # Beam width in degree and radius of the receive surface
+        self.angle = angle
+        self.rcv_radius = rcv_radius
+
+        # Range of communication distance covered by the table, and number of grid points of each dimension
+        self.comm_dist = flytera_cfg.lut_comm_dist if comm_dist is None else tuple(comm_dist)
+        self.grid = flytera_cfg.lut_grid if grid is None else dict(grid)
+        self.num_quad = flytera_cfg.ovlp_num_quad if num_quad is None else num_quad
+
+        # Grid points of (R/r, (rho - R)/h, a/r, b/r, psi)
+        tan_bw = math.tan(self.angle/180 * math.pi)
+        max_offset = flytera_cfg.lut_max_offset
+        self.axes = (np.linspace(tan_bw * self.comm_dist[0], tan_bw * self.comm_dist[1], self.grid['radius'])/rcv_radius,
+                     np.linspace(-max_offset, max_offset, self.grid['offset']),
+                     np.linspace(flytera_cfg.lut_min_semi, 1, self.grid['semi']),
+                     np.linspace(flytera_cfg.lut_min_semi, 1, self.grid['semi']),
+                     np.linspace(0, math.pi/2, self.grid['psi']))
+
+        # Table of the overlap ratio, and the maximum interpolation error measured on flytera_cfg.lut_num_valid random
+        # validation poses, an estimate: the error at other poses may be larger
+        self.table = None
+        self.interp = None
+        self.err_bound = None
+
+    def get_fname(self):
+        '''
+        Cache file name, unique for the parameters of the table
+        '''
+        key = repr((self.angle, self.rcv_radius, self.comm_dist, sorted(self.grid.items()), self.num_quad,
+                    [(axis[0], axis[-1]) for axis in self.axes]))
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        return os.path.join(flytera_cfg.lut_dir, 'lut_bw{:g}_r{:g}_{}.npz'.format(self.angle, self.rcv_radius, digest))
+
+    def get_ratio(self, Rn, vn, an, bn, psi):
+        '''
+        Exact (quadrature) overlap ratio for normalized coordinates, the ellipse placed on the positive x-axis
+        '''
+        r = self.rcv_radius
+        R = Rn * r
+        a = an * r
+        b = bn * r
+        h = get_half_extent(a, b, psi)
+        area = get_ovlp_area(R, R + vn * h, 0, a, b, np.rad2deg(psi), self.num_quad)
+        return area / (math.pi * a * b)
+
+    def build(self):
+        '''
+        Evaluate the table on the grid, then measure the interpolation error at random poses
+        '''
+        print('Building overlap lookup table for beam width {} and radius {}...'.format(self.angle, self.rcv_radius))
+        mesh = np.meshgrid(*self.axes, indexing='ij')
+        self.table = self.get_ratio(*mesh)
+        self.set_interp()
+
+        # Validation poses drawn uniformly in the table domain
+        rng = np.random.RandomState(0)
+        pts = [rng.uniform(axis[0], axis[-1], flytera_cfg.lut_num_valid) for axis in self.axes]
+        err = np.abs(self.interp(np.column_stack(pts)) - self.get_ratio(*pts))
+
+        # Largest error of the ratio at the sampled poses, not a guaranteed bound. The error of the normalized capacity,
+        # ratio * a * b / r^2 with a, b <= r, is at most that of the ratio at the same pose
+        self.err_bound = float(err.max())
+
+    def set_interp(self):
+        self.interp = scipy.interpolate.RegularGridInterpolator(self.axes, self.table)
+
+    def load(self):
+        '''
+        Load the table from the cache file, build and save it if there is none
+        '''
+        fname = self.get_fname()
+        if os.path.isfile(fname):
+            data = np.load(fname)
+            self.table = data['table']
+            self.err_bound = float(data['err_bound'])
+            self.set_interp()
+            return
+
+        self.build()
+        if not os.path.isdir(flytera_cfg.lut_dir):
+            os.makedirs(flytera_cfg.lut_dir, exist_ok=True)
+        tmp_fname = '{}.{}.tmp.npz'.format(fname[:-4], os.getpid())
+        np.savez(tmp_fname, table=self.table, err_bound=self.err_bound)
+        os.replace(tmp_fname, fname)
+        print('Overlap lookup table saved to {}, max interpolation error {:.2e}'.format(fname, self.err_bound))
+
+    def query(self, tsmt_radius, center_x, center_y, semi_x, semi_y, angle):
+        '''
+        Func: normalized capacity by interpolation, same arguments as get_nmlzd_cap
+        Return: array of normalized capacity
+        '''
+        args  = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in
+                                      (tsmt_radius, center_x, center_y, semi_x, semi_y, angle)])
+        shape = args[0].shape
+        R, cx, cy, a, b, ang = [x.reshape(-1) for x in args]
+
+        r = self.rcv_radius
+        rho = np.hypot(cx, cy)
+        an = np.abs(a) / r
+        bn = np.abs(b) / r
+
+        # Angle between the ellipse axis and the radial direction, folded with the symmetries of the ellipse (pi)
+        # and of the circle about the radial line (reflection)
+        psi = np.mod(np.deg2rad(ang) - np.arctan2(cy, cx), math.pi)
+        psi = np.where(psi > math.pi/2, math.pi - psi, psi)
+
+        Rn = R / r
+        h = get_half_extent(an, bn, psi) * r
+        vn = (rho - R) / np.where(h > 0, h, 1)
+
+        # Fully inside or outside the circle, exact
+        max_semi = np.maximum(np.abs(a), np.abs(b))
+        ratio = np.where(rho + max_semi <= R, 1.0, 0.0)
+
+        # Partial overlap within the table
+        in_band = (rho + max_semi > R) & (rho - max_semi < R)
+        in_table = in_band & (np.abs(vn) <= self.axes[1][-1]) & (Rn >= self.axes[0][0]) & (Rn <= self.axes[0][-1])\
+                   & (an >= self.axes[2][0]) & (bn >= self.axes[3][0])
+        if in_table.any():
+            ratio[in_table] = self.interp(np.column_stack([Rn[in_table], vn[in_table], an[in_table], bn[in_table], psi[in_table]]))
+
+        nmlzd_cap = ratio * an * bn
+
+        # Outside the table, fall back to the quadrature engine
+        out_table = in_band & ~in_table
+        if out_table.any():
+            nmlzd_cap[out_table] = get_nmlzd_cap(R[out_table], cx[out_table], cy[out_table], a[out_table], b[out_table],
+                                                 ang[out_table], rcv_radius = r, num_quad = self.num_quad)
+
+        return nmlzd_cap.reshape(shape)
+
+def get_lut(angle = None, rcv_radius = None):
+    '''
+    Func: the lookup table for the beam width and receive radius, default those in flytera_cfg
+    Loaded from disk, or built, at the first call in a process with the parameters of the table, later calls only
+    look up the parameters
+    '''
+    if angle is None:
+        angle = flytera_cfg.angle
+    if rcv_radius is None:
+        rcv_radius = flytera_cfg.radius
+
+    key = (angle, rcv_radius, tuple(flytera_cfg.lut_comm_dist), tuple(sorted(flytera_cfg.lut_grid.items())),
+           flytera_cfg.ovlp_num_quad, flytera_cfg.lut_max_offset, flytera_cfg.lut_min_semi)
+    lut = lut_cache.get(key)
+    if lut is None:
+        lut = ovlp_lut(angle, rcv_radius)
+        lut.load()
+        lut_cache[key] = lut
+
+    return lut
+
+def get_nmlzd_cap_lut(tsmt_radius, center_x, center_y, semi_x, semi_y, angle):
+    '''
+    Func: normalized capacity by interpolation in the lookup table of the current beam width and receive radius
+    Return: array of normalized capacity
+    '''
+    return get_lut().query(tsmt_radius, center_x, center_y, semi_x, semi_y, angle)
+
+def get_nmlzd_cap_cfg(tsmt_radius, center_x, center_y, semi_x, semi_y, angle):
+    '''
+    Func: normalized capacity with the engine selected by flytera_cfg.ovlp_engine
+    Return: array of normalized capacity
+    '''
+    if flytera_cfg.ovlp_engine == 'quad':
+        return get_nmlzd_cap(tsmt_radius, center_x, center_y, semi_x, semi_y, angle)
+    elif flytera_cfg.ovlp_engine == 'lut':
+        return get_nmlzd_cap_lut(tsmt_radius, center_x, center_y, semi_x, semi_y, angle)
+    elif flytera_cfg.ovlp_engine == 'shapely':
+        return get_nmlzd_cap_shapely(tsmt_radius, center_x, center_y, semi_x, semi_y, angle)
+    else:
+        print('Error: Overlap engine must be in [quad, lut, shapely]')
+        exit(0)
+
+def accuracy_report(num_pose = 2000, num_quad = None, seed = 0):
+    '''
+    Func: compare the quadrature engine with the shapely reference on random poses around the
+    receive surface boundary, where partial overlap happens
+    Return: dictionary with the error statistics
+    '''
+    rng = np.random.RandomState(seed)
+
+    # Beam widths used in the figures and a communication distance around 10 meters
+    angle_bw = rng.choice([5, 10], num_pose)
+    comm_dist = rng.uniform(9.5, 10.5, num_pose)
+    R = np.tan(np.deg2rad(angle_bw)) * comm_dist
+
+    # Receiver centers close to the wavefront boundary, random attitude
+    r   = flytera_cfg.radius
+    rho = R + rng.uniform(-2*r, 2*r, num_pose)
+    psi = rng.uniform(0, 2*math.pi, num_pose)
+    cx  = rho * np.cos(psi)
+    cy  = rho * np.sin(psi)
+    a   = r * np.cos(rng.uniform(-1, 1, num_pose))
+    b   = r * np.cos(rng.uniform(-1, 1, num_pose))
+    ang = rng.uniform(-180, 180, num_pose)
+
+    if num_quad is None:
+        num_quad = flytera_cfg.ovlp_num_quad
+
+    cap_ref  = get_nmlzd_cap_shapely(R, cx, cy, a, b, ang)
+    cap_new  = get_nmlzd_cap(R, cx, cy, a, b, ang, num_quad = num_quad)
+    cap_fine = get_nmlzd_cap(R, cx, cy, a, b, ang, num_quad = 16 * num_quad)
+
+    # Discrepancy against shapely is dominated by the polygon approximation of the circles: the shapely
+    # circle is a 64-gon, and its boundary deviates from the true circle by R * (1 - cos(pi/64))
+    err_ref  = np.abs(cap_new - cap_ref)
+    err_quad = np.abs(cap_new - cap_fine)
+
+    report = {'num_pose': num_pose,
+              'num_quad': num_quad,
+              'max_abs_err_vs_shapely': float(err_ref.max()),
+              'mean_abs_err_vs_shapely': float(err_ref.mean()),
+              'max_abs_err_vs_fine_quad': float(err_quad.max()),
+              'mean_abs_err_vs_fine_quad': float(err_quad.mean()),
+              'polygon_area_ratio': 64/(2*math.pi) * math.sin(2*math.pi/64)}
+
+    return report
+
+if __name__ == '__main__':
+    # Accuracy of the quadrature engine for several resolutions
+    for num_quad in [128, 256, 512, 1024]:
+        report = accuracy_report(num_quad = num_quad)
+        for key in report:
+            print('{:28s}{}'.format(key, report[key]))
+        print('')
+
+    # Maximum interpolation error of the lookup table of the configured beam width and receiver radius, measured on
+    # random validation poses
+    lut = get_lut()
+    print('{:28s}{}'.format('lut_err_bound', lut.err_bound))
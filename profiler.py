@@ -0,0 +1,156 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Stage profiler of a run, owned by the network
+##
+## A tick is split into stages by laps: start() marks the beginning
+## and lap(stage) charges the time since the previous mark to the
+## stage. For each stage the calls and the time are counted, and
+## with alloc also the memory allocated, from tracemalloc, which
+## slows the run down noticeably. A run without profiling uses
+## null_prof, whose methods do nothing.
+#######################################################
+
+import time, tracemalloc
+
+class null_prof:
+    '''
+    Profiler of runs without profiling
+    '''
+    def start(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+    def stop(self):
+        pass
+
+    def get_report(self):
+        return None
+
+class stage_prof:
+    '''
+    Calls, time and allocated memory of each stage
+    '''
+    def __init__(self, alloc = False):
+        # Also measure the allocated memory
+        self.alloc = alloc
+
+        # Calls, time in second, allocated and peak memory in byte of each stage, in the order of first use
+        self.calls = {}
+        self.time  = {}
+        self.mem   = {}
+        self.peak  = {}
+
+        # Time and traced memory of the previous mark
+        self.time_last = 0.0
+        self.mem_last  = 0
+
+        # Memory tracing started by this profiler, stopped by stop(); tracing started by the caller is left running
+        self.started = self.alloc and not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+
+    def start(self):
+        '''
+        Func: Mark the beginning of the first stage
+        '''
+        if self.alloc:
+            tracemalloc.reset_peak()
+            self.mem_last = tracemalloc.get_traced_memory()[0]
+        self.time_last = time.perf_counter()
+
+    def lap(self, stage):
+        '''
+        Func: Charge the time, and memory, since the previous mark to the stage and mark the beginning of the next one
+        '''
+        time_now = time.perf_counter()
+        if stage not in self.calls:
+            self.calls[stage] = 0
+            self.time[stage]  = 0.0
+            self.mem[stage]   = 0
+            self.peak[stage]  = 0
+        self.calls[stage] += 1
+        self.time[stage]  += time_now - self.time_last
+
+        if self.alloc:
+            mem, peak = tracemalloc.get_traced_memory()
+            # Memory allocated during the stage, net of what was freed, and the peak above the mark
+            self.mem[stage]  += max(mem - self.mem_last, 0)
+            self.peak[stage]  = max(self.peak[stage], peak - self.mem_last)
+            tracemalloc.reset_peak()
+            self.mem_last = tracemalloc.get_traced_memory()[0]
+
+        # Do not charge the bookkeeping to the next stage
+        self.time_last = time.perf_counter()
+
+    def stop(self):
+        '''
+        Func: Stop tracing the memory, if started by this profiler
+        '''
+        if self.started and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.started = False
+
+    def get_report(self):
+        '''
+        Func: Report of the run
+        Return: dictionary keyed by stage of dictionaries with calls, time in second, time per call in second, share of
+                the total time and, with alloc, mem and peak in byte
+        '''
+        time_total = sum(self.time.values())
+
+        report = {}
+        for stage in self.calls:
+            report[stage] = {'calls': self.calls[stage], 'time': self.time[stage],
+                             'time_per_call': self.time[stage] / self.calls[stage],
+                             'share': self.time[stage] / time_total if time_total > 0 else 0.0}
+            if self.alloc:
+                report[stage]['mem']  = self.mem[stage]
+                report[stage]['peak'] = self.peak[stage]
+
+        return report
+
+def new_prof(mode = None):
+    '''
+    Func: The profiler of a run
+    mode: None for no profiling, 'time' for calls and time, 'alloc' also for the allocated memory
+    '''
+    if mode is None:
+        return null_prof()
+    elif mode == 'time':
+        return stage_prof()
+    elif mode == 'alloc':
+        return stage_prof(alloc = True)
+    else:
+        print('Error: Profiling mode must be in [None, time, alloc]')
+        exit(0)
+
+def format_report(report):
+    '''
+    Func: The report as a table, one line per stage
+    '''
+    alloc = any('mem' in item for item in report.values())
+
+    lines = ['{:>12s}{:>8s}{:>11s}{:>14s}{:>8s}'.format('stage', 'calls', 'time (s)', 'per call (us)', 'share')
+             + ('{:>12s}{:>12s}'.format('mem (KB)', 'peak (KB)') if alloc else '')]
+    for stage, item in report.items():
+        line = '{:>12s}{:>8d}{:>11.4f}{:>14.2f}{:>8.1%}'.format(stage, item['calls'], item['time'],
+                                                               1e6 * item['time_per_call'], item['share'])
+        if alloc:
+            line += '{:>12.1f}{:>12.1f}'.format(item['mem']/1024, item['peak']/1024)
+        lines.append(line)
+
+    return '\n'.join(lines)
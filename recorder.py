@@ -0,0 +1,102 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Result recorder, owned by each run
+##
+## Every named metric is kept in its own preallocated NumPy
+## buffer, sized from the number of ticks, and the whole record
+## is flushed column by column into one .npz file.
+#######################################################
+
+import numpy as np
+
+class recorder:
+    '''
+    Preallocated buffers of named metrics, e.g., sim_time and nmlzd_cap
+    '''
+    def __init__(self, capacity):
+        # Number of entries preallocated for each metric, e.g., flytera_cfg.sim_tick + 1
+        self.capacity = capacity
+
+        # Buffer and number of recorded entries of each metric, created at the first record of the metric
+        self.buf = {}
+        self.num = {}
+
+        # Report of the stage profiler of the run, None if not profiled, see profiler.py
+        self.prof = None
+
+    def get_buf(self, name, num_new):
+        '''
+        Return the buffer of the metric, allocated or enlarged to hold num_new more entries
+        '''
+        if name not in self.buf:
+            self.buf[name] = np.empty(max(self.capacity, num_new))
+            self.num[name] = 0
+        elif self.num[name] + num_new > self.buf[name].size:
+            # More entries than preallocated, double the buffer
+            buf = np.empty(max(2 * self.buf[name].size, self.num[name] + num_new))
+            buf[:self.num[name]] = self.buf[name][:self.num[name]]
+            self.buf[name] = buf
+
+        return self.buf[name]
+
+    def add(self, name, value):
+        '''
+        Append one entry to the metric
+        '''
+        buf = self.get_buf(name, 1)
+        buf[self.num[name]] = value
+        self.num[name] += 1
+
+    def extend(self, name, values):
+        '''
+        Append an array of entries to the metric
+        '''
+        values = np.asarray(values)
+        buf = self.get_buf(name, values.size)
+        buf[self.num[name]:self.num[name] + values.size] = values
+        self.num[name] += values.size
+
+    def get(self, name):
+        '''
+        The recorded entries of the metric, a view of the buffer
+        '''
+        return self.buf[name][:self.num[name]]
+
+    def names(self):
+        '''
+        Names of all recorded metrics
+        '''
+        return list(self.buf.keys())
+
+    def to_dict(self):
+        '''
+        Copies of the recorded entries of all metrics
+        '''
+        return {name: self.get(name).copy() for name in self.buf}
+
+    def from_dict(self, values):
+        '''
+        Replace all recorded entries with those of a dictionary of arrays, e.g., from to_dict
+        '''
+        self.buf = {}
+        self.num = {}
+        for name in values:
+            self.extend(name, values[name])
+
+    def save(self, fname):
+        '''
+        Flush all metrics to a columnar .npz file, one array per metric
+        '''
+        np.savez(fname, **{name: self.get(name) for name in self.buf})
@@ -0,0 +1,252 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Result cache: the recorded series of a run, stored on disk
+## under a hash of everything the results depend on
+##
+## The key is the SHA-256 of
+##   - the effective configuration, all settings of flytera_cfg
+##     and netcfg except those that do not change the results
+##     (e.g., the engine, profiling, checkpoints, display)
+##   - the alignment interval of the run
+##   - the content of the traces the dhs use, or of the streamed logs
+##   - the source code of the simulator
+##   - the seed, for runs with generated (random) laac traces;
+##     such runs without a seed are not cached
+##
+## Each entry is one .npz file. A hit refreshes its modification
+## time, and the least recently used entries are removed when the
+## cache grows beyond its size bound.
+#######################################################
+
+import os, glob, json, types, hashlib
+
+import numpy as np
+
+# network configuration
+import netcfg, flytera_cfg, trace_stream
+
+# Settings that do not change the results of a run, and the trace store, whose traces are keyed by their content
+cfg_ignored = {'time_wait', 'sim_engine', 'prof_mode', 'ckpt_itvl', 'ckpt_dir', 'cache_dir', 'cache_max_bytes', 'lut_dir',
+               'figs', 'plot_net', 'num_pixel_per_meter', 'trace_level', 'trace_subsys', 'trace_file', 'trace_format',
+               'trace_sample', 'dhs_trace'}
+
+# Source files of the simulator, relative to the directory of this file
+code_files = ['FlyTera.py', 'ovlpmdl.py', 'antmdl.py', 'recorder.py', 'step_engine.py', 'trace_store.py', 'trace_stream.py',
+              'network/*.py']
+
+# SHA-256 of the source code, computed once per process
+code_digest = None
+
+def get_plain(value):
+    '''
+    Func: A setting as plain values: numpy arrays and matrices as nested lists, numpy scalars as Python scalars
+    Return: the plain value, raise TypeError if the setting is of any other type
+    '''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [get_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): get_plain(item) for key, item in value.items()}
+    if isinstance(value, (bool, int, float, str, type(None))):
+        return value
+
+    raise TypeError('setting of type {}'.format(type(value).__name__))
+
+def get_cfg():
+    '''
+    Func: The effective configuration, all settings of flytera_cfg and netcfg except the ignored ones, see get_plain
+    Return: dictionary keyed by module and setting name, or None if a setting cannot be represented, in which case the
+            run is not cached
+    '''
+    cfg = {}
+    for module in [flytera_cfg, netcfg]:
+        for name, value in vars(module).items():
+            if name.startswith('_') or name in cfg_ignored or isinstance(value, types.ModuleType):
+                continue
+            try:
+                cfg[module.__name__ + '.' + name] = get_plain(value)
+            except TypeError:
+                print('Warning: {}.{} is not a plain value, the run is not cached.'.format(module.__name__, name))
+                return None
+
+    return cfg
+
+def get_code_digest():
+    '''
+    Func: SHA-256 of the source files of the simulator
+    '''
+    global code_digest
+
+    if code_digest is None:
+        root = os.path.dirname(os.path.abspath(__file__))
+        sha = hashlib.sha256()
+        for pattern in code_files:
+            for fname in sorted(glob.glob(os.path.join(root, pattern))):
+                sha.update(os.path.relpath(fname, root).replace(os.sep, '/').encode())
+                with open(fname, 'rb') as fid:
+                    sha.update(fid.read())
+        code_digest = sha.hexdigest()
+
+    return code_digest
+
+def get_trace_names():
+    '''
+    Func: Names of the measured traces used by the dhs, see net_node.dhs.set_gyr and net_node.dhs.set_laac, the lists
+          of trace ids are used cyclically as net_node.dhs.get_trace_id
+    '''
+    names = []
+    for i in range(flytera_cfg.num_dhs):
+        names.append(flytera_cfg.gry_trace_name[flytera_cfg.gry_trace_id[i % len(flytera_cfg.gry_trace_id)]])
+
+        lac_id = flytera_cfg.lac_trace_id[i % len(flytera_cfg.lac_trace_id)]
+        if lac_id in [0, 1]:
+            names.append(flytera_cfg.lac_trace_name[lac_id])
+        elif lac_id in [4, 5]:
+            names.append(flytera_cfg.lac_trace_name[lac_id - 2])
+
+    return names
+
+def get_trace_digest():
+    '''
+    Func: SHA-256 of the content of the traces used by the dhs, the measured traces or the streamed logs
+    Return: dictionary keyed by trace name or log file name
+    '''
+    if flytera_cfg.stream_trace is None:
+        return {name: flytera_cfg.dhs_trace.get_digest(name) for name in get_trace_names()}
+
+    fnames = [fname for entry in flytera_cfg.stream_trace for fname in (entry['gyr'], entry['lac']) if fname is not None]
+    return {fname: trace_stream.get_digest(fname) for fname in fnames}
+
+def get_cfg_digest(almt_itvl):
+    '''
+    Func: SHA-256 of the effective configuration of a run, its settings, the content of its traces and the source code,
+          e.g., to check a checkpoint is resumed with the configuration it was saved with
+    Return: the digest, a hex string, or None if a setting is not a plain value, see get_cfg
+    '''
+    cfg = get_cfg()
+    if cfg is None:
+        return None
+
+    key = {'cfg': cfg, 'almt_itvl': almt_itvl, 'trace': get_trace_digest(), 'code': get_code_digest()}
+
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+def is_random():
+    '''
+    Func: Whether the results of a run depend on the random state, i.e., a dhs has a generated laac trace
+    '''
+    if flytera_cfg.stream_trace is not None:
+        stream = flytera_cfg.stream_trace
+        return any(stream[i % len(stream)]['lac'] is None for i in range(flytera_cfg.num_dhs))
+
+    return any(flytera_cfg.lac_trace_id[i % len(flytera_cfg.lac_trace_id)] in [2, 3] for i in range(flytera_cfg.num_dhs))
+
+class result_cache:
+    '''
+    Recorded series of runs, keyed by the hash of their configuration
+    '''
+    def __init__(self, cache_dir = None, max_bytes = None):
+        # Directory of the entries, default flytera_cfg.cache_dir
+        self.cache_dir = flytera_cfg.cache_dir if cache_dir is None else cache_dir
+
+        # Size bound of all entries, in byte, default flytera_cfg.cache_max_bytes
+        self.max_bytes = flytera_cfg.cache_max_bytes if max_bytes is None else max_bytes
+
+    def get_key(self, almt_itvl, seed = None):
+        '''
+        Func: Key of a run with the current configuration
+        seed: seed of the random state of the run
+        Return: the key, a hex string, or None if the run cannot be cached (random, without a seed, or a setting that
+                is not a plain value)
+        '''
+        if is_random() and seed is None:
+            return None
+
+        cfg_digest = get_cfg_digest(almt_itvl)
+        if cfg_digest is None:
+            return None
+
+        key = {'cfg': cfg_digest, 'seed': seed if is_random() else None}
+
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def get_fname(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def load(self, key):
+        '''
+        Func: The series stored under the key
+        Return: dictionary of arrays, or None if there is no such entry
+        '''
+        fname = self.get_fname(key)
+        try:
+            with np.load(fname) as data:
+                values = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+
+        # Most recently used
+        os.utime(fname)
+
+        return values
+
+    def save(self, key, values):
+        '''
+        Func: Store the series under the key, then bound the size of the cache
+        values: dictionary of arrays, e.g., recorder.to_dict()
+        '''
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Written under a temporary name and renamed, so concurrent processes never read partial entries
+        fname = self.get_fname(key)
+        tmp_fname = '{}.{}.tmp'.format(fname, os.getpid())
+        with open(tmp_fname, 'wb') as fid:
+            np.savez(fid, **values)
+        os.replace(tmp_fname, fname)
+
+        self.evict()
+
+    def evict(self):
+        '''
+        Func: Remove the least recently used entries until all entries fit in max_bytes
+        '''
+        entries = []
+        for fname in glob.glob(os.path.join(self.cache_dir, '*.npz')):
+            try:
+                stat = os.stat(fname)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fname))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, fname in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(fname)
+            except OSError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        '''
+        Func: Remove all entries
+        '''
+        for fname in glob.glob(os.path.join(self.cache_dir, '*.npz')):
+            os.remove(fname)
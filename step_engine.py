@@ -0,0 +1,83 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Fixed-step engine, a plain loop over the ticks
+##
+## The per-tick processes of a run (dhs, beam alignment, network
+## operation) only wait for a fixed number of ticks, so instead of
+## a simpy event queue they are registered as periodic tasks and
+## called whenever the tick is a multiple of their period.
+##
+## The tasks are called in the order simpy would resume the
+## equivalent processes: at tick 0 in the order of registration,
+## afterwards ordered by the time their timeout was scheduled, i.e.,
+## tasks of a longer period first, then in the order of registration.
+## Components that are genuinely event-driven stay on simpy.
+#######################################################
+
+class step_engine:
+    '''
+    Periodic tasks called once every period ticks, starting from tick 0
+    '''
+    def __init__(self):
+        # Current tick
+        self.now = 0
+
+        # Registered tasks, (func, period) in the order of registration
+        self.tasks = []
+
+    def add_task(self, func, period = 1):
+        '''
+        Func: Register a task
+        func: called as func(tick) at every tick that is a multiple of period
+        period: in ticks
+        '''
+        if period < 1:
+            print('Error: the period of a task must be at least one tick')
+            exit(0)
+
+        self.tasks.append((func, int(period)))
+
+    def get_schedule(self):
+        '''
+        Func: Tasks in calling order from tick 1 on, longer period first, then the order of registration
+        Return: list of (func, period)
+        '''
+        order = sorted(range(len(self.tasks)), key=lambda i: (-self.tasks[i][1], i))
+
+        return [self.tasks[i] for i in order]
+
+    def run(self, until):
+        '''
+        Func: Run ticks from the current tick up to, not including, until, the same as simpy's env.run(until=until)
+        '''
+        schedule = self.get_schedule()
+
+        # Tasks called every tick, without the modulo
+        every_tick = all(period == 1 for _, period in schedule)
+
+        while self.now < until:
+            tick = self.now
+            if tick == 0:
+                for func, _ in self.tasks:
+                    func(tick)
+            elif every_tick:
+                for func, _ in schedule:
+                    func(tick)
+            else:
+                for func, period in schedule:
+                    if tick % period == 0:
+                        func(tick)
+
+            self.now += 1
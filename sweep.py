@@ -0,0 +1,192 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Sweep runner: run FlyTera.run_net for every combination of
+## figure, beam alignment interval and beam width across a pool
+## of processes. Each run happens in its own worker and returns
+## the results of its own recorder.
+#######################################################
+
+import os, time, itertools, concurrent.futures
+
+import numpy as np
+
+# network configuration
+import netcfg, flytera_cfg
+
+import FlyTera, result_cache
+
+# Event tracing, in network/ which FlyTera puts on the path
+import net_trace
+
+# Settings of netcfg and flytera_cfg changed by run_job
+job_settings = [(netcfg, 'plot_net'), (flytera_cfg, 'gry_trace_id'), (flytera_cfg, 'lac_trace_id'), (flytera_cfg, 'angle'),
+                (flytera_cfg, 'sim_tick'), (flytera_cfg, 'kin_mode'), (flytera_cfg, 'ens_num_rlz'),
+                (flytera_cfg, 'sim_engine'), (flytera_cfg, 'prof_mode'), (flytera_cfg, 'cache_dir')]
+
+def get_jobs(fig_ids, almt_itvls = None, beam_widths = None, seed = None, sim_tick = None, num_rlz = None, engine = None,
+             prof = None, ckpt_dir = None, use_cache = True):
+    '''
+    Func: list all (figure, alignment interval, beam width, sim_tick, seed, num_rlz, engine, prof, ckpt_dir, use_cache)
+          combinations to be run
+    fig_ids: figure ids, keys of flytera_cfg.figs
+    almt_itvls: alignment intervals, default the intervals of each figure
+    beam_widths: beam widths in degree, default the beam width of each figure
+    seed: seed of the random traces, None for fresh entropy in each run
+    sim_tick: the number of ticks to simulate, default flytera_cfg.sim_tick
+    num_rlz: the number of realizations of an ensemble run (kin_mode 'ensemble'), None for the configured kin_mode
+    engine: engine of a tick run, 'simpy' or 'step', None for flytera_cfg.sim_engine
+    prof: stage profiling of each run, None, 'time' or 'alloc', see flytera_cfg.prof_mode
+    ckpt_dir: directory of the checkpoints of the tick runs, None for flytera_cfg.ckpt_dir
+    use_cache: take the results from the cache of flytera_cfg.cache_dir if there, see result_cache.py
+    '''
+    if sim_tick is None:
+        sim_tick = flytera_cfg.sim_tick
+
+    jobs = []
+    for fig_id in fig_ids:
+        fig = flytera_cfg.figs[fig_id]
+        itvls = fig['beam_alignment_itvl'] if almt_itvls is None else almt_itvls
+        widths = [fig['beam_width']] if beam_widths is None else beam_widths
+        for almt_itvl, beam_width in itertools.product(itvls, widths):
+            jobs.append((fig_id, almt_itvl, beam_width, sim_tick, seed, num_rlz, engine, prof, ckpt_dir,
+                         use_cache))
+
+    return jobs
+
+def run_job(job):
+    '''
+    Func: run one simulation in the current process
+    job: (figure id, alignment interval, beam width, sim_tick, seed, num_rlz, engine, prof, ckpt_dir, use_cache)
+    Return: the job and the result arrays of the run, e.g., sim_time and nmlzd_cap, with the wall-clock time in second
+            and, if profiled, the report of the stage profiler under 'prof'
+    '''
+    fig_id, almt_itvl, beam_width, sim_tick, seed, num_rlz, engine, prof, ckpt_dir, use_cache = job
+
+    # The settings changed by the job, restored after the run, so a job run in the current process (max_workers 1)
+    # leaves the configuration and random state of the caller as a job run in a worker does
+    saved = [(module, name, getattr(module, name)) for module, name in job_settings]
+    random_state = np.random.get_state()
+    try:
+        # No GUI in the workers
+        netcfg.plot_net = False
+
+        # Update the simulation parameters
+        fig = flytera_cfg.figs[fig_id]
+        flytera_cfg.gry_trace_id = fig['gry_trace_id']
+        flytera_cfg.lac_trace_id = fig['lac_trace_id']
+        flytera_cfg.angle        = beam_width
+        flytera_cfg.sim_tick     = sim_tick
+
+        # Ensemble of realizations instead of a single run
+        if num_rlz is not None:
+            flytera_cfg.kin_mode    = 'ensemble'
+            flytera_cfg.ens_num_rlz = num_rlz
+
+        # Engine of a tick run
+        if engine is not None:
+            flytera_cfg.sim_engine = engine
+
+        # Stage profiling
+        if prof is not None:
+            flytera_cfg.prof_mode = prof
+
+        # Results not taken from, nor stored in, the cache
+        if not use_cache:
+            flytera_cfg.cache_dir = None
+
+        # Checkpoint of a tick run, one file per job and configuration, a job run again with the same configuration
+        # resumes from it, see result_cache.get_cfg_digest
+        if ckpt_dir is None:
+            ckpt_dir = flytera_cfg.ckpt_dir
+        ckpt_fname = None
+        cfg_digest = None
+        if ckpt_dir is not None and flytera_cfg.kin_mode == 'tick':
+            cfg_digest = result_cache.get_cfg_digest(almt_itvl)
+        if cfg_digest is not None:
+            if not os.path.isdir(ckpt_dir):
+                os.makedirs(ckpt_dir, exist_ok=True)
+            ckpt_fname = os.path.join(ckpt_dir, 'fig{}_itvl{}_bw{:g}_tick{}_seed{}_{}.npz'.format(
+                fig_id, almt_itvl, beam_width, sim_tick, seed, cfg_digest[:16]))
+
+        # Forked workers inherit the same random state, reseed so that random traces differ unless a seed is given
+        np.random.seed(seed)
+
+        time_start = time.perf_counter()
+        rcd = FlyTera.run_net(almt_itvl, ckpt_fname, seed)
+        wall_time = time.perf_counter() - time_start
+
+        result = rcd.to_dict()
+        result['wall_time'] = wall_time
+        if rcd.prof is not None:
+            result['prof'] = rcd.prof
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+        np.random.set_state(random_state)
+
+    return job, result
+
+def run_job_worker(job, job_id):
+    '''
+    Func: run_job in a worker process. With a trace file, the events of the job are written to their own file
+          <netcfg.trace_file>.job<job_id>, closed before returning: the file inherited from the parent is never flushed
+          by the worker, which exits without running the atexit hooks
+    job_id: index of the job in the sweep
+    '''
+    if netcfg.trace_file is None:
+        return run_job(job)
+
+    job_sink = net_trace.trace_sink('{}.job{}'.format(netcfg.trace_file, job_id), netcfg.trace_format,
+                                    netcfg.trace_sample)
+    old_sink = net_trace.set_sink(job_sink)
+    try:
+        return run_job(job)
+    finally:
+        job_sink.close()
+        net_trace.set_sink(old_sink)
+
+def run_sweep(fig_ids, almt_itvls = None, beam_widths = None, seed = None, max_workers = None, sim_tick = None, num_rlz = None,
+              engine = None, prof = None, ckpt_dir = None, use_cache = True):
+    '''
+    Func: run all combinations of figures, alignment intervals and beam widths, see get_jobs
+    max_workers: the number of worker processes, default the number of CPUs; 1 runs in the current process
+    Return: dictionary keyed by (figure id, alignment interval, beam width) with the result arrays of each run
+    '''
+    jobs = get_jobs(fig_ids, almt_itvls, beam_widths, seed, sim_tick, num_rlz, engine, prof, ckpt_dir, use_cache)
+
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+
+    if max_workers == 1:
+        done = list(map(run_job, jobs))
+    else:
+        # Nothing buffered for the trace file when the workers are forked, see run_job_worker
+        net_trace.flush()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            done = list(executor.map(run_job_worker, jobs, range(len(jobs))))
+
+    # Gather the results of all workers
+    results = {}
+    for job, result in done:
+        fig_id, almt_itvl, beam_width = job[:3]
+        results[(fig_id, almt_itvl, beam_width)] = result
+
+    return results
+
+if __name__ == '__main__':
+    # Regenerate all figures
+    results = run_sweep(sorted(flytera_cfg.figs.keys()))
+    for key in sorted(results.keys()):
+        print(key, results[key]['nmlzd_cap'][-1])
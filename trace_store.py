@@ -0,0 +1,212 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Trace store: lazy, memory-mapped access to the drone traces
+##
+## The .mat file is converted once into one .npy file per trace,
+## plus an index.json with the source size/mtime and the shape and
+## dtype of every trace. Afterwards a trace is only memory-mapped
+## when it is first accessed, so a run touches only the traces it
+## selects and processes share the pages through the OS cache.
+## The conversion is redone whenever the .mat file changes.
+##
+## A trace resampled to another rate is computed once and cached
+## the same way, under resampled/, keyed by the trace, its content
+## and the two rates, see get_resampled.
+#######################################################
+
+import os, json, hashlib
+
+import numpy as np
+
+# Taps of the low-pass FIR filter applied before downsampling, see resample
+aa_num_taps = 31
+
+def resample(trace, smpl_rate, rate, anti_alias = False):
+    '''
+    Resample a trace, one sample per row, from smpl_rate to rate by linear interpolation of all columns at once
+    The samples are taken as uniformly spaced at smpl_rate, the resampled trace spans the same duration
+    anti_alias: when downsampling, low-pass filter the last three columns (the x-, y-, z-axis, not the sampling time)
+                at the Nyquist frequency of the new rate first, zero-phase
+    '''
+    trace = np.asarray(trace, dtype=float)
+    num_smpl = trace.shape[0]
+    if rate == smpl_rate or num_smpl < 2:
+        return trace.copy()
+
+    if anti_alias and rate < smpl_rate:
+        # Only needed for the filtering
+        import scipy.signal
+
+        taps = scipy.signal.firwin(aa_num_taps, rate / smpl_rate)
+        trace = trace.copy()
+        trace[:, -3:] = scipy.signal.filtfilt(taps, [1.0], trace[:, -3:], axis=0,
+                                              padlen=min(3 * aa_num_taps, num_smpl - 1))
+
+    # Position of each new sample between the original ones
+    pos = np.arange(int(np.floor((num_smpl - 1) * rate / smpl_rate + 1e-9)) + 1) * (smpl_rate / rate)
+    idx = np.minimum(pos.astype(int), num_smpl - 2)
+    frac = (pos - idx)[:, None]
+
+    return trace[idx] * (1 - frac) + trace[idx + 1] * frac
+
+class trace_store:
+    '''
+    Dictionary-like access to the traces of a .mat file, e.g., store['gyr_micro_1000_inst1']
+    '''
+    def __init__(self, mat_fname, cache_dir = None):
+        # Source .mat file
+        self.mat_fname = mat_fname
+
+        # Directory of the converted traces, default <mat file name>_npy next to the .mat file
+        if cache_dir is None:
+            cache_dir = os.path.splitext(mat_fname)[0] + '_npy'
+        self.cache_dir = cache_dir
+
+        # Metadata index, loaded (and the traces converted if needed) at first access
+        self.index = None
+
+        # Traces memory-mapped so far
+        self.trace = {}
+
+        # Resampled traces memory-mapped so far, keyed by (name, sampling rate, new rate, anti_alias)
+        self.resampled = {}
+
+        # SHA-256 of the content of the traces digested so far
+        self.digest = {}
+
+    def get_src_info(self):
+        '''
+        Size and modification time of the .mat file, used to detect a stale conversion
+        '''
+        stat = os.stat(self.mat_fname)
+        return {'source': os.path.basename(self.mat_fname), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def load_index(self):
+        '''
+        Load the metadata index, convert the .mat file first if there is no valid conversion
+        '''
+        fname = os.path.join(self.cache_dir, 'index.json')
+        src_info = self.get_src_info()
+
+        if os.path.isfile(fname):
+            with open(fname) as f:
+                index = json.load(f)
+            if all(index.get(key) == src_info[key] for key in src_info):
+                self.index = index
+                return
+
+        self.index = self.convert(src_info)
+
+    def convert(self, src_info):
+        '''
+        Convert every variable of the .mat file into its own .npy file and write the index
+        Files are written under temporary names and renamed, so concurrent processes never read partial files
+        '''
+        # Only needed for the conversion
+        import scipy.io as sio
+
+        print('Converting {} into {}...'.format(self.mat_fname, self.cache_dir))
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        mat = sio.loadmat(self.mat_fname)
+
+        index = dict(src_info)
+        index['traces'] = {}
+        for name in mat:
+            # Skip the header, version and globals of the .mat file
+            if name.startswith('__'):
+                continue
+
+            trace = np.ascontiguousarray(mat[name])
+            fname = name + '.npy'
+            tmp_fname = os.path.join(self.cache_dir, '{}.{}.tmp'.format(fname, os.getpid()))
+            with open(tmp_fname, 'wb') as f:
+                np.save(f, trace)
+            os.replace(tmp_fname, os.path.join(self.cache_dir, fname))
+
+            index['traces'][name] = {'file': fname, 'shape': list(trace.shape), 'dtype': trace.dtype.str}
+
+        tmp_fname = os.path.join(self.cache_dir, 'index.json.{}.tmp'.format(os.getpid()))
+        with open(tmp_fname, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_fname, os.path.join(self.cache_dir, 'index.json'))
+
+        return index
+
+    def keys(self):
+        '''
+        Names of all traces in the store
+        '''
+        if self.index is None:
+            self.load_index()
+
+        return self.index['traces'].keys()
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __getitem__(self, name):
+        '''
+        Memory-map the trace with the given name, read-only
+        '''
+        if name not in self.trace:
+            if name not in self.keys():
+                raise KeyError(name)
+            fname = os.path.join(self.cache_dir, self.index['traces'][name]['file'])
+            self.trace[name] = np.load(fname, mmap_mode='r')
+
+        return self.trace[name]
+
+    def get_resampled(self, name, smpl_rate, rate, anti_alias = False):
+        '''
+        Memory-map the trace with the given name resampled from smpl_rate to rate, see resample, read-only
+        The resampled trace is computed at first access and cached on disk, in a file named after the trace, its
+        digest and the rates, so a changed trace or rate is never served stale
+        '''
+        # The filter only applies to downsampling
+        anti_alias = anti_alias and rate < smpl_rate
+
+        key = (name, smpl_rate, rate, anti_alias)
+        if key not in self.resampled:
+            resampled_dir = os.path.join(self.cache_dir, 'resampled')
+            fname = os.path.join(resampled_dir, '{}_{}_{:g}_{:g}Hz{}.npy'.format(name, self.get_digest(name)[:16], smpl_rate,
+                                                                                 rate, '_aa' if anti_alias else ''))
+            if not os.path.isfile(fname):
+                if not os.path.isdir(resampled_dir):
+                    os.makedirs(resampled_dir, exist_ok=True)
+
+                # Written under a temporary name and renamed, as the conversion
+                tmp_fname = '{}.{}.tmp'.format(fname, os.getpid())
+                with open(tmp_fname, 'wb') as f:
+                    np.save(f, resample(self[name], smpl_rate, rate, anti_alias))
+                os.replace(tmp_fname, fname)
+
+            self.resampled[key] = np.load(fname, mmap_mode='r')
+
+        return self.resampled[key]
+
+    def get_digest(self, name):
+        '''
+        SHA-256 of the shape, dtype and content of the trace with the given name, e.g., to key cached results
+        '''
+        if name not in self.digest:
+            trace = self[name]
+            sha = hashlib.sha256('{}{}'.format(trace.shape, trace.dtype.str).encode())
+            sha.update(np.ascontiguousarray(trace).tobytes())
+            self.digest[name] = sha.hexdigest()
+
+        return self.digest[name]
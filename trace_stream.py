@@ -0,0 +1,188 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#######################################################
+## Trace stream: long IMU logs read chunk by chunk as the ticks
+## advance, e.g., hour-long flight captures at 200 Hz
+##
+## A log has the columns of the traces of dhs_trace.mat, one sample
+## per row: sampling time, then the x-, y- and z-axis (roll, pitch
+## and yaw velocity for a gyroscope log). It is either
+##   - a .csv file, comma-separated, with an optional header line
+##   - a raw binary file (any other extension), num_col values of
+##     flytera_cfg.stream_bin_dtype per sample, no header
+##
+## A generator yields the samples of a log in chunks of
+## flytera_cfg.stream_chunk rows, and a trace_stream keeps only the
+## chunk of the current tick, so the memory does not grow with the
+## length of the log. Ticks only go forward. Once the log is
+## exhausted the last sample is kept, as for the traces of
+## dhs_trace.mat.
+#######################################################
+
+import os, hashlib, itertools
+
+import numpy as np
+
+import flytera_cfg
+
+# Columns of a sample: sampling time, x-, y-, z-axis
+num_col = 4
+
+# SHA-256 of the logs digested so far, keyed by file name, size and modification time
+digest = {}
+
+def read_csv(fname, chunk):
+    '''
+    Func: Generator of the samples of a .csv log, chunk rows at a time
+    A first line that does not start with a number is a header, and skipped, as are blank lines
+    '''
+    with open(fname) as fid:
+        first = fid.readline()
+        try:
+            float(first.split(',')[0])
+            lines = itertools.chain([first], fid)
+        except ValueError:
+            lines = fid
+
+        while True:
+            rows = list(itertools.islice(lines, chunk))
+            if not rows:
+                return
+            rows = [row for row in rows if row.strip()]
+            if rows:
+                yield np.loadtxt(rows, delimiter=',', ndmin=2)
+
+def read_bin(fname, chunk, dtype = None):
+    '''
+    Func: Generator of the samples of a raw binary log, chunk rows at a time
+    dtype: the type of the values, default flytera_cfg.stream_bin_dtype
+    '''
+    if dtype is None:
+        dtype = flytera_cfg.stream_bin_dtype
+
+    with open(fname, 'rb') as fid:
+        while True:
+            data = np.fromfile(fid, dtype=dtype, count=chunk * num_col)
+            if data.size < num_col:
+                return
+            yield data[:data.size // num_col * num_col].reshape(-1, num_col).astype(float)
+
+def gnrt_normal(rng, chunk):
+    '''
+    Func: Endless generator of standard normal samples, chunk rows at a time, as the generated laac traces of
+    net_node.dhs.set_laac
+    rng: np.random.RandomState drawing the samples
+    '''
+    while True:
+        yield rng.standard_normal((chunk, num_col))
+
+def get_digest(fname):
+    '''
+    Func: SHA-256 of the content of a log, read chunk by chunk, e.g., to key cached results
+    '''
+    stat = os.stat(fname)
+    key = (os.path.abspath(fname), stat.st_size, stat.st_mtime)
+    if key not in digest:
+        sha = hashlib.sha256()
+        with open(fname, 'rb') as fid:
+            for block in iter(lambda: fid.read(1 << 20), b''):
+                sha.update(block)
+        digest[key] = sha.hexdigest()
+
+    return digest[key]
+
+class trace_stream:
+    '''
+    Samples of a log by tick, only the chunk of the current tick in memory
+    '''
+    def __init__(self, fname = None, seed = None, chunk = None):
+        # The log, None for standard normal samples drawn with the seed
+        self.fname = fname
+        self.seed = seed
+
+        # Rows per chunk, default flytera_cfg.stream_chunk
+        self.chunk_size = flytera_cfg.stream_chunk if chunk is None else chunk
+
+        self.rewind()
+
+    def rewind(self):
+        '''
+        Func: Restart from the first sample
+        '''
+        if self.fname is None:
+            self.src = gnrt_normal(np.random.RandomState(self.seed), self.chunk_size)
+        elif os.path.splitext(self.fname)[1].lower() == '.csv':
+            self.src = read_csv(self.fname, self.chunk_size)
+        else:
+            self.src = read_bin(self.fname, self.chunk_size)
+
+        # The current chunk and the index of its first sample
+        self.chunk = None
+        self.start = 0
+
+        # The log has been exhausted
+        self.done = False
+
+        self.next_chunk()
+        if self.chunk is None:
+            print('Error: The trace {} has no samples.'.format(self.fname))
+            exit(0)
+
+    def next_chunk(self):
+        '''
+        Func: Read the next chunk, the current one is kept if the log has been exhausted, chunks without samples are
+        skipped
+        '''
+        chunk = None
+        while chunk is None or chunk.shape[0] == 0:
+            try:
+                chunk = next(self.src)
+            except StopIteration:
+                self.done = True
+                return
+
+        if self.chunk is not None:
+            self.start += self.chunk.shape[0]
+        self.chunk = chunk
+
+    def get(self, idx):
+        '''
+        Func: The sample of index idx, staying at the last sample once the log is exhausted
+        idx: index of the sample, not before the current chunk
+        Return: row of num_col values, a view into the current chunk
+        '''
+        if idx < self.start:
+            print('Error: The trace {} is read backwards, sample {} before {}.'.format(self.fname, idx, self.start))
+            exit(0)
+
+        while not self.done and idx >= self.start + self.chunk.shape[0]:
+            self.next_chunk()
+
+        return self.chunk[min(idx - self.start, self.chunk.shape[0] - 1)]
+
+    def get_ckpt(self):
+        '''
+        Func: The state of the stream for a checkpoint of the run, the seed of generated samples
+        The position follows from the tick, see set_ckpt
+        '''
+        return np.array([] if self.seed is None else [self.seed], dtype=np.int64)
+
+    def set_ckpt(self, ckpt):
+        '''
+        Func: Restore the state of the stream from a checkpoint, see get_ckpt, the samples are read again from the first
+        one as the ticks advance
+        '''
+        if ckpt.size > 0:
+            self.seed = int(ckpt[0])
+        self.rewind()